@@ -0,0 +1,104 @@
+from typing import Dict, List, Optional
+
+# Bybit原生资金费率扫描
+# 一次linear全量行情请求即可拿到所有合约的fundingRate和nextFundingTime，
+# 转换为与coinglass套利列表相同的格式，策略和机会排行无需区分数据来源
+# coinglass才有的跨周期字段(threeDayFundingRate等)可选合并
+
+QUOTE_CURRENCY = "USDT"
+# 只有coinglass提供的字段，合并时补充到原生数据中
+COINGLASS_FIELDS = ("threeDayFundingRate", "currencyLog")
+
+
+def _interval_hours(instrument: Optional[Dict]) -> float:
+    # instruments-info中fundingInterval单位为分钟
+    if instrument and instrument.get("fundingInterval"):
+        return int(instrument["fundingInterval"]) / 60
+    return 8.0
+
+
+def parse_bybit_tickers(
+    payload: dict, instruments: Optional[Dict[str, Dict]] = None
+) -> List[Dict]:
+    """
+    linear全量行情转为coinglass套利列表格式
+    fundingRate为百分比(-0.5即-0.5%)，负费率做多合约、卖出现货
+    instruments: 合约交易对信息{symbol: instrument}，用于按结算周期计算年化，为空按8小时
+    """
+    update_time = int(payload.get("time") or 0)
+    items = []
+    for ticker in payload.get("result", {}).get("list", []):
+        rate = ticker.get("fundingRate")
+        if not rate:
+            # 交割合约没有资金费率
+            continue
+        symbol = ticker["symbol"]
+        if not symbol.endswith(QUOTE_CURRENCY):
+            # 现货腿使用同名交易对，只有USDT永续能对应到现货
+            continue
+        funding_rate = float(rate) * 100
+        interval = _interval_hours(instruments.get(symbol) if instruments else None)
+        items.append(
+            {
+                "currency": symbol[: -len(QUOTE_CURRENCY)],
+                "exchangeName": "Bybit",
+                "fundingRate": funding_rate,
+                "fundingRatePositive": abs(funding_rate),
+                "futuresType": "long" if funding_rate < 0 else "short",
+                "quoteCurrency": QUOTE_CURRENCY,
+                "spotType": "sell" if funding_rate < 0 else "buy",
+                "symbol": symbol,
+                "updateTime": update_time,
+                "yearFundingRate": abs(funding_rate) * 24 / interval * 365,
+                "nextFundingTime": int(ticker.get("nextFundingTime") or 0),
+                "fundingIntervalHour": interval,
+                "lastPrice": ticker.get("lastPrice"),
+            }
+        )
+    return items
+
+
+def merge_coinglass(items: List[Dict], coinglass_items: List[Dict]) -> List[Dict]:
+    """把coinglass独有的字段补充到原生数据，资金费率以Bybit为准"""
+    extra = {
+        item.get("symbol"): item
+        for item in coinglass_items
+        if item.get("exchangeName") == "Bybit"
+    }
+    for item in items:
+        source = extra.get(item["symbol"])
+        if source is None:
+            continue
+        for field in COINGLASS_FIELDS:
+            if field in source:
+                item[field] = source[field]
+    return items
+
+
+def get_bybit_native_data(
+    client,
+    instruments: Optional[Dict[str, Dict]] = None,
+    with_coinglass: bool = False,
+) -> List[Dict]:
+    """
+    一次Bybit linear全量行情请求得到所有合约的资金费率，格式与get_bybit_interestArbitrage_data一致
+    with_coinglass: 合并coinglass的跨周期字段，coinglass请求失败时只返回原生数据
+    """
+    response = client.get_tickers(category="linear")
+    if isinstance(response, tuple):
+        response = response[0]
+    if response.get("retCode") != 0:
+        raise Exception(f"获取Bybit行情失败: {response.get('retMsg')}")
+    # pybit已解码为完整dict(FastJSONMixin下为orjson)，直接转换
+    items = parse_bybit_tickers(response, instruments)
+    if with_coinglass:
+        # coinglass解密依赖pycryptodome，只在需要合并时导入
+        from ArbitrageData.arbitrage_list import get_bybit_interestArbitrage_data
+
+        try:
+            coinglass_items = get_bybit_interestArbitrage_data()
+            if isinstance(coinglass_items, list):
+                merge_coinglass(items, coinglass_items)
+        except Exception as e:
+            print(f"警告：合并coinglass数据失败 - 错误: {str(e)}")
+    return items
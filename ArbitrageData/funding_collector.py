@@ -0,0 +1,277 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# 多交易所资金费率采集
+# 并发请求各交易所公开REST接口，统一成列式表：
+#   symbol(统一为BTCUSDT格式) venue rate(小数，不是百分比) next_settlement(ms) interval(小时)
+# 并记录每个数据源的请求耗时和数据新鲜度
+# 一轮采集耗时约等于最慢的交易所，而不是所有交易所耗时之和
+
+
+def _parse_bybit(payload: dict) -> List[tuple]:
+    rows = []
+    for item in payload.get("result", {}).get("list", []):
+        if not item.get("fundingRate"):
+            continue
+        rows.append(
+            (
+                item["symbol"],
+                float(item["fundingRate"]),
+                int(item.get("nextFundingTime") or 0),
+                float(item.get("fundingIntervalHour") or 8),
+            )
+        )
+    return rows
+
+
+def _parse_binance(payload: list) -> List[tuple]:
+    # premiumIndex不带结算周期，先按8小时，再由fundingInfo覆盖调整过周期的交易对
+    rows = []
+    for item in payload:
+        if not item.get("lastFundingRate"):
+            continue
+        rows.append(
+            (
+                item["symbol"],
+                float(item["lastFundingRate"]),
+                int(item.get("nextFundingTime") or 0),
+                8.0,
+            )
+        )
+    return rows
+
+
+def _parse_binance_intervals(payload: list) -> Dict[str, float]:
+    # fundingInfo只列出调整过资金费率上下限或结算周期的交易对
+    return {
+        item["symbol"]: float(item["fundingIntervalHours"])
+        for item in payload
+        if item.get("fundingIntervalHours")
+    }
+
+
+def _parse_okx(payload: dict) -> List[tuple]:
+    rows = []
+    for item in payload.get("data", []):
+        inst_id = item.get("instId", "")
+        if not inst_id.endswith("-USDT-SWAP"):
+            continue
+        funding_time = int(item.get("fundingTime") or 0)
+        next_time = int(item.get("nextFundingTime") or 0)
+        interval = (next_time - funding_time) / 3600000 if next_time else 8.0
+        rows.append(
+            (
+                inst_id.replace("-SWAP", "").replace("-", ""),
+                float(item["fundingRate"]),
+                funding_time,
+                interval,
+            )
+        )
+    return rows
+
+
+def _parse_gate(payload: list) -> List[tuple]:
+    rows = []
+    for item in payload:
+        if item.get("in_delisting"):
+            continue
+        rows.append(
+            (
+                item["name"].replace("_", ""),
+                float(item["funding_rate"]),
+                int(item.get("funding_next_apply") or 0) * 1000,
+                int(item.get("funding_interval") or 28800) / 3600,
+            )
+        )
+    return rows
+
+
+# 数据源配置：venue -> (url, params, 解析函数)
+DEFAULT_SOURCES: Dict[str, tuple] = {
+    "Bybit": (
+        "https://api.bybit.com/v5/market/tickers",
+        {"category": "linear"},
+        _parse_bybit,
+    ),
+    "Binance": ("https://fapi.binance.com/fapi/v1/premiumIndex", None, _parse_binance),
+    "OKX": (
+        "https://www.okx.com/api/v5/public/funding-rate",
+        {"instId": "ANY"},
+        _parse_okx,
+    ),
+    "Gate": ("https://api.gateio.ws/api/v4/futures/usdt/contracts", None, _parse_gate),
+}
+
+
+# 结算周期数据源：venue -> (url, params, 解析函数)，解析为{symbol: 周期(小时)}
+# 周期很少变化，按interval_ttl缓存，覆盖主数据源中对应交易对的interval
+DEFAULT_INTERVAL_SOURCES: Dict[str, tuple] = {
+    "Binance": (
+        "https://fapi.binance.com/fapi/v1/fundingInfo",
+        None,
+        _parse_binance_intervals,
+    ),
+}
+
+
+class FundingRateTable(object):
+    """
+    列式资金费率表，每列一个list，同一下标为同一行
+    """
+
+    COLUMNS = ("symbol", "venue", "rate", "next_settlement", "interval")
+
+    def __init__(self) -> None:
+        self.symbol: List[str] = []
+        self.venue: List[str] = []
+        self.rate: List[float] = []
+        self.next_settlement: List[int] = []
+        self.interval: List[float] = []
+        # symbol -> 行下标列表
+        self.index: Dict[str, List[int]] = {}
+
+    def append(self, venue: str, rows: List[tuple]):
+        for symbol, rate, next_settlement, interval in rows:
+            self.index.setdefault(symbol, []).append(len(self.symbol))
+            self.symbol.append(symbol)
+            self.venue.append(venue)
+            self.rate.append(rate)
+            self.next_settlement.append(next_settlement)
+            self.interval.append(interval)
+
+    def __len__(self):
+        return len(self.symbol)
+
+    def rows_for(self, symbol: str) -> List[Dict]:
+        """某个交易对在各交易所的资金费率"""
+        return [self.row(i) for i in self.index.get(symbol, [])]
+
+    def row(self, i: int) -> Dict:
+        return {column: getattr(self, column)[i] for column in self.COLUMNS}
+
+    def to_rows(self) -> List[Dict]:
+        return [self.row(i) for i in range(len(self))]
+
+
+class FundingRateCollector(object):
+    """
+    并发采集多个交易所的资金费率
+    单个数据源失败时沿用上一轮的数据，通过staleness判断新鲜度
+    """
+
+    def __init__(
+        self,
+        sources: Optional[Dict[str, tuple]] = None,
+        session=None,
+        timeout: float = 5,
+        interval_sources: Optional[Dict[str, tuple]] = None,
+        interval_ttl: float = 3600,
+    ) -> None:
+        """
+        sources: 数据源配置，格式同DEFAULT_SOURCES
+        session: requests.Session或同接口对象，测试时可传入本地替身
+        timeout: 单个数据源的请求超时(秒)
+        interval_sources: 结算周期数据源，格式同DEFAULT_INTERVAL_SOURCES，
+            为None时使用默认配置中sources包含的交易所
+        interval_ttl: 结算周期缓存时间(秒)
+        """
+        self.sources = sources or DEFAULT_SOURCES
+        if interval_sources is None:
+            interval_sources = {
+                venue: source
+                for venue, source in DEFAULT_INTERVAL_SOURCES.items()
+                if venue in self.sources
+            }
+        self.interval_sources = interval_sources
+        self.interval_ttl = interval_ttl
+        self.timeout = timeout
+        workers = len(self.sources) + len(self.interval_sources)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+            session.mount("https://", adapter)
+        self.session = session
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="funding-collector"
+        )
+        # venue -> {symbol: 结算周期(小时)}
+        self.venue_intervals: Dict[str, Dict[str, float]] = {}
+        # venue -> 上一次成功获取结算周期的时间
+        self.intervals_fetched_at: Dict[str, float] = {}
+        # venue -> 上一次成功解析的行
+        self.venue_rows: Dict[str, List[tuple]] = {}
+        # venue -> {"latency_ms", "fetched_at", "rows", "error"}
+        self.source_stats: Dict[str, Dict] = {
+            venue: {"latency_ms": None, "fetched_at": None, "rows": 0, "error": None}
+            for venue in self.sources
+        }
+
+    def _fetch(self, venue: str, url: str, params, parse: Callable):
+        start = time.perf_counter()
+        try:
+            response = self.session.get(url, params=params, timeout=self.timeout)
+            response.raise_for_status()
+            rows = parse(response.json())
+            return venue, rows, (time.perf_counter() - start) * 1000, None
+        except Exception as e:
+            return venue, None, (time.perf_counter() - start) * 1000, e
+
+    def _apply_intervals(self, venue: str, rows: List[tuple]) -> List[tuple]:
+        intervals = self.venue_intervals.get(venue)
+        if not intervals:
+            return rows
+        return [
+            (symbol, rate, next_settlement, intervals.get(symbol, interval))
+            for symbol, rate, next_settlement, interval in rows
+        ]
+
+    def collect(self) -> FundingRateTable:
+        """采集一轮，返回合并后的资金费率表"""
+        now = time.time()
+        # 结算周期过期时与资金费率并发请求，不增加本轮耗时
+        interval_futures = [
+            self.executor.submit(self._fetch, venue, url, params, parse)
+            for venue, (url, params, parse) in self.interval_sources.items()
+            if now - self.intervals_fetched_at.get(venue, 0) >= self.interval_ttl
+        ]
+        futures = [
+            self.executor.submit(self._fetch, venue, url, params, parse)
+            for venue, (url, params, parse) in self.sources.items()
+        ]
+        for future in interval_futures:
+            venue, intervals, _, error = future.result()
+            if error is None:
+                self.venue_intervals[venue] = intervals
+                self.intervals_fetched_at[venue] = time.time()
+            else:
+                # 沿用上一次的周期，下一轮重试
+                print(f"警告：采集{venue}结算周期失败 - {str(error)}")
+        for future in futures:
+            venue, rows, latency_ms, error = future.result()
+            stats = self.source_stats[venue]
+            stats["latency_ms"] = latency_ms
+            if error is None:
+                self.venue_rows[venue] = self._apply_intervals(venue, rows)
+                stats["fetched_at"] = time.time()
+                stats["rows"] = len(rows)
+                stats["error"] = None
+            else:
+                stats["error"] = str(error)
+                print(f"警告：采集{venue}资金费率失败 - {str(error)}")
+        table = FundingRateTable()
+        for venue, rows in self.venue_rows.items():
+            table.append(venue, rows)
+        return table
+
+    def staleness(self, venue: str) -> Optional[float]:
+        """距离该数据源上一次成功采集的秒数，从未成功返回None"""
+        fetched_at = self.source_stats[venue]["fetched_at"]
+        return time.time() - fetched_at if fetched_at else None
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.session.close()
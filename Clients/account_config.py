@@ -0,0 +1,172 @@
+import re
+import threading
+from decimal import Decimal
+from typing import Dict, Iterable, Optional, Tuple
+
+# 杠杆已是目标值时Bybit返回的错误码
+LEVERAGE_NOT_MODIFIED = 110043
+# 下单被拒且可能是杠杆/保证金与缓存不一致(如手动改过杠杆)的错误码：
+# 余额/可用保证金不足、风险限额下不能使用该杠杆
+CONFIG_REJECT_CODES = (110004, 110007, 110012, 110013, 110044, 110045)
+# pybit异常信息中的错误码，拆单全部失败时只有拼接后的信息
+_ERR_CODE = re.compile(r"ErrCode: (\d+)")
+
+
+def is_config_reject(e: Exception) -> bool:
+    """下单异常是否与杠杆/保证金配置有关"""
+    code = getattr(e, "status_code", None)
+    if code is not None:
+        codes = {code}
+    else:
+        codes = {int(c) for c in _ERR_CODE.findall(str(e))}
+    if codes & set(CONFIG_REJECT_CODES):
+        return True
+    message = str(e).lower()
+    return "leverage" in message or "margin" in message
+
+
+def _unwrap(response):
+    return response[0] if isinstance(response, tuple) else response
+
+
+def _normalize(leverage) -> str:
+    # "2"、"2.0"、Decimal("2.00")视为同一个杠杆
+    return format(Decimal(str(leverage)).normalize(), "f")
+
+
+class AccountConfigCache(object):
+    """
+    账户配置缓存：每个symbol当前的杠杆和各币种的抵押开关
+    启动时按持仓接口和抵押信息接口批量预载，之后只有目标值与缓存不同时才调用设置接口，
+    稳定运行时每次交易前的准备不再产生配置请求
+    缓存不会感知手动修改，下单因杠杆/保证金被拒时用invalidate_on_reject丢弃该symbol的缓存，
+    下次准备时重新设置
+    多个交易线程可共用一个实例(同一账户)
+    """
+
+    def __init__(self, client, logger=None) -> None:
+        self.client = client
+        self.logger = logger
+        self.lock = threading.Lock()
+        # {(category, symbol): 杠杆}
+        self.leverage: Dict[Tuple[str, str], str] = {}
+        # {coin: 是否开启抵押}
+        self.collateral: Dict[str, bool] = {}
+        # 实际发出的设置请求数
+        self.calls = 0
+
+    def _log(self, message: str) -> None:
+        if self.logger is not None:
+            self.logger.info(message)
+        else:
+            print(message)
+
+    def seed(self, category: str = "linear", settle_coin: str = "USDT") -> int:
+        """
+        按持仓接口分页预载该结算币种下symbol的杠杆，返回预载数量
+        按settleCoin查询只返回有仓位(size > 0)的symbol，空仓的symbol不会预载，
+        首次准备时按未命中处理：发一次设置请求(已是目标杠杆时110043视为成功)后写入缓存
+        """
+        cursor = None
+        count = 0
+        while True:
+            params = {"category": category, "settleCoin": settle_coin, "limit": 200}
+            if cursor:
+                params["cursor"] = cursor
+            response = _unwrap(self.client.get_positions(**params))
+            if response.get("retCode") != 0:
+                raise Exception(f"获取持仓失败: {response.get('retMsg')}")
+            result = response.get("result", {})
+            with self.lock:
+                for position in result.get("list", []):
+                    if position.get("leverage"):
+                        key = (category, position["symbol"])
+                        self.leverage[key] = _normalize(position["leverage"])
+                        count += 1
+            next_cursor = result.get("nextPageCursor")
+            if not next_cursor or next_cursor == cursor:
+                return count
+            cursor = next_cursor
+
+    def seed_collateral(self) -> int:
+        """一次请求预载所有币种的抵押开关"""
+        response = _unwrap(self.client.get_collateral_info())
+        if response.get("retCode") != 0:
+            raise Exception(f"获取抵押信息失败: {response.get('retMsg')}")
+        items = response.get("result", {}).get("list", [])
+        with self.lock:
+            for item in items:
+                switch = item.get("collateralSwitch")
+                if isinstance(switch, str):
+                    switch = switch.upper() == "ON" or switch.lower() == "true"
+                self.collateral[item["currency"]] = bool(switch)
+        return len(items)
+
+    def ensure_leverage(self, category: str, symbol: str, leverage) -> bool:
+        """杠杆与缓存不同时才设置，返回是否发出了请求"""
+        key = (category, symbol)
+        target = _normalize(leverage)
+        with self.lock:
+            if self.leverage.get(key) == target:
+                return False
+            self.calls += 1
+        try:
+            self.client.set_leverage(
+                category=category,
+                symbol=symbol,
+                buyLeverage=target,
+                sellLeverage=target,
+            )
+        except Exception as e:
+            # 缓存未命中(如未预载的symbol)时可能已经是目标杠杆
+            if getattr(
+                e, "status_code", None
+            ) != LEVERAGE_NOT_MODIFIED and "leverage not modified" not in str(e):
+                raise
+        with self.lock:
+            self.leverage[key] = target
+        self._log(f"{category} {symbol}杠杆设为{target}")
+        return True
+
+    def invalidate(self, category: str, symbol: str) -> None:
+        """丢弃symbol的杠杆缓存，下次ensure_leverage重新设置"""
+        with self.lock:
+            self.leverage.pop((category, symbol), None)
+
+    def invalidate_on_reject(self, e: Exception, category: str, symbol: str) -> bool:
+        """下单异常与杠杆/保证金有关时丢弃缓存，返回是否丢弃"""
+        if not is_config_reject(e):
+            return False
+        self.invalidate(category, symbol)
+        self._log(f"{category} {symbol}下单被拒，丢弃杠杆缓存: {str(e)}")
+        return True
+
+    def ensure_collateral(self, coin: str, enabled: bool = True) -> bool:
+        """抵押开关与缓存不同时才设置，返回是否发出了请求"""
+        with self.lock:
+            if self.collateral.get(coin) == enabled:
+                return False
+            self.calls += 1
+        self.client.set_collateral_coin(
+            coin=coin, collateralSwitch="ON" if enabled else "OFF"
+        )
+        with self.lock:
+            self.collateral[coin] = enabled
+        self._log(f"{coin}抵押开关设为{'ON' if enabled else 'OFF'}")
+        return True
+
+    def prepare(
+        self,
+        leverages: Iterable[Tuple[str, str, object]],
+        collateral_coins: Optional[Iterable[str]] = None,
+    ) -> int:
+        """
+        在触发窗口之前批量准备配置，返回实际发出的设置请求数
+        leverages: [(category, symbol, leverage)]
+        """
+        changed = 0
+        for category, symbol, leverage in leverages:
+            changed += self.ensure_leverage(category, symbol, leverage)
+        for coin in collateral_coins or []:
+            changed += self.ensure_collateral(coin)
+        return changed
@@ -3,14 +3,31 @@ from datetime import datetime, timedelta
 from collections import deque
 from typing import Optional
 
+from requests.adapters import HTTPAdapter
 
-class BybitTimeRecordClient(HTTP):
+from Clients.fast_json import FastJSONMixin
+from tools.metrics import RATE_LIMIT, RATE_LIMIT_REMAINING, REQUEST_LATENCY
+
+
+class BybitTimeRecordClient(FastJSONMixin, HTTP):
     def __init__(self, *args, **kwargs):
+        """
+        响应用orjson解码(Clients.fast_json)
+        pool_size: 连接池大小，多个线程共用一个客户端并发下单时需不小于并发数，默认10
+        """
         logger = kwargs.pop("logger")
+        pool_size = kwargs.pop("pool_size", None)
         super().__init__(*args, **kwargs)
         self.logger = logger
+        if pool_size:
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            self.client.mount("https://", adapter)
+        # 每个接口最近一次的限频余量，格式：{method: (剩余, 上限)}，限频按账户计算
+        self.rate_limits = {}
         self.response_time_records = deque(maxlen=15)
         self.record_request_time = True
+        # 带回响应头，用于统计限频余量
+        self.return_response_headers = True
         self.retry_delay = 0.1
 
     def get_average_response_time(self):
@@ -20,68 +37,60 @@ class BybitTimeRecordClient(HTTP):
             else 0
         )
 
+    def _record_response(self, method: str, response):
+        """记录请求耗时和限频余量，返回响应体"""
+        if not isinstance(response, tuple):
+            return response
+        elapsed = response[1]
+        if self.record_request_time:
+            self.logger.info(f"{method}请求耗时：{elapsed.microseconds}")
+            self.response_time_records.append(elapsed.microseconds)
+        REQUEST_LATENCY.labels(method).observe(elapsed.total_seconds())
+        if len(response) > 2:
+            headers = response[2]
+            remaining = headers.get("X-Bapi-Limit-Status")
+            if remaining is not None:
+                limit = float(headers.get("X-Bapi-Limit", 0))
+                self.rate_limits[method] = (float(remaining), limit)
+                RATE_LIMIT_REMAINING.labels(method).set(float(remaining))
+                RATE_LIMIT.labels(method).set(limit)
+        return response[0]
+
+    def has_budget(self, method: str, reserve: int = 1) -> bool:
+        """该接口剩余请求数是否多于reserve，没有记录时视为充足"""
+        remaining = self.rate_limits.get(method)
+        return remaining is None or remaining[0] > reserve
+
     def get_server_time(self):
         """获取Bybit服务器时间"""
-        if not self.record_request_time:
-            return super().get_server_time()
-        time_response = super().get_server_time()
-        self.logger.info(f"get_server_time请求耗时：{time_response[1].microseconds}")
-        self.response_time_records.append(time_response[1].microseconds)
-        time_response = time_response[0]
-        return time_response
+        return self._record_response("get_server_time", super().get_server_time())
 
     def get_instruments_info(self, *args, **kwargs):
-        """获取Bybit服务器时间"""
-        if not self.record_request_time:
-            return super().get_instruments_info(*args, **kwargs)
-        instruments_response = super().get_instruments_info(*args, **kwargs)
-        self.logger.info(
-            f"get_instruments_info请求耗时：{instruments_response[1].microseconds}"
+        """获取交易对信息"""
+        return self._record_response(
+            "get_instruments_info", super().get_instruments_info(*args, **kwargs)
         )
-        self.response_time_records.append(instruments_response[1].microseconds)
-        instruments_response = instruments_response[0]
-        return instruments_response
 
     def get_order_history(self, **kwargs):
         """获取订单历史"""
-        if not self.record_request_time:
-            return super().get_order_history(**kwargs)
-        order_history_response = super().get_order_history(**kwargs)
-        self.logger.info(
-            f"get_order_history请求耗时：{order_history_response[1].microseconds}"
+        return self._record_response(
+            "get_order_history", super().get_order_history(**kwargs)
         )
-        self.response_time_records.append(order_history_response[1].microseconds)
-        order_history_response = order_history_response[0]
-        return order_history_response
 
     def get_wallet_balance(self, *args, **kwargs):
         """获取钱包余额"""
-        if not self.record_request_time:
-            return super().get_wallet_balance(*args, **kwargs)
-        wallet_balance_response = super().get_wallet_balance(*args, **kwargs)
-        self.logger.info(
-            f"get_wallet_balance请求耗时：{wallet_balance_response[1].microseconds}"
+        return self._record_response(
+            "get_wallet_balance", super().get_wallet_balance(*args, **kwargs)
         )
-        self.response_time_records.append(wallet_balance_response[1].microseconds)
-        wallet_balance_response = wallet_balance_response[0]
-        return wallet_balance_response
 
     def get_tickers(self, *args, **kwargs):
         """获取最新价格"""
-        if not self.record_request_time:
-            return super().get_tickers(*args, **kwargs)
-        tickers_response = super().get_tickers(*args, **kwargs)
-        self.logger.info(f"get_tickers请求耗时：{tickers_response[1].microseconds}")
-        self.response_time_records.append(tickers_response[1].microseconds)
-        tickers_response = tickers_response[0]
-        return tickers_response
+        return self._record_response(
+            "get_tickers", super().get_tickers(*args, **kwargs)
+        )
 
     def place_order(self, *args, **kwargs):
         """下单"""
-        if not self.record_request_time:
-            return super().place_order(*args, **kwargs)
-        place_order_response = super().place_order(*args, **kwargs)
-        self.logger.info(f"place_order请求耗时：{place_order_response[1].microseconds}")
-        self.response_time_records.append(place_order_response[1].microseconds)
-        place_order_response = place_order_response[0]
-        return place_order_response
+        return self._record_response(
+            "place_order", super().place_order(*args, **kwargs)
+        )
@@ -0,0 +1,176 @@
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from pybit.unified_trading import HTTP
+
+# Bybit同一套API由多个域名提供，不同地区、不同时段的最快线路不一样
+# 启动时和后台定时对每个候选域名发不签名(服务器时间)和签名(API key信息)的轻量请求，
+# 按p99延迟和错误率排序，在两次触发之间把客户端切到最快的域名
+
+# 全球可用的候选域名，nl/com.hk/kz等地区站点只对当地用户开放，需要时通过candidates传入
+MAINNET_ENDPOINTS = ("https://api.bybit.com", "https://api.bytick.com")
+DEMO_ENDPOINTS = ("https://api-demo.bybit.com",)
+
+
+def default_endpoints(demo: bool = False) -> List[str]:
+    return list(DEMO_ENDPOINTS if demo else MAINNET_ENDPOINTS)
+
+
+def _percentile(values: List[float], probability: float) -> float:
+    values = sorted(values)
+    index = min(len(values) - 1, int(probability * len(values)))
+    return values[index]
+
+
+class EndpointSelector(object):
+    """
+    selector = EndpointSelector(default_endpoints(), api_key, api_secret)
+    selector.start()          启动时探测一轮，之后后台定时探测
+    selector.apply(client)    切换客户端的域名，返回是否有变化，只应在触发窗口之外调用
+    """
+
+    def __init__(
+        self,
+        candidates: List[str],
+        api_key: Optional[str] = None,
+        api_secret: Optional[str] = None,
+        demo: bool = False,
+        interval: float = 60,
+        samples: int = 5,
+        window: int = 100,
+        max_error_rate: float = 0.2,
+        timeout: float = 2,
+        probe: Optional[Callable[[str], None]] = None,
+    ) -> None:
+        """
+        candidates: 候选域名，如https://api.bybit.com
+        api_key/api_secret: 签名探测使用，为空只做不签名探测
+        interval: 后台探测间隔(秒)
+        samples: 每轮每个域名的探测次数
+        window: 每个域名保留最近多少次探测结果
+        max_error_rate: 错误率超过该值的域名排在所有正常域名之后
+        probe: 自定义探测函数，参数为域名，失败时抛异常，默认用pybit发请求
+        """
+        if not candidates:
+            raise Exception("没有候选域名")
+        self.candidates = list(candidates)
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.demo = demo
+        self.interval = interval
+        self.samples = samples
+        self.max_error_rate = max_error_rate
+        self.timeout = timeout
+        self.probe = probe or self._probe
+        self.lock = threading.Lock()
+        # 每个域名最近的探测结果，(耗时秒, 是否成功)
+        self.results: Dict[str, deque] = {
+            url: deque(maxlen=window) for url in self.candidates
+        }
+        self._clients: Dict[str, HTTP] = {}
+        self._best = self.candidates[0]
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _get_client(self, url: str) -> HTTP:
+        client = self._clients.get(url)
+        if client is None:
+            # 每个域名单独的连接，探测的是复用连接后的延迟，与下单客户端一致
+            client = HTTP(
+                api_key=self.api_key,
+                api_secret=self.api_secret,
+                demo=self.demo,
+                timeout=self.timeout,
+                max_retries=1,
+            )
+            client.endpoint = url
+            self._clients[url] = client
+        return client
+
+    def _probe(self, url: str) -> None:
+        client = self._get_client(url)
+        client.get_server_time()
+        if self.api_key:
+            client.get_api_key_information()
+
+    def probe_once(self, url: str) -> None:
+        started = time.perf_counter()
+        try:
+            self.probe(url)
+            ok = True
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            self.results[url].append((elapsed, ok))
+
+    def probe_all(self) -> str:
+        """每个域名探测samples次(轮流进行，避免时段差异)，返回当前最优域名"""
+        for _ in range(self.samples):
+            for url in self.candidates:
+                self.probe_once(url)
+        best = self.rank()[0]["url"]
+        with self.lock:
+            self._best = best
+        return best
+
+    def get_stats(self, url: str) -> Dict:
+        with self.lock:
+            results = list(self.results[url])
+        latencies = [elapsed for elapsed, ok in results if ok]
+        errors = sum(1 for _, ok in results if not ok)
+        return {
+            "url": url,
+            "samples": len(results),
+            "error_rate": errors / len(results) if results else 1.0,
+            "p50_ms": _percentile(latencies, 0.5) * 1000 if latencies else None,
+            "p99_ms": _percentile(latencies, 0.99) * 1000 if latencies else None,
+        }
+
+    def rank(self) -> List[Dict]:
+        """按(错误率是否超限, p99延迟, 错误率)排序，没有成功样本的排在最后"""
+        stats = [self.get_stats(url) for url in self.candidates]
+        return sorted(
+            stats,
+            key=lambda item: (
+                item["p99_ms"] is None,
+                item["error_rate"] > self.max_error_rate,
+                item["p99_ms"] or 0,
+                item["error_rate"],
+            ),
+        )
+
+    @property
+    def best(self) -> str:
+        return self._best
+
+    def apply(self, client) -> bool:
+        """把客户端切到当前最优域名，返回是否切换"""
+        best = self._best
+        if getattr(client, "endpoint", None) == best:
+            return False
+        client.endpoint = best
+        return True
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.probe_all()
+            except Exception as e:
+                print(f"警告：域名探测失败 - 错误: {str(e)}")
+
+    def start(self) -> str:
+        """同步探测一轮，再在后台线程定时探测，返回当前最优域名"""
+        best = self.probe_all()
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._loop, name="endpoint-selector", daemon=True
+            )
+            self._thread.start()
+        return best
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,235 @@
+import threading
+import time
+from decimal import ROUND_DOWN, ROUND_UP, Decimal
+from typing import Callable, Dict, List, Optional
+
+from Clients.hedged_order import new_order_link_id
+from tools.clock import REAL_CLOCK
+from tools.metrics import EXIT_LATENCY
+from tools.ns_time import NS_PER_MS, NS_PER_SECOND, ms_to_ns
+
+EXIT_MODES = ("limit", "conditional", "market")
+# 订单已完全成交或不会再成交的状态
+FINAL_ORDER_STATUSES = ("Filled", "PartiallyFilledCanceled", "Cancelled", "Rejected")
+
+
+def _unwrap(response):
+    # 开启了record_request_time的原生pybit客户端会返回(响应, 耗时)
+    return response[0] if isinstance(response, tuple) else response
+
+
+class ExitEngine(object):
+    """
+    开仓成交后立即挂好平仓单
+    mode:
+        limit       在成交均价挂只减仓限价单
+        conditional 在成交均价外stop_bps处挂只减仓条件市价单(止损)
+        market      在结算时间后settle_delay_ms发只减仓市价单
+    每次挂单记录从确认成交到平仓单被受理的耗时
+    """
+
+    def __init__(
+        self,
+        client,
+        mode: str = "limit",
+        settle_delay_ms: int = 200,
+        stop_bps: float = 50,
+        place_order: Optional[Callable[..., dict]] = None,
+        logger=None,
+        clock=None,
+    ) -> None:
+        """
+        client: 用于查询订单和撤单的客户端
+        place_order: 下单函数，默认client.place_order，可传入带对冲的下单函数
+        settle_delay_ms: market模式在结算后多久平仓
+        stop_bps: conditional模式触发价相对成交均价的距离
+        clock: 时钟(tools.clock)，为空使用系统时钟
+        """
+        if mode not in EXIT_MODES:
+            raise Exception(f"不支持的平仓方式: {mode}, 可选: {', '.join(EXIT_MODES)}")
+        self.client = client
+        self.mode = mode
+        self.settle_delay_ms = settle_delay_ms
+        self.stop_bps = Decimal(str(stop_bps))
+        self.place_order = place_order or client.place_order
+        self.logger = logger
+        self.clock = clock or REAL_CLOCK
+        self.lock = threading.Lock()
+        # 每次挂单的耗时(ms)
+        self.latencies: List[float] = []
+
+    def _log(self, message: str) -> None:
+        if self.logger is not None:
+            self.logger.info(message)
+        else:
+            print(message)
+
+    def confirm_fill(
+        self,
+        category: str,
+        symbol: str,
+        order_id: Optional[str] = None,
+        order_link_id: Optional[str] = None,
+        timeout: float = 3.0,
+        poll_interval: float = 0.05,
+    ) -> Optional[dict]:
+        """
+        轮询订单直到成交，返回订单信息(avgPrice, cumExecQty, updatedTime等)
+        超时或没有成交时返回None
+        """
+        query = {"category": category, "symbol": symbol}
+        if order_id:
+            query["orderId"] = order_id
+        else:
+            query["orderLinkId"] = order_link_id
+        deadline = self.clock.perf_counter() + timeout
+        while True:
+            try:
+                # 先查活动订单(包含最近成交的订单)，再查历史订单
+                orders = _unwrap(self.client.get_open_orders(**query))
+                order_list = orders.get("result", {}).get("list", [])
+                if not order_list:
+                    orders = _unwrap(self.client.get_order_history(**query))
+                    order_list = orders.get("result", {}).get("list", [])
+                if order_list:
+                    order = order_list[0]
+                    if order.get("orderStatus") in FINAL_ORDER_STATUSES:
+                        if Decimal(order.get("cumExecQty") or 0) > 0:
+                            return order
+                        return None
+            except Exception as e:
+                self._log(f"查询开仓成交失败: {str(e)}")
+            if self.clock.perf_counter() >= deadline:
+                return None
+            self.clock.sleep(poll_interval)
+
+    def _stop_price(self, fill_price: Decimal, entry_side: str) -> Decimal:
+        # 触发价与成交均价保持相同的小数位，多单向下、空单向上取整，保证不比stop_bps更紧
+        exponent = Decimal(1).scaleb(fill_price.as_tuple().exponent)
+        offset = fill_price * self.stop_bps / 10000
+        if entry_side == "Buy":
+            return (fill_price - offset).quantize(exponent, rounding=ROUND_DOWN)
+        return (fill_price + offset).quantize(exponent, rounding=ROUND_UP)
+
+    def _record(self, record: Dict, started: float) -> None:
+        latency_ms = (time.perf_counter() - started) * 1000
+        record["latency_ms"] = latency_ms
+        EXIT_LATENCY.labels(record["mode"]).observe(latency_ms / 1000)
+        with self.lock:
+            self.latencies.append(latency_ms)
+
+    def arm(
+        self,
+        category: str,
+        symbol: str,
+        entry_side: str,
+        qty,
+        fill_price,
+        settlement_ms: Optional[int] = None,
+        close: Optional[Callable[[], None]] = None,
+        on_fire: Optional[Callable[[Dict], None]] = None,
+    ) -> Dict:
+        """
+        挂平仓单，返回平仓记录，传给cancel可撤销
+        entry_side: 开仓方向，平仓方向与之相反
+        settlement_ms: market模式必填，结算时间(ms)
+        close: market模式到时调用的平仓函数，默认发只减仓市价单
+        on_fire: market模式平仓单发出后调用，参数为平仓记录(此时才有response)
+        """
+        started = time.perf_counter()
+        exit_side = "Sell" if entry_side == "Buy" else "Buy"
+        fill_price = Decimal(str(fill_price))
+        record = {
+            "mode": self.mode,
+            "symbol": symbol,
+            "category": category,
+            "orderLinkId": new_order_link_id(f"x{symbol[:7]}"),
+        }
+        order = {
+            "category": category,
+            "symbol": symbol,
+            "side": exit_side,
+            "qty": str(qty),
+            "reduce_only": True,
+            "orderLinkId": record["orderLinkId"],
+        }
+
+        if self.mode == "market":
+            if settlement_ms is None:
+                raise Exception("market平仓需要结算时间")
+
+            def fire():
+                fire_started = time.perf_counter()
+                try:
+                    if close is not None:
+                        close()
+                    else:
+                        record["response"] = _unwrap(
+                            self.place_order(order_type="Market", **order)
+                        )
+                except Exception as e:
+                    self._log(f"{symbol}结算后平仓失败: {str(e)}")
+                self._record(record, fire_started)
+                # 结算后的裸露时间 = 平仓完成时间 - 结算时间
+                record["after_settlement_ms"] = (
+                    self.clock.time_ns() - ms_to_ns(settlement_ms)
+                ) / NS_PER_MS
+                self._log(
+                    f"{symbol}结算后平仓完成, 距结算{record['after_settlement_ms']:.0f}ms"
+                )
+                if on_fire is not None:
+                    try:
+                        on_fire(record)
+                    except Exception as e:
+                        self._log(f"{symbol}平仓回调失败: {str(e)}")
+
+            delay = (
+                ms_to_ns(settlement_ms + self.settle_delay_ms) - self.clock.time_ns()
+            ) / NS_PER_SECOND
+            record["timer"] = self.clock.call_later(delay, fire, name=f"exit-{symbol}")
+            self._log(f"{symbol}已预约结算后{self.settle_delay_ms}ms平仓")
+            return record
+
+        if self.mode == "limit":
+            order.update(order_type="Limit", price=str(fill_price), timeInForce="GTC")
+        else:
+            order.update(
+                order_type="Market",
+                triggerPrice=str(self._stop_price(fill_price, entry_side)),
+                # 1: 价格上涨到触发价触发 2: 价格下跌到触发价触发
+                triggerDirection=2 if entry_side == "Buy" else 1,
+                triggerBy="LastPrice",
+            )
+        record["response"] = _unwrap(self.place_order(**order))
+        self._record(record, started)
+        self._log(
+            f"{symbol}平仓单已挂出({self.mode}), 耗时{record['latency_ms']:.1f}ms: "
+            f"{record['response']}"
+        )
+        return record
+
+    def cancel(self, record: Dict) -> None:
+        """撤销尚未执行的平仓单"""
+        timer = record.get("timer")
+        if timer is not None:
+            timer.cancel()
+            return
+        try:
+            self.client.cancel_order(
+                category=record["category"],
+                symbol=record["symbol"],
+                orderLinkId=record["orderLinkId"],
+            )
+        except Exception as e:
+            # 已成交或已撤销
+            self._log(f"撤销平仓单失败: {str(e)}")
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            latencies = sorted(self.latencies)
+        return {
+            "mode": self.mode,
+            "exits": len(latencies),
+            "avg_latency_ms": sum(latencies) / len(latencies) if latencies else 0,
+            "max_latency_ms": latencies[-1] if latencies else 0,
+        }
@@ -0,0 +1,40 @@
+import json
+
+from pybit.unified_trading import HTTP
+
+# 快速JSON解码
+# requests的.json()用标准库把整个响应解码为dict，全量行情/交易对的响应体较大，
+# 这里替换为orjson(未安装时退回标准库)解码，返回的仍是pybit的dict格式，调用方无需区分
+
+try:
+    import orjson
+
+    loads = orjson.loads
+    JSON_BACKEND = "orjson"
+except ImportError:
+    loads = json.loads
+    JSON_BACKEND = "json"
+
+
+class FastJSONMixin(object):
+    """
+    替换pybit解码响应使用的response.json()，错误码处理等仍由pybit完成
+    放在HTTP之前继承：class Client(FastJSONMixin, HTTP)
+    """
+
+    def _handle_response(self, response, *args, **kwargs):
+        standard_json = response.json
+
+        def fast_json(**_):
+            try:
+                return loads(response.content)
+            except ValueError:
+                # 非JSON响应交给标准解码，抛出pybit能识别的异常以便重试
+                return standard_json()
+
+        response.json = fast_json
+        return super()._handle_response(response, *args, **kwargs)
+
+
+class FastHTTP(FastJSONMixin, HTTP):
+    """使用快速解码的pybit客户端，参数与HTTP一致"""
@@ -0,0 +1,239 @@
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from threading import Lock
+from typing import List, Optional
+
+from pybit.exceptions import InvalidRequestError
+
+# Bybit orderLinkId重复的错误码
+DUPLICATE_ORDER_LINK_ID_CODES = (110072,)
+
+
+def new_order_link_id(prefix: str = "fra") -> str:
+    """生成客户端订单号，Bybit要求不超过36位"""
+    return f"{prefix}-{uuid.uuid4().hex}"[:36]
+
+
+def _is_transport_error(error: Optional[Exception]) -> bool:
+    """
+    没拿到交易所的答复(超时、连接断开、HTTP错误)
+    InvalidRequestError或retCode非0是交易所的明确拒绝，换连接重发结果也一样
+    """
+    return error is not None and not isinstance(error, InvalidRequestError)
+
+
+def _is_duplicate_error(e: Exception) -> bool:
+    if isinstance(e, InvalidRequestError):
+        return e.status_code in DUPLICATE_ORDER_LINK_ID_CODES
+    return "duplicate" in str(e).lower()
+
+
+class HedgedOrderSender(object):
+    """
+    对冲式重复下单
+    同一笔订单带同一个orderLinkId，通过多条预热好的连接发出，先收到成功回报的为准，
+    交易所按orderLinkId去重，其余连接只会收到重复错误；
+    hedge_delay>0时先只发主连接，超过hedge_delay秒没有回报或主连接传输失败才发其余连接，
+    主连接在hedge_delay内收到明确拒绝(如余额不足、数量不合法)时直接返回该错误，不再对冲
+    """
+
+    def __init__(
+        self,
+        clients: List,
+        hedge_delay: float = 0.0,
+        logger=None,
+        concurrent_orders: int = 1,
+    ) -> None:
+        """
+        clients: 已初始化的BybitTimeRecordClient列表，每个实例有独立的requests.Session
+        hedge_delay: 对冲延迟(秒)，0表示同时发出
+        concurrent_orders: 同时在途的订单数(如拆单的子单数)，用于确定线程数
+        """
+        if not clients:
+            raise Exception("至少需要一个客户端")
+        self.clients = clients
+        self.hedge_delay = hedge_delay
+        self.logger = logger
+        self.executor = ThreadPoolExecutor(
+            max_workers=len(clients) * concurrent_orders,
+            thread_name_prefix="hedged-order",
+        )
+        self.lock = Lock()
+        self.stats = {
+            "orders": 0,
+            "hedges_sent": 0,
+            # 每条连接赢得的次数
+            "wins": [0] * len(clients),
+            "duplicates": 0,
+            "reconciled": 0,
+            # 对冲连接胜出时比主连接节省的时间(ms)
+            "saved_ms": [],
+        }
+        # orderLinkId -> {连接序号: 耗时(秒)}
+        self._elapsed = {}
+
+    def warm_up(self) -> None:
+        """预热所有连接和线程，建立TCP/TLS连接"""
+        futures = [
+            self.executor.submit(client.get_server_time) for client in self.clients
+        ]
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                self._log(f"连接预热失败: {str(e)}")
+
+    def _log(self, message: str) -> None:
+        if self.logger is not None:
+            self.logger.info(message)
+
+    def _send(self, index: int, kwargs: dict):
+        start = time.perf_counter()
+        try:
+            return index, self.clients[index].place_order(**kwargs), None
+        except Exception as e:
+            return index, None, e
+        finally:
+            # 记录耗时，供统计节省的时间
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                records = self._elapsed.get(kwargs["orderLinkId"])
+                if records is not None:
+                    records[index] = elapsed
+
+    def place_order(self, **kwargs) -> dict:
+        """下单，返回胜出连接的回报；kwargs同place_order，未传orderLinkId时自动生成"""
+        link_id = kwargs.setdefault("orderLinkId", new_order_link_id())
+        with self.lock:
+            self.stats["orders"] += 1
+            self._elapsed[link_id] = {}
+        pending = {self.executor.submit(self._send, 0, kwargs)}
+        hedged = False
+        if len(self.clients) > 1 and self.hedge_delay > 0:
+            done, _ = wait(pending, timeout=self.hedge_delay)
+            if done:
+                index, response, error = next(iter(done)).result()
+                if error is None and response.get("retCode") == 0:
+                    return self._finish(link_id, index, response, pending)
+                if not _is_transport_error(error):
+                    # 交易所已明确拒绝，其余连接发出同一笔订单只会被同样拒绝
+                    with self.lock:
+                        self._elapsed.pop(link_id, None)
+                    raise error or Exception(str(response))
+        if len(self.clients) > 1:
+            hedged = True
+            with self.lock:
+                self.stats["hedges_sent"] += len(self.clients) - 1
+            for index in range(1, len(self.clients)):
+                pending.add(self.executor.submit(self._send, index, kwargs))
+
+        errors = []
+        remaining = set(pending)
+        while remaining:
+            done, remaining = wait(remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, response, error = future.result()
+                if error is None and response.get("retCode") == 0:
+                    return self._finish(link_id, index, response, pending)
+                errors.append(error or Exception(str(response)))
+
+        with self.lock:
+            self._elapsed.pop(link_id, None)
+        duplicates = [e for e in errors if _is_duplicate_error(e)]
+        if duplicates:
+            with self.lock:
+                self.stats["duplicates"] += len(duplicates)
+        if hedged and duplicates:
+            # 所有连接都没拿到成功回报但交易所已受理，按orderLinkId查回订单
+            response = self.reconcile(kwargs)
+            if response is not None:
+                return response
+        raise errors[0]
+
+    def _finish(self, link_id: str, index: int, response: dict, pending: set):
+        with self.lock:
+            self.stats["wins"][index] += 1
+        # 其余连接的回报在后台处理，不阻塞下单流程
+        for future in pending:
+            future.add_done_callback(lambda f: self._on_loser_done(f, link_id, index))
+        return response
+
+    def _on_loser_done(self, future, link_id: str, winner: int) -> None:
+        index, response, error = future.result()
+        if index != winner:
+            if error is not None and _is_duplicate_error(error):
+                with self.lock:
+                    self.stats["duplicates"] += 1
+            elif error is None and response.get("retCode") == 0:
+                self._log(f"orderLinkId {link_id} 在连接{index}上重复成功，请人工核对")
+        with self.lock:
+            elapsed = self._elapsed.get(link_id)
+            if elapsed is None:
+                return
+            if winner == 0:
+                del self._elapsed[link_id]
+            elif 0 in elapsed and winner in elapsed:
+                # 对冲连接胜出时，记录比主连接节省的时间
+                self.stats["saved_ms"].append((elapsed[0] - elapsed[winner]) * 1000)
+                del self._elapsed[link_id]
+
+    @staticmethod
+    def _find_order(client, query: dict) -> List[dict]:
+        # 市价单受理后通常立即成交，先查历史订单(包含已成交/已撤销)，
+        # 历史订单有延迟，查不到再查活动订单
+        for lookup in (client.get_order_history, client.get_open_orders):
+            orders = lookup(**query)
+            if isinstance(orders, tuple):
+                orders = orders[0]
+            order_list = orders.get("result", {}).get("list", [])
+            if order_list:
+                return order_list
+        return []
+
+    def reconcile(self, kwargs: dict) -> Optional[dict]:
+        """按orderLinkId查询订单(包括已成交的)，查到则构造成下单成功的回报格式"""
+        query = {
+            "category": kwargs.get("category"),
+            "symbol": kwargs.get("symbol"),
+            "orderLinkId": kwargs["orderLinkId"],
+        }
+        for client in self.clients:
+            try:
+                order_list = self._find_order(client, query)
+                if order_list:
+                    with self.lock:
+                        self.stats["reconciled"] += 1
+                    self._log(f"orderLinkId {kwargs['orderLinkId']} 已对账")
+                    return {
+                        "retCode": 0,
+                        "retMsg": "OK",
+                        "result": {
+                            "orderId": order_list[0]["orderId"],
+                            "orderLinkId": order_list[0]["orderLinkId"],
+                        },
+                        "time": int(order_list[0]["createdTime"]),
+                    }
+            except Exception as e:
+                self._log(f"按orderLinkId对账失败: {str(e)}")
+        return None
+
+    def get_stats(self) -> dict:
+        """命中率和节省的时间"""
+        with self.lock:
+            orders = self.stats["orders"]
+            saved = sorted(self.stats["saved_ms"])
+            hedge_wins = sum(self.stats["wins"][1:])
+            return {
+                "orders": orders,
+                "hedges_sent": self.stats["hedges_sent"],
+                "wins": list(self.stats["wins"]),
+                "hedge_win_rate": hedge_wins / orders if orders else 0,
+                "duplicates": self.stats["duplicates"],
+                "reconciled": self.stats["reconciled"],
+                "avg_saved_ms": sum(saved) / len(saved) if saved else 0,
+                "max_saved_ms": saved[-1] if saved else 0,
+            }
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,193 @@
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from typing import Callable, List
+
+from Clients.exit_engine import FINAL_ORDER_STATUSES
+from Clients.hedged_order import new_order_link_id
+
+
+def split_qty(qty, max_qty, min_qty, qty_step) -> List[Decimal]:
+    """
+    把qty拆成若干不超过max_qty的子单，尽量平均，每个子单都是qty_step的整数倍
+    拆分后不足min_qty的部分丢弃
+    """
+    qty, max_qty, min_qty, qty_step = (
+        Decimal(qty),
+        Decimal(max_qty),
+        Decimal(min_qty),
+        Decimal(qty_step),
+    )
+    total_steps = int(qty / qty_step)
+    max_steps = int(max_qty / qty_step)
+    if total_steps <= 0 or max_steps <= 0:
+        return []
+    count = math.ceil(total_steps / max_steps)
+    base, extra = divmod(total_steps, count)
+    children = [(base + (1 if i < extra else 0)) * qty_step for i in range(count)]
+    return [child for child in children if child >= min_qty]
+
+
+class OrderSlicer(object):
+    """
+    超过maxMktOrderQty的订单拆成子单，在触发时刻并发发出
+    每个子单带独立的orderLinkId，汇总为一个与place_order格式兼容的回报
+    """
+
+    def __init__(
+        self,
+        place_order: Callable[..., dict],
+        max_workers: int = 8,
+        logger=None,
+    ) -> None:
+        """
+        place_order: 下单函数，通常是BybitSingleDirectionTrade.place_order，
+                     这样子单也会经过对冲式重复下单
+        max_workers: 同时在途的子单数
+        """
+        self.place_order = place_order
+        self.max_workers = max_workers
+        self.logger = logger
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="order-slice"
+        )
+
+    def _log(self, message: str) -> None:
+        if self.logger is not None:
+            self.logger.info(message)
+
+    def warm_up(self) -> None:
+        """提前创建好所有工作线程，避免触发时再创建"""
+        futures = [
+            self.executor.submit(time.sleep, 0.01) for _ in range(self.max_workers)
+        ]
+        for future in futures:
+            future.result()
+
+    def _send(self, kwargs: dict) -> dict:
+        start = time.perf_counter()
+        child = {"orderLinkId": kwargs["orderLinkId"], "qty": kwargs["qty"]}
+        try:
+            response = self.place_order(**kwargs)
+            if isinstance(response, tuple):
+                response = response[0]
+            # 本地收到回报的时间，回报中没有交易所时间时使用
+            child["ack_ms"] = time.time_ns() // 1_000_000
+            child["response"] = response
+            child["ok"] = response.get("retCode") == 0
+        except Exception as e:
+            child["error"] = str(e)
+            child["ok"] = False
+        child["elapsed_ms"] = (time.perf_counter() - start) * 1000
+        return child
+
+    def place_sliced_order(self, children: List[Decimal], **kwargs) -> dict:
+        """
+        并发发出所有子单，kwargs同place_order(不含qty)
+        返回 {"retCode", "retMsg", "result": {"list": 子单}, "time", ...}
+        time取最晚被受理的子单时间，即整个仓位建好的时间，
+        子单回报中没有交易所时间时用本地收到回报的时间代替
+        """
+        prefix = kwargs.pop("orderLinkId", None) or new_order_link_id(
+            kwargs.get("symbol", "")[:8]
+        )
+        requests = []
+        for i, qty in enumerate(children):
+            child_kwargs = dict(kwargs)
+            child_kwargs["qty"] = qty
+            # 子单号 = 父单号前缀 + 序号，便于按前缀对账
+            child_kwargs["orderLinkId"] = f"{prefix[:32]}-{i}"
+            requests.append(child_kwargs)
+        futures = [self.executor.submit(self._send, r) for r in requests]
+        results = [future.result() for future in futures]
+
+        accepted = [child for child in results if child["ok"]]
+        if not accepted:
+            raise Exception(f"所有子单均失败: {[c.get('error') for c in results]}")
+        times = [child["response"].get("time") or child["ack_ms"] for child in accepted]
+        accepted_qty = sum((Decimal(child["qty"]) for child in accepted), Decimal(0))
+        requested_qty = sum((Decimal(qty) for qty in children), Decimal(0))
+        response = {
+            "retCode": 0,
+            "retMsg": "OK" if len(accepted) == len(results) else "部分子单失败",
+            "result": {"orderLinkId": prefix, "list": results},
+            "time": max(times),
+            "first_time": min(times),
+            "requested_qty": requested_qty,
+            "accepted_qty": accepted_qty,
+        }
+        self._log(
+            f"拆单完成: {len(accepted)}/{len(results)}个子单受理, "
+            f"数量{accepted_qty}/{requested_qty}, "
+            f"耗时{max(child['elapsed_ms'] for child in results):.1f}ms"
+        )
+        return response
+
+    def track_fills(
+        self,
+        client,
+        response: dict,
+        category: str = "linear",
+        timeout: float = 3.0,
+        poll_interval: float = 0.05,
+    ) -> dict:
+        """
+        按orderLinkId查询每个子单的成交情况，在下单之后调用，不在关键路径上
+        市价单刚成交时历史订单可能还查不到，轮询直到所有子单都到终态或超时，
+        超时时按最后一次查到的成交量计算
+        返回 {"filled_qty", "avg_price", "children": [{orderLinkId, cumExecQty, avgPrice, orderStatus}]}
+        """
+        orders = {}
+        pending = [
+            child["orderLinkId"] for child in response["result"]["list"] if child["ok"]
+        ]
+        deadline = time.perf_counter() + timeout
+        while True:
+            for order_link_id in list(pending):
+                try:
+                    history = client.get_order_history(
+                        category=category,
+                        orderLinkId=order_link_id,
+                    )
+                    if isinstance(history, tuple):
+                        history = history[0]
+                    order_list = history["result"]["list"]
+                except Exception as e:
+                    self._log(f"查询子单{order_link_id}成交失败: {str(e)}")
+                    continue
+                if not order_list:
+                    continue
+                orders[order_link_id] = order_list[0]
+                if order_list[0].get("orderStatus") in FINAL_ORDER_STATUSES:
+                    pending.remove(order_link_id)
+            if not pending or time.perf_counter() >= deadline:
+                break
+            time.sleep(poll_interval)
+        if pending:
+            self._log(f"子单{pending}在{timeout}秒内未确认终态")
+
+        fills = []
+        filled_qty = Decimal(0)
+        filled_value = Decimal(0)
+        for order_link_id, order in orders.items():
+            qty = Decimal(order.get("cumExecQty") or 0)
+            avg_price = Decimal(order.get("avgPrice") or 0)
+            filled_qty += qty
+            filled_value += qty * avg_price
+            fills.append(
+                {
+                    "orderLinkId": order_link_id,
+                    "cumExecQty": qty,
+                    "avgPrice": avg_price,
+                    "orderStatus": order.get("orderStatus"),
+                }
+            )
+        return {
+            "filled_qty": filled_qty,
+            "avg_price": filled_value / filled_qty if filled_qty else Decimal(0),
+            "children": fills,
+        }
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False)
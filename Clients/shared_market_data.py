@@ -0,0 +1,82 @@
+import threading
+import time
+from typing import Dict, Tuple
+
+
+class SharedMarketData(object):
+    """
+    多账户共用的行情层
+    服务器时间、行情和交易对信息只需公开接口，所有账户共用一个不签名的客户端，
+    行情和交易对信息按ttl缓存，同一个key并发请求时只有一个线程真正发出请求，其余等待结果
+    接口与BybitTimeRecordClient的行情方法一致，可直接作为market_client传给交易实例
+    """
+
+    def __init__(self, client, ticker_ttl: float = 0.5, instrument_ttl: float = 300):
+        """
+        client: 行情客户端(BybitTimeRecordClient)，不需要API key
+        ticker_ttl: 行情缓存时间(秒)，触发后同一时刻的多个账户共用一次行情请求
+        instrument_ttl: 交易对信息缓存时间(秒)
+        """
+        self.client = client
+        self.ticker_ttl = ticker_ttl
+        self.instrument_ttl = instrument_ttl
+        self.lock = threading.Lock()
+        # {key: (获取时间, 响应)}
+        self._cache: Dict[Tuple, Tuple[float, dict]] = {}
+        self._key_locks: Dict[Tuple, threading.Lock] = {}
+        self.requests = 0
+        self.hits = 0
+
+    @property
+    def endpoint(self) -> str:
+        return getattr(self.client, "endpoint", "")
+
+    def _key_lock(self, key: Tuple) -> threading.Lock:
+        with self.lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.Lock()
+            return lock
+
+    def _cached(self, key: Tuple, ttl: float, fetch) -> dict:
+        cached = self._cache.get(key)
+        if cached is not None and time.monotonic() - cached[0] < ttl:
+            self.hits += 1
+            return cached[1]
+        with self._key_lock(key):
+            # 等锁期间可能已被其他线程刷新
+            cached = self._cache.get(key)
+            if cached is not None and time.monotonic() - cached[0] < ttl:
+                self.hits += 1
+                return cached[1]
+            response = fetch()
+            if isinstance(response, tuple):
+                response = response[0]
+            self.requests += 1
+            if response.get("retCode") == 0:
+                self._cache[key] = (time.monotonic(), response)
+            return response
+
+    def get_server_time(self):
+        """服务器时间不缓存"""
+        return self.client.get_server_time()
+
+    def get_average_response_time(self):
+        return self.client.get_average_response_time()
+
+    def get_tickers(self, **kwargs):
+        key = ("tickers",) + tuple(sorted(kwargs.items()))
+        return self._cached(
+            key, self.ticker_ttl, lambda: self.client.get_tickers(**kwargs)
+        )
+
+    def get_instruments_info(self, **kwargs):
+        key = ("instruments",) + tuple(sorted(kwargs.items()))
+        return self._cached(
+            key,
+            self.instrument_ttl,
+            lambda: self.client.get_instruments_info(**kwargs),
+        )
+
+    def get_stats(self) -> dict:
+        return {"requests": self.requests, "hits": self.hits}
@@ -5,6 +5,9 @@ from config import BYBIT_API_KEY, BYBIT_API_SECRET
 import math
 from decimal import Decimal as decimal
 from collections import deque
+from Clients.account_config import AccountConfigCache
+from Clients.order_slicer import OrderSlicer, split_qty
+from tools.clock import REAL_CLOCK
 
 # 初始化Bybit API客户端
 client = HTTP(
@@ -15,6 +18,16 @@ client = HTTP(
 client.record_request_time = True
 client.retry_delay = 0.1
 response_time_records = deque(maxlen=10)
+# 等待使用的时钟，模拟时替换为tools.clock.VirtualClock
+clock = REAL_CLOCK
+# 域名选择器(Clients.endpoint_selector.EndpointSelector)，为None时使用pybit默认域名
+endpoint_selector = None
+# 杠杆缓存，连续运行时相同杠杆不再重复设置
+account_config = AccountConfigCache(client)
+# 本地订单簿(tools.order_book.OrderBookManager，需已start)，为None时按lastPrice定量
+order_book_manager = None
+# 按订单簿定量时允许的最大滑点(bps)
+max_slippage_bps = 30
 
 
 def format_num_by_step(num, step):
@@ -37,27 +50,65 @@ def get_server_time():
     return None
 
 
+def limit_qty_by_order_book(symbol, qty, max_position_value, qty_step):
+    """按本地订单簿的吃单均价和滑点上限修正数量，订单簿不可用时原样返回"""
+    if order_book_manager is None:
+        return qty
+    book, reason = order_book_manager.usable_book(symbol, max_age_ms=500)
+    if book is None:
+        print(f"{reason}，按lastPrice定量")
+        return qty
+    limited, vwap, worst_price, depth_qty = book.limit_qty(
+        "Buy", float(qty), float(max_position_value), max_slippage_bps
+    )
+    print(
+        f"订单簿定量: 吃单均价{vwap}, 最差价{worst_price}, {max_slippage_bps}bps内可成交{depth_qty}"
+    )
+    return format_num_by_step(min(qty, decimal(str(limited))), qty_step)
+
+
+def get_server_offset_ns():
+    """服务器时间减本地时钟(纳秒)，按请求往返时间的一半修正，请求失败时返回None"""
+    try:
+        time_response = client.get_server_time()
+        now_ns = clock.time_ns()
+        elapsed_ns = int(time_response[1].total_seconds() * 1e9)
+        time_response = time_response[0]
+        if time_response.get("retCode") == 0:
+            server_ns = int(time_response["result"]["timeNano"])
+            return server_ns - (now_ns - elapsed_ns // 2)
+    except Exception as e:
+        print(f"获取服务器时间失败: {str(e)}")
+    return None
+
+
 def wait_until(target_time):
-    """等待直到目标时间，使用服务器时间"""
+    """
+    等待直到目标时间(服务器时间)
+    开始时请求一次服务器时间得到与本地时钟的偏差，之后只按clock计时，
+    模拟时clock替换为VirtualClock即可驱动等待
+    """
+    offset_ns = get_server_offset_ns()
+    while offset_ns is None:
+        clock.sleep(1)
+        offset_ns = get_server_offset_ns()
+    # 目标时间换算到本地时钟
+    target_ns = int(target_time.timestamp() * 1e9) - offset_ns
     while True:
-        server_time = get_server_time()
-        if not server_time:
-            time.sleep(1)
-            continue
-
-        if server_time >= target_time:
+        wait_seconds = (target_ns - clock.time_ns()) / 1e9
+        if wait_seconds <= 0:
             break
-
-        # 计算等待时间
-        wait_seconds = (target_time - server_time).total_seconds()
         if wait_seconds > 5:
-            time.sleep(5)  # 长等待时间，每5秒同步一次
+            clock.sleep(5)  # 长等待时间，每5秒检查一次
         else:
-            time.sleep(0.1)  # 接近目标时间，更频繁地同步
+            clock.sleep(min(wait_seconds, 0.1))  # 接近目标时间，更频繁地检查
 
 
-def main(symbol, time_tuple, seperate_into=1):
+def main(symbol, time_tuple, seperate_into=1, max_child_orders=1):
     try:
+        if endpoint_selector is not None:
+            # 等待开仓前切到最快的域名
+            endpoint_selector.apply(client)
         # 设置目标时间
         server_time = get_server_time()
         if not server_time:
@@ -112,16 +163,9 @@ def main(symbol, time_tuple, seperate_into=1):
 
         # 设置合约端杠杆
         try:
-            client.set_leverage(
-                category="linear",
-                symbol=symbol,
-                buyLeverage=str(leverage),
-                sellLeverage=str(leverage),
-            )
+            account_config.ensure_leverage("linear", symbol, leverage)
         except Exception as e:
-            if "leverage not modified" in str(e):
-                # 已经设置过2倍杠杆，再次设置就会报错
-                pass
+            print(f"设置杠杆失败: {str(e)}")
 
         # 等待开仓时间
         print(f"等待开仓时间: {target_open_time}")
@@ -150,19 +194,25 @@ def main(symbol, time_tuple, seperate_into=1):
         # 确保数量符合步长要求并不超过最大下单限制
         qty = format_num_by_step(qty, qty_step)  # 按步长格式化
         qty = max(
-            min_order_qty, min(qty, max_order_qty)
-        )  # 确保在最小和最大下单限制之间
+            min_order_qty, min(qty, max_order_qty * max_child_orders)
+        )  # 确保在最小和最大下单限制之间，超过单笔上限的部分拆成子单
+        qty = max(
+            min_order_qty,
+            limit_qty_by_order_book(symbol, qty, max_position_value, qty_step),
+        )
 
         # 最终确定下单数量
         finalQTY = qty
+        children = split_qty(finalQTY, max_order_qty, min_order_qty, qty_step)
+        slicer = OrderSlicer(client.place_order, max_workers=len(children))
 
-        # 开仓
-        open_order = client.place_order(
+        # 开仓，子单并发发出
+        open_order = slicer.place_sliced_order(
+            children,
             category="linear",
             symbol=symbol,
             side="Buy",
             order_type="Market",
-            qty=finalQTY,
             reduce_only=False,
             price=current_price,
         )
@@ -173,17 +223,19 @@ def main(symbol, time_tuple, seperate_into=1):
         wait_until(target_close_time)
 
         # 平仓
-        close_order = client.place_order(
+        close_order = slicer.place_sliced_order(
+            children,
             category="linear",
             symbol=symbol,
             side="Sell",
             order_type="Market",
-            qty=finalQTY,
             reduce_only=True,
         )
         print(f"平仓成功: {close_order}")
+        slicer.close()
     except Exception as e:
         print(f"交易执行错误: {str(e)}")
+        account_config.invalidate_on_reject(e, "linear", symbol)
 
 
 if __name__ == "__main__":
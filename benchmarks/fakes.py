@@ -0,0 +1,337 @@
+import base64
+import gzip
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+from tools.ns_time import from_datetime
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ARBITRAGE_LIST_FILE = os.path.join(ROOT_DIR, "arbitrage_list.json")
+
+
+def load_arbitrage_list():
+    with open(ARBITRAGE_LIST_FILE) as f:
+        return json.load(f)
+
+
+class FakeBybitClient(object):
+    """
+    离线的Bybit客户端，接口返回值与pybit一致
+    交易对和价格由arbitrage_list.json生成，用于基准测试不依赖网络
+    """
+
+    def __init__(self, arbitrage_list=None) -> None:
+        arbitrage_list = arbitrage_list or load_arbitrage_list()
+        symbols = sorted({item["symbol"] for item in arbitrage_list})
+        self.linear_instruments = {
+            "retCode": 0,
+            "result": {
+                "list": [
+                    {
+                        "symbol": symbol,
+                        "status": "Trading",
+                        "lotSizeFilter": {
+                            "qtyStep": "0.1",
+                            "minOrderQty": "0.1",
+                            "maxMktOrderQty": "100000",
+                        },
+                        "leverageFilter": {"maxLeverage": "50"},
+                    }
+                    for symbol in symbols
+                ]
+            },
+        }
+        self.spot_instruments = {
+            "retCode": 0,
+            "result": {
+                "list": [
+                    {"symbol": symbol, "status": "Trading", "marginTrading": "both"}
+                    for symbol in symbols
+                ]
+            },
+        }
+        self.tickers = {
+            item["symbol"]: {
+                "symbol": item["symbol"],
+                "lastPrice": "1.2345",
+                "fundingRate": str(item["fundingRate"] / 100),
+                "nextFundingTime": "1742140800000",
+            }
+            for item in arbitrage_list
+        }
+
+    def get_instruments_info(self, category, **kwargs):
+        if category == "spot":
+            return self.spot_instruments
+        return self.linear_instruments
+
+    def get_tickers(self, category, symbol=None, **kwargs):
+        if symbol is None:
+            return {"retCode": 0, "result": {"list": list(self.tickers.values())}}
+        return {"retCode": 0, "result": {"list": [self.tickers[symbol]]}}
+
+    def get_positions(self, category, settleCoin=None, limit=20, cursor=None, **kwargs):
+        self.config_reads = getattr(self, "config_reads", 0) + 1
+        leverage = getattr(self, "leverage", {})
+        symbols = sorted(self.tickers)
+        start = int(cursor or 0)
+        page = symbols[start : start + limit]
+        next_cursor = str(start + limit) if start + limit < len(symbols) else ""
+        return {
+            "retCode": 0,
+            "result": {
+                "list": [
+                    {
+                        "symbol": symbol,
+                        "leverage": leverage.get(symbol, "10"),
+                        "size": "0",
+                    }
+                    for symbol in page
+                ],
+                "nextPageCursor": next_cursor,
+            },
+        }
+
+    def set_leverage(self, category, symbol, buyLeverage, sellLeverage):
+        self.config_writes = getattr(self, "config_writes", 0) + 1
+        if not hasattr(self, "leverage"):
+            self.leverage = {}
+        if self.leverage.get(symbol, "10") == buyLeverage:
+            raise Exception("leverage not modified (ErrCode: 110043)")
+        self.leverage[symbol] = buyLeverage
+        return {"retCode": 0, "result": {}}
+
+
+def make_linear_tickers_body(arbitrage_list=None) -> bytes:
+    """与Bybit linear全量行情字段一致的响应体(每条约25个字段)，用于比较解码开销"""
+    arbitrage_list = arbitrage_list or load_arbitrage_list()
+    tickers = []
+    for i, item in enumerate(arbitrage_list):
+        price = "%.4f" % (1 + i * 0.37)
+        tickers.append(
+            {
+                "symbol": item["symbol"],
+                "lastPrice": price,
+                "indexPrice": price,
+                "markPrice": price,
+                "prevPrice24h": price,
+                "price24hPcnt": "-0.012345",
+                "highPrice24h": price,
+                "lowPrice24h": price,
+                "prevPrice1h": price,
+                "openInterest": "1234567.8",
+                "openInterestValue": "9876543.21",
+                "turnover24h": "123456789.1234",
+                "volume24h": "98765432.1",
+                "fundingRate": str(item["fundingRate"] / 100),
+                "nextFundingTime": "1742140800000",
+                "predictedDeliveryPrice": "",
+                "basisRate": "",
+                "deliveryFeeRate": "",
+                "deliveryTime": "0",
+                "ask1Size": "1234.5",
+                "bid1Price": price,
+                "ask1Price": price,
+                "bid1Size": "2345.6",
+                "basis": "",
+                "fundingIntervalHour": "8",
+                "fundingCap": "0.02",
+            }
+        )
+    payload = {
+        "retCode": 0,
+        "retMsg": "OK",
+        "result": {"category": "linear", "list": tickers},
+        "retExtInfo": {},
+        "time": 1742140000000,
+    }
+    return json.dumps(payload).encode()
+
+
+def _encrypt(plain: bytes, key: str) -> str:
+    """decrypt_utils.Yt的逆过程：gzip -> AES-ECB -> base64"""
+    from Crypto.Cipher import AES
+    from Crypto.Util.Padding import pad
+
+    aes = AES.new(key.encode(), AES.MODE_ECB)
+    return base64.b64encode(aes.encrypt(pad(gzip.compress(plain), AES.block_size)))
+
+
+class FakeCoinglassResponse(object):
+    """按coinglass加密格式构造的响应，供decrypt_response使用"""
+
+    def __init__(self, payload: dict, data_key: str = "0123456789abcdef") -> None:
+        url_key = base64.b64encode(
+            "coinglass/api/fundingRate/interestArbitragecoinglass".encode()
+        ).decode()[:16]
+        self.headers = {"user": _encrypt(data_key.encode(), url_key).decode()}
+        self._json = {"data": _encrypt(json.dumps(payload).encode(), data_key).decode()}
+
+    def json(self):
+        return self._json
+
+
+class SimulatedClock(object):
+    """
+    模拟时钟，sleep直接推进时间
+    server_time 返回带网络延迟的服务器时间
+    """
+
+    def __init__(self, start: datetime, latency: timedelta) -> None:
+        self.now = start
+        self.latency = latency
+
+    def sleep(self, seconds: float):
+        self.now += timedelta(seconds=seconds)
+
+    def server_time(self) -> datetime:
+        # 请求发出到返回花费一个往返，服务器时间是请求中途采样的
+        self.now += self.latency
+        return self.now - self.latency / 2
+
+    def server_time_ns(self) -> int:
+        return from_datetime(self.server_time())
+
+
+class _StaticResponse(object):
+    def __init__(self, payload) -> None:
+        self.payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+class StaticSession(object):
+    """
+    requests.Session的本地替身，按url返回固定数据
+    delays: {url: 秒} 模拟各交易所的响应时间
+    """
+
+    def __init__(self, payloads: dict, delays: dict = None) -> None:
+        self.payloads = payloads
+        self.delays = delays or {}
+
+    def get(self, url, params=None, timeout=None):
+        delay = self.delays.get(url)
+        if delay:
+            time.sleep(delay)
+        if url not in self.payloads:
+            raise Exception(f"404: {url}")
+        return _StaticResponse(self.payloads[url])
+
+    def close(self):
+        pass
+
+
+def make_venue_payloads(arbitrage_list=None) -> dict:
+    """按各交易所公开接口格式构造资金费率数据，url与DEFAULT_SOURCES、DEFAULT_INTERVAL_SOURCES一致"""
+    from ArbitrageData.funding_collector import (
+        DEFAULT_INTERVAL_SOURCES,
+        DEFAULT_SOURCES,
+    )
+
+    arbitrage_list = arbitrage_list or load_arbitrage_list()
+    next_time = 1742140800000
+    urls = {venue: source[0] for venue, source in DEFAULT_SOURCES.items()}
+    interval_url = DEFAULT_INTERVAL_SOURCES["Binance"][0]
+    return {
+        # 前几个交易对调整为4小时结算
+        interval_url: [
+            {
+                "symbol": item["symbol"],
+                "adjustedFundingRateCap": "0.02000000",
+                "adjustedFundingRateFloor": "-0.02000000",
+                "fundingIntervalHours": 4,
+            }
+            for item in arbitrage_list[:5]
+        ],
+        urls["Bybit"]: FakeBybitClient(arbitrage_list).get_tickers(category="linear"),
+        urls["Binance"]: [
+            {
+                "symbol": item["symbol"],
+                "lastFundingRate": str(item["fundingRate"] / 200),
+                "nextFundingTime": next_time,
+            }
+            for item in arbitrage_list
+        ],
+        urls["OKX"]: {
+            "data": [
+                {
+                    "instId": f"{item['currency']}-USDT-SWAP",
+                    "fundingRate": str(item["fundingRate"] / 300),
+                    "fundingTime": str(next_time),
+                    "nextFundingTime": str(next_time + 28800000),
+                }
+                for item in arbitrage_list
+            ]
+        },
+        urls["Gate"]: [
+            {
+                "name": f"{item['currency']}_USDT",
+                "funding_rate": str(item["fundingRate"] / 400),
+                "funding_next_apply": next_time // 1000,
+                "funding_interval": 14400,
+            }
+            for item in arbitrage_list
+        ],
+    }
+
+
+class LocalBybitServer(object):
+    """
+    本地HTTP替身，模拟一个Bybit域名，用于域名选择测试
+    所有GET请求返回retCode为0的服务器时间，delay为每次响应前的等待，error_every为每隔几次返回一次500
+    """
+
+    def __init__(self, delay: float = 0.0, error_every: int = 0) -> None:
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                server.requests += 1
+                time.sleep(server.delay)
+                if server.error_every and server.requests % server.error_every == 0:
+                    status, body = 500, b"{}"
+                else:
+                    now_ns = time.time_ns()
+                    status = 200
+                    body = json.dumps(
+                        {
+                            "retCode": 0,
+                            "retMsg": "OK",
+                            "result": {
+                                "timeSecond": str(now_ns // 1000000000),
+                                "timeNano": str(now_ns),
+                            },
+                            "time": now_ns // 1000000,
+                        }
+                    ).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.delay = delay
+        self.error_every = error_every
+        self.requests = 0
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
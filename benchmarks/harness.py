@@ -0,0 +1,120 @@
+import json
+import os
+import platform
+import statistics
+import time
+from typing import Callable, Dict, List, Optional
+
+# 基准测试注册表，格式：{name: (func, number)}
+# func 每调用一次执行一次被测操作，返回值忽略；
+# 需要准备数据的用例返回 (setup, run) 形式见 benchmark 装饰器说明
+BENCHMARKS: Dict[str, tuple] = {}
+
+
+def benchmark(name: str, number: int = 1000, repeat: int = 5):
+    """
+    注册基准测试
+    被装饰的函数负责准备数据，并返回一个无参数的callable作为被测操作，
+    被测操作会执行 repeat 轮，每轮 number 次
+    需要清理环境的可返回 (被测操作, 清理函数)
+    也可以直接返回 {指标名: 数值} 的dict，作为自定义指标（如唤醒误差）记录
+    """
+
+    def wrapper(func: Callable):
+        BENCHMARKS[name] = (func, number, repeat)
+        return func
+
+    return wrapper
+
+
+def measure(operation: Callable, number: int, repeat: int) -> Dict:
+    """执行被测操作，返回每次调用的耗时统计(微秒)"""
+    # 预热一轮，排除首次导入/缓存的影响
+    for _ in range(min(number, 10)):
+        operation()
+    samples: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        for _ in range(number):
+            operation()
+        samples.append((time.perf_counter_ns() - start) / number / 1000)
+    return {
+        "unit": "us/op",
+        "number": number,
+        "repeat": repeat,
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.mean(samples),
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+    }
+
+
+def run_benchmarks(selected: Optional[List[str]] = None) -> Dict:
+    results = {}
+    for name, (func, number, repeat) in BENCHMARKS.items():
+        if selected and not any(name.startswith(prefix) for prefix in selected):
+            continue
+        try:
+            prepared = func()
+            teardown = None
+            if isinstance(prepared, tuple):
+                prepared, teardown = prepared
+            try:
+                if callable(prepared):
+                    results[name] = measure(prepared, number, repeat)
+                else:
+                    results[name] = prepared
+            finally:
+                if teardown is not None:
+                    teardown()
+        except Exception as e:
+            results[name] = {"error": repr(e)}
+        print(f"{name}: {results[name]}")
+    return {
+        "meta": {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+
+def compare(current: Dict, baseline: Dict, threshold: float = 0.2) -> List[str]:
+    """
+    和基线对比，返回超出阈值的退化项
+    计时类结果比较median，自定义指标比较同名数值（越小越好）
+    """
+    regressions = []
+    base_results = baseline.get("results", {})
+    for name, result in current.get("results", {}).items():
+        base = base_results.get(name)
+        if not base or "error" in result or "error" in base:
+            continue
+        keys = ["median"] if "median" in result else list(result)
+        for key in keys:
+            new_value = result.get(key)
+            old_value = base.get(key)
+            if not isinstance(new_value, (int, float)) or not isinstance(
+                old_value, (int, float)
+            ):
+                continue
+            if old_value > 0 and new_value > old_value * (1 + threshold):
+                regressions.append(
+                    f"{name}.{key}: {old_value:.3f} -> {new_value:.3f} "
+                    f"(+{(new_value / old_value - 1) * 100:.1f}%)"
+                )
+    return regressions
+
+
+def load_json(path: str) -> Dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_json(data: Dict, path: str):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
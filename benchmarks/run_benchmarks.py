@@ -0,0 +1,492 @@
+"""
+交易关键路径的基准测试
+
+用法（在仓库根目录执行）：
+    python -m benchmarks.run_benchmarks                       # 运行全部，结果写入bench_output.json
+    python -m benchmarks.run_benchmarks --only strategy       # 只运行名称以strategy开头的用例
+    python -m benchmarks.run_benchmarks --save-baseline       # 保存为基线
+    python -m benchmarks.run_benchmarks --baseline benchmarks/baseline.json
+                                                              # 与基线对比，退化超过阈值时返回码为1
+"""
+
+import argparse
+import io
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import (  # noqa: E402
+    FakeBybitClient,
+    FakeCoinglassResponse,
+    LocalBybitServer,
+    SimulatedClock,
+    StaticSession,
+    load_arbitrage_list,
+    make_linear_tickers_body,
+    make_venue_payloads,
+)
+from benchmarks.harness import (  # noqa: E402
+    benchmark,
+    compare,
+    load_json,
+    run_benchmarks,
+    save_json,
+)
+
+DEFAULT_OUTPUT = "bench_output.json"
+DEFAULT_BASELINE = os.path.join("benchmarks", "baseline.json")
+
+
+def make_strategy(data_source="coinglass"):
+    """
+    构造使用离线客户端的策略实例，资金费率数据来自arbitrage_list.json
+    返回 (策略, 清理函数)，清理函数停止patch、关闭持仓日志并删除临时目录
+    """
+    from strategies import funding_rate_arbitrage
+    from strategies.funding_rate_arbitrage import FundingRateArbitrage
+
+    journal_dir = tempfile.TemporaryDirectory(prefix="bench_journal_")
+    strategy = FundingRateArbitrage(
+        api_key="bench",
+        api_secret="bench",
+        journal_file=os.path.join(journal_dir.name, "positions.jsonl"),
+        data_source=data_source,
+    )
+    strategy.client = FakeBybitClient()
+    strategy.universe.client = strategy.client
+    strategy.exit_engine.client = strategy.client
+    arbitrage_list = load_arbitrage_list()
+    patcher = mock.patch.object(
+        funding_rate_arbitrage,
+        "get_bybit_interestArbitrage_data",
+        lambda: arbitrage_list,
+    )
+    patcher.start()
+
+    def teardown():
+        patcher.stop()
+        strategy.journal.close()
+        journal_dir.cleanup()
+
+    return strategy, teardown
+
+
+@benchmark("strategy.calculate_profit", number=100000)
+def bench_calculate_profit():
+    strategy, teardown = make_strategy()
+    return lambda: strategy.calculate_profit(-0.5, 7.5), teardown
+
+
+@benchmark("strategy.find_arbitrage_opportunities", number=200)
+def bench_find_arbitrage_opportunities():
+    """稳态扫描：机会排行已存在，只处理变化"""
+    strategy, teardown = make_strategy()
+    return strategy.find_arbitrage_opportunities, teardown
+
+
+@benchmark("strategy.find_arbitrage_opportunities.cold", number=200)
+def bench_find_arbitrage_opportunities_cold():
+    """冷启动扫描：每次都从空的机会排行开始"""
+    from strategies.opportunity_book import OpportunityBook
+
+    strategy, teardown = make_strategy()
+
+    def operation():
+        strategy.opportunity_book = OpportunityBook(
+            strategy.calculate_profit, strategy.min_funding_rate
+        )
+        strategy._universe_version = None
+        strategy.find_arbitrage_opportunities()
+
+    return operation, teardown
+
+
+@benchmark("strategy.find_arbitrage_opportunities.bybit_native", number=200)
+def bench_find_arbitrage_opportunities_native():
+    """稳态扫描，资金费率来自Bybit linear全量行情"""
+    strategy, teardown = make_strategy("bybit")
+    return strategy.find_arbitrage_opportunities, teardown
+
+
+@benchmark("scanner.parse_bybit_tickers", number=200)
+def bench_parse_bybit_tickers():
+    """全量行情转为套利列表格式，与coinglass.decrypt_response对比"""
+    from ArbitrageData.bybit_native import parse_bybit_tickers
+
+    payload = FakeBybitClient().get_tickers(category="linear")
+    return lambda: parse_bybit_tickers(payload)
+
+
+@benchmark("decode.tickers.stdlib", number=200)
+def bench_decode_tickers_stdlib():
+    """现有路径：标准库解码完整行情(requests的.json())，再转为套利列表"""
+    import json
+
+    from ArbitrageData.bybit_native import parse_bybit_tickers
+
+    body = make_linear_tickers_body()
+    return lambda: parse_bybit_tickers(json.loads(body))
+
+
+@benchmark("decode.tickers.fast_dict", number=200)
+def bench_decode_tickers_fast_dict():
+    """扫描器路径：orjson解码完整行情，直接转为套利列表"""
+    from ArbitrageData.bybit_native import parse_bybit_tickers
+    from Clients.fast_json import loads
+
+    body = make_linear_tickers_body()
+    return lambda: parse_bybit_tickers(loads(body))
+
+
+@benchmark("coinglass.decrypt_response", number=200)
+def bench_decrypt_response():
+    from ArbitrageData.decrypt_utils import decrypt_response
+
+    response = FakeCoinglassResponse(load_arbitrage_list())
+    return lambda: decrypt_response(response)
+
+
+@benchmark("utils.format_num_by_step", number=100000)
+def bench_format_num_by_step():
+    from tools.utils import format_num_by_step
+
+    qty = Decimal("12345.678901")
+    step = Decimal("0.1")
+    return lambda: format_num_by_step(qty, step)
+
+
+def _patch_http_get_tickers():
+    """让pybit的get_tickers直接返回固定结果，只测量包装层开销"""
+    from pybit.unified_trading import HTTP
+
+    response = FakeBybitClient().get_tickers(category="linear", symbol="LAIUSDT")
+    elapsed = timedelta(microseconds=1234)
+    headers = {"X-Bapi-Limit-Status": "119", "X-Bapi-Limit": "120"}
+    return mock.patch.object(
+        HTTP,
+        "get_tickers",
+        lambda self, *args, **kwargs: (response, elapsed, headers),
+    )
+
+
+@benchmark("client.get_tickers.raw", number=50000)
+def bench_client_raw():
+    from Clients.bybit_client import BybitTimeRecordClient
+    from tools.customer_loger import logger
+
+    from pybit.unified_trading import HTTP
+
+    patcher = _patch_http_get_tickers()
+    patcher.start()
+    client = BybitTimeRecordClient(logger=logger)
+    # 绕过包装层直接调用pybit
+    return lambda: HTTP.get_tickers(client, category="linear", symbol="LAIUSDT"), (
+        patcher.stop
+    )
+
+
+@benchmark("client.get_tickers.wrapped", number=50000)
+def bench_client_wrapped():
+    from Clients.bybit_client import BybitTimeRecordClient
+    from tools.customer_loger import logger
+
+    patcher = _patch_http_get_tickers()
+    patcher.start()
+    client = BybitTimeRecordClient(logger=logger)
+    return lambda: client.get_tickers(category="linear", symbol="LAIUSDT"), (
+        patcher.stop
+    )
+
+
+@benchmark("logging.test_run_sinks", number=20000)
+def bench_logging():
+    """与test_run.py相同的stdout格式和按symbol过滤的文件sink"""
+    from tools.customer_loger import logger
+
+    symbol = "VIDTUSDT"
+    customer_format = "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green>| <level>{level:<8}</level>| <cyan>{function}</cyan>:<cyan>{line}</cyan>-{extra[name]} <level>{message}</level>"
+    log_dir = tempfile.TemporaryDirectory(prefix="bench_logs_")
+    handler_ids = [
+        logger.add(io.StringIO(), format=customer_format),
+        logger.add(
+            os.path.join(log_dir.name, f"{symbol}_BybitSingleDirectionTrade.log"),
+            format="{time:YYYY-MM-DD HH:mm:ss.SSS} | {extra[name]} | {level} | {function}:{line} - {message}",
+            filter=lambda record: record["extra"]["name"] == symbol,
+            rotation="200MB",
+        ),
+    ]
+    symbol_logger = logger.bind(name=symbol)
+    microseconds = 1234
+
+    def teardown():
+        for handler_id in handler_ids:
+            logger.remove(handler_id)
+        log_dir.cleanup()
+
+    return (
+        lambda: symbol_logger.info(f"get_tickers请求耗时：{microseconds}"),
+        teardown,
+    )
+
+
+class FakeTimeClient(object):
+    def __init__(self, latency: timedelta) -> None:
+        self.latency = latency
+
+    def get_average_response_time(self):
+        return self.latency.total_seconds() * 1000000
+
+
+@benchmark("wait_until.wake_error")
+def bench_wait_until():
+    """
+    模拟时钟下wait_until的唤醒精度
+    唤醒误差 = 订单到达交易所的时间 - 目标时间，正数表示晚到
+    """
+    from single_direction_trade.abstract_base import SingleDirectionTrade
+    from tools.ns_time import from_datetime
+
+    class SimulatedTrade(SingleDirectionTrade):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.polls = 0
+
+        def get_server_time_ns(self):
+            self.polls += 1
+            return self.clock.server_time_ns()
+
+    errors = []
+    polls = []
+    start = datetime(2025, 3, 16, 7, 59, 0)
+    target = datetime(2025, 3, 16, 8, 0, 0)
+    with mock.patch("builtins.print"):
+        for latency_ms in (5, 20, 50, 120, 250):
+            latency = timedelta(milliseconds=latency_ms)
+            clock = SimulatedClock(start, latency)
+            trade = SimulatedTrade("BENCHUSDT", logger=None, clock=clock)
+            trade.client = FakeTimeClient(latency)
+            trade.wait_until(from_datetime(target))
+            # 唤醒后立即下单，单程延迟后到达交易所
+            arrival = clock.now + latency / 2
+            errors.append((arrival - target).total_seconds() * 1000)
+            polls.append(trade.polls)
+    return {
+        "unit": "ms",
+        "mean_abs_wake_error": sum(abs(e) for e in errors) / len(errors),
+        "max_abs_wake_error": max(abs(e) for e in errors),
+        "mean_polls": sum(polls) / len(polls),
+    }
+
+
+@benchmark("clock.virtual_day", number=1, repeat=3)
+def bench_virtual_day():
+    """
+    虚拟时钟下回放一天：4个symbol各自在线程中等待当天3次结算
+    每次等待约8小时、数千次轮询，真实耗时应在秒级以内
+    """
+    import threading
+
+    from single_direction_trade.abstract_base import SingleDirectionTrade
+    from tools.clock import VirtualClock
+    from tools.ns_time import from_datetime
+
+    class VirtualTrade(SingleDirectionTrade):
+        def get_server_time_ns(self):
+            return self.clock.time_ns()
+
+    symbols = ("AUSDT", "BUSDT", "CUSDT", "DUSDT")
+    day = datetime(2025, 3, 16)
+    settlements = [from_datetime(day + timedelta(hours=hour)) for hour in (8, 16, 24)]
+
+    def replay():
+        clock = VirtualClock(day)
+        # 所有线程登记为参与者后才开始等待，避免先启动的线程独自推进时间
+        barrier = threading.Barrier(len(symbols))
+
+        def run(symbol):
+            trade = VirtualTrade(symbol, logger=None, clock=clock)
+            trade.client = FakeTimeClient(timedelta(milliseconds=20))
+            with clock.participant():
+                barrier.wait()
+                for settlement in settlements:
+                    trade.wait_until(settlement)
+
+        threads = [threading.Thread(target=run, args=(symbol,)) for symbol in symbols]
+        with mock.patch("builtins.print"):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+    return replay
+
+
+def _busy_noise(stop):
+    """模拟其他symbol轮询和日志占用解释器"""
+    while not stop.is_set():
+        sum(range(1000))
+
+
+@benchmark("firing.wake_jitter", number=1, repeat=1)
+def bench_firing_wake_jitter():
+    """
+    两个后台线程持续占用解释器，分别用现有的10ms轮询、默认触发线程、
+    绑定到最后一个CPU并尝试实时调度的触发线程等待20个唤醒点，记录唤醒误差p50/p99(微秒)
+    """
+    import os
+    import threading
+    import time
+
+    from tools.firing_thread import FiringThread
+
+    def poll(deadline_ns):
+        while time.perf_counter_ns() < deadline_ns:
+            time.sleep(0.01)
+        return time.perf_counter_ns() - deadline_ns
+
+    def percentile(values, probability):
+        values = sorted(values)
+        return values[min(len(values) - 1, int(probability * len(values)))] / 1000
+
+    cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else []
+    stop = threading.Event()
+    noise = [threading.Thread(target=_busy_noise, args=(stop,)) for _ in range(2)]
+    for thread in noise:
+        thread.start()
+    metrics = {"unit": "us"}
+    try:
+        jitters = []
+        for _ in range(20):
+            jitters.append(poll(time.perf_counter_ns() + 20 * 1000000))
+        metrics["poll_p50"] = percentile(jitters, 0.5)
+        metrics["poll_p99"] = percentile(jitters, 0.99)
+        configs = {
+            "firing": {},
+            "firing_pinned": {"cpus": cpus[-1:] or None, "realtime": True},
+        }
+        for name, options in configs.items():
+            with mock.patch("builtins.print"):
+                firing = FiringThread(name=name, **options)
+            for _ in range(20):
+                deadline_ns = time.perf_counter_ns() + 20 * 1000000
+                firing.fire_at(deadline_ns, lambda: None).result()
+            firing.close()
+            stats = firing.get_stats()
+            metrics[f"{name}_p50"] = stats["p50_us"]
+            metrics[f"{name}_p99"] = stats["p99_us"]
+            metrics[f"{name}_applied"] = "error" not in stats["applied"]
+    finally:
+        stop.set()
+        for thread in noise:
+            thread.join()
+    return metrics
+
+
+@benchmark("endpoint.select")
+def bench_endpoint_select():
+    """
+    三个本地域名替身分别延迟1/5/2ms，其中2ms的每3次请求失败一次
+    选择器应选中1ms的域名，selection_miss为1表示选错，同时记录选中域名与默认(第一个)域名的p99
+    """
+    from Clients.endpoint_selector import EndpointSelector
+
+    servers = [
+        LocalBybitServer(delay=0.005),
+        LocalBybitServer(delay=0.002, error_every=3),
+        LocalBybitServer(delay=0.001),
+    ]
+    try:
+        selector = EndpointSelector(
+            [server.url for server in servers], samples=30, interval=3600
+        )
+        with mock.patch("builtins.print"):
+            best = selector.probe_all()
+        ranking = {item["url"]: item for item in selector.rank()}
+        return {
+            "unit": "ms",
+            "selection_miss": int(best != servers[2].url),
+            "selected_p99": ranking[best]["p99_ms"],
+            "default_p99": ranking[servers[0].url]["p99_ms"],
+            "flaky_error_rate": ranking[servers[1].url]["error_rate"],
+        }
+    finally:
+        for server in servers:
+            server.close()
+
+
+@benchmark("account_config.per_trade", number=1, repeat=1)
+def bench_account_config():
+    """
+    所有交易对已是10倍杠杆，其中5个需要改为5倍
+    预载后第一轮只应设置需要修改的5个，之后每轮每笔交易的配置请求数应为0
+    """
+    from Clients.account_config import AccountConfigCache
+
+    client = FakeBybitClient()
+    symbols = sorted(client.tickers)
+    targets = {symbol: 5 if i < 5 else 10 for i, symbol in enumerate(symbols)}
+    cache = AccountConfigCache(client)
+    cache.seed("linear")
+    seed_reads = client.config_reads
+    rounds = []
+    with mock.patch("builtins.print"):
+        for _ in range(3):
+            before = getattr(client, "config_writes", 0)
+            for symbol in symbols:
+                cache.ensure_leverage("linear", symbol, targets[symbol])
+            rounds.append(getattr(client, "config_writes", 0) - before)
+    return {
+        "unit": "calls",
+        "seed_reads": seed_reads,
+        "first_round_writes": rounds[0],
+        "steady_writes_per_trade": sum(rounds[1:]) / (len(symbols) * (len(rounds) - 1)),
+    }
+
+
+@benchmark("collector.collect", number=5, repeat=3)
+def bench_funding_collector():
+    """各交易所分别延迟20/40/60/80ms，并发采集一轮耗时应接近80ms而不是200ms"""
+    from ArbitrageData.funding_collector import DEFAULT_SOURCES, FundingRateCollector
+
+    payloads = make_venue_payloads()
+    delays = {
+        source[0]: 0.02 * (i + 1) for i, source in enumerate(DEFAULT_SOURCES.values())
+    }
+    collector = FundingRateCollector(session=StaticSession(payloads, delays))
+    return collector.collect, collector.close
+
+
+def main():
+    parser = argparse.ArgumentParser(description="交易关键路径基准测试")
+    parser.add_argument("--only", nargs="*", help="只运行名称以这些前缀开头的用例")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="结果输出文件")
+    parser.add_argument("--baseline", help="对比的基线文件")
+    parser.add_argument(
+        "--save-baseline", action="store_true", help=f"保存结果为{DEFAULT_BASELINE}"
+    )
+    parser.add_argument("--threshold", type=float, default=0.2, help="退化阈值")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.only)
+    save_json(results, args.output)
+    print(f"结果已写入: {args.output}")
+    if args.save_baseline:
+        save_json(results, DEFAULT_BASELINE)
+        print(f"基线已保存: {DEFAULT_BASELINE}")
+    if args.baseline:
+        regressions = compare(results, load_json(args.baseline), args.threshold)
+        if regressions:
+            print("性能退化:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("未发现超过阈值的性能退化")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,38 @@
 from config import BYBIT_API_KEY, BYBIT_API_SECRET
+from pybit.unified_trading import HTTP
+
 from strategies.funding_rate_arbitrage import FundingRateArbitrage
+from strategies.universe_index import UniverseIndex
+from tools.order_book import OrderBookManager
+from tools.ticker_board import start_ticker_feed
 
 if __name__ == "__main__":
+    # 共享内存行情板：资金费率变化后1秒内重排并开仓，不开启则每分钟扫描一次
+    use_ticker_board = False
+    # 本地订单簿：开仓按合约吃单均价和滑点上限定量，不开启则按lastPrice定量
+    use_order_book = False
+    ticker_board = None
+    order_book_manager = None
+    if use_ticker_board or use_order_book:
+        # 行情板和订单簿的交易对在创建时固定，取当前可套利的交易对
+        universe = UniverseIndex(HTTP(demo=True))
+        universe.refresh()
+        symbols = sorted(universe.available)
+        if use_ticker_board:
+            ticker_board, feed_process = start_ticker_feed(symbols, demo=True)
+        if use_order_book:
+            order_book_manager = OrderBookManager(symbols)
+            order_book_manager.start()
+
     # 创建策略实例
     strategy = FundingRateArbitrage(
         api_key=BYBIT_API_KEY,
         api_secret=BYBIT_API_SECRET,
         max_position_value=100,
         demo=True,  # 模拟交易
+        data_source="coinglass",  # 默认coinglass，可选bybit(直接取Bybit全量行情)/bybit+coinglass
+        ticker_board=ticker_board,
+        order_book_manager=order_book_manager,
     )
 
     # 运行策略
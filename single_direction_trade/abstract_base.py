@@ -1,9 +1,13 @@
 import time
 from abc import abstractmethod
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Optional
 from loguru import logger
 from Clients.bybit_client import BybitTimeRecordClient
+from tools.clock import REAL_CLOCK
+from tools.metrics import WAKE_ERROR
+from tools.ns_time import NS_PER_MS, NS_PER_SECOND, format_ns, to_local_datetime
+from tools.tracing import Tracer
 
 
 class SingleDirectionTrade(object):
@@ -15,49 +19,106 @@ class SingleDirectionTrade(object):
         demo: bool = True,
         debug_mode: bool = False,
         logger=logger,
+        ticker_board=None,
+        trace_dir: Optional[str] = None,
+        lead_time_controller=None,
+        clock=None,
+        critical_window=None,
     ) -> None:
         """
         balance_ratio: 资金比例 默认全仓 一半就传0.5
+        ticker_board: 共享内存行情板(tools.ticker_board.TickerBoard)，为空则走REST
+        trace_dir: 时间线追踪导出目录，为空则不追踪
+        lead_time_controller: 自适应提前量(single_direction_trade.lead_time.LeadTimeController)，为空则固定提前1.8秒
+        clock: 时钟(tools.clock)，为空使用系统时钟，模拟时传入VirtualClock
+        critical_window: 下单关键窗口(tools.critical_window.CriticalWindow)，触发前关闭GC并推迟日志
         """
+        self.critical_window = critical_window
+        if critical_window is not None:
+            # 客户端共用同一个logger，窗口内的请求耗时日志也一起推迟
+            logger = critical_window.wrap_logger(logger)
         self.logger = logger
         self.debug_mode = debug_mode
         self.symbol = symbol
         self.timingPoints = timingPoints
         self.balance_ratio = balance_ratio
+        self.ticker_board = ticker_board
+        self.trace_dir = trace_dir
+        self.tracer = Tracer(enabled=bool(trace_dir), process_name=symbol)
+        self.lead_time_controller = lead_time_controller
+        self.clock = clock or REAL_CLOCK
         self.client: Optional[BybitTimeRecordClient] = None
 
-    def get_trade_time(
-        self, server_time, promising_arbitrage_time
-    ) -> tuple([datetime]):
-        """获取开仓时间和平仓时间"""
-        trade_time = promising_arbitrage_time
-        # 提前1.8秒建仓，防止网慢吃不到结算
-        target_open_time = trade_time + timedelta(seconds=-1, microseconds=-800000)
+    def get_trade_time(self, settlement_ns: int) -> tuple:
+        """获取开仓时间和平仓时间(纳秒)"""
+        # 默认提前1.8秒建仓，防止网慢吃不到结算；配置了自适应提前量则按历史成交滞后学习
+        lead_ms = 1800
+        if self.lead_time_controller is not None:
+            lead_ms = self.lead_time_controller.get_lead_ms(
+                self.symbol, self.get_endpoint()
+            )
+        target_open_ns = settlement_ns - lead_ms * NS_PER_MS
         # 结算点直接平仓
-        target_close_time = trade_time
-        return target_open_time, target_close_time
+        target_close_ns = settlement_ns
+        return target_open_ns, target_close_ns
 
-    def wait_until(self, target_time: datetime):
-        """等待直到目标时间，使用服务器时间"""
+    def wait_until(self, target_ns: int, handoff_ns: Optional[int] = None):
+        """
+        等待直到目标时间(纳秒)，使用服务器时间，循环内只做整数比较
+        handoff_ns: 距唤醒点不足该值时不再轮询，返回换算为本地perf_counter_ns的唤醒点，
+            由触发线程(tools.firing_thread.FiringThread)本地精确等待
+        """
         if self.debug_mode:
             print("debug模式下不等待")
-            return
+            return None
+        window_ns = (
+            int(self.critical_window.lead_seconds * NS_PER_SECOND)
+            if self.critical_window is not None
+            else None
+        )
         while True:
-            server_time = self.get_server_time()
-            if not server_time:
-                time.sleep(0.3)
+            with self.tracer.span("server_time") as span:
+                server_ns = self.get_server_time_ns()
+                span.set(server_time=server_ns)
+            received_ns = time.perf_counter_ns()
+            if not server_ns:
+                self.clock.sleep(0.3)
                 continue
-            if (
-                target_time - server_time
-            ).total_seconds() <= self.client.get_average_response_time() / 1000000 * 0.98:  # 0.98留余量，不然太极限 
-                print(f"等待结束，服务器时间：{server_time}")
+            remaining_ns = target_ns - server_ns
+            # 平均响应时间单位为微秒，*1000转为纳秒，0.98留余量，不然太极限
+            lead_ns = int(self.get_average_response_time() * 980)
+            if handoff_ns is not None and remaining_ns - lead_ns <= handoff_ns:
+                print(f"交给触发线程，服务器时间：{format_ns(server_ns)}")
+                self.tracer.instant("handoff", target_time=target_ns)
+                if window_ns is not None:
+                    self.critical_window.enter()
+                return received_ns + remaining_ns - lead_ns
+            if remaining_ns <= lead_ns:
+                print(f"等待结束，服务器时间：{format_ns(server_ns)}")
+                self.tracer.instant("wake", target_time=target_ns)
+                WAKE_ERROR.observe(remaining_ns / NS_PER_SECOND)
                 break
-            # 计算等待时间
-            wait_seconds = (target_time - server_time).total_seconds()
-            if wait_seconds > 6:
-                time.sleep(5)  # 长等待时间，每5秒同步一次
+            if window_ns is not None and remaining_ns <= window_ns:
+                self.critical_window.enter()
+            if remaining_ns > 6 * NS_PER_SECOND:
+                self.clock.sleep(5)  # 长等待时间，每5秒同步一次
             else:
-                time.sleep(0.01)  # 接近目标时间，更频繁地同步
+                self.clock.sleep(0.01)  # 接近目标时间，更频繁地同步
+
+    def get_average_response_time(self) -> float:
+        """最近请求的平均耗时(微秒)，用于决定提前多久唤醒"""
+        return self.client.get_average_response_time()
+
+    def get_endpoint(self) -> str:
+        """当前客户端使用的接口域名"""
+        return getattr(self.client, "endpoint", "")
+
+    def get_server_time(self) -> Optional[datetime]:
+        """服务器时间(本地时间)，仅用于显示"""
+        server_ns = self.get_server_time_ns()
+        return to_local_datetime(server_ns) if server_ns else None
 
     @abstractmethod
-    def get_server_time(self) -> Optional[datetime]: ...
+    def get_server_time_ns(self) -> Optional[int]:
+        """服务器时间，Unix纪元起的纳秒"""
+        ...
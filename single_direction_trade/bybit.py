@@ -1,12 +1,18 @@
 import time
-from datetime import datetime, timedelta
 from decimal import Decimal
 from typing import Optional
 
+from Clients.account_config import AccountConfigCache
 from Clients.bybit_client import BybitTimeRecordClient
+from Clients.exit_engine import ExitEngine
+from Clients.hedged_order import HedgedOrderSender, new_order_link_id
+from Clients.order_slicer import OrderSlicer, split_qty
 from config import BYBIT_API_KEY, BYBIT_API_SECRET, MINIMAL_ACCEPTABLE_FUNDING_RATE
 from single_direction_trade.abstract_base import SingleDirectionTrade
 from tools.customer_loger import logger
+from tools.firing_thread import FiringThread
+from tools.metrics import ORDER_ACK_LAG
+from tools.ns_time import NS_PER_SECOND, format_ns, ms_to_ns, ns_to_ms
 from tools.utils import format_num_by_step, supported_arbitrage_timing_dict
 
 
@@ -19,30 +25,258 @@ class BybitSingleDirectionTrade(SingleDirectionTrade):
     def __init__(self, *args, **kwargs) -> None:
         """
         balance_ratio: 资金比例 默认全仓 一半就传0.5
+        hedge_connections: 开仓时同时使用的连接数，大于1开启对冲式重复下单
+        hedge_delay: 对冲延迟(秒)，0表示所有连接同时发出
+        order_book_manager: 本地订单簿(tools.order_book.OrderBookManager)，开仓按深度定量
+        max_slippage_bps: 按订单簿定量时允许的最大滑点(bps)
+        order_book_max_age_ms: 行情连接断开时，订单簿超过多久没有更新视为过期，改按lastPrice定量；
+            连接正常且已同步的订单簿没有变化就没有推送，不按更新时间判断
+        allocation: CapitalAllocator分配的结果，传入后不再单独读取余额
+        max_child_orders: 超过maxMktOrderQty时最多拆成的子单数，1表示不拆单(按上限截断)
+        exit_mode: 开仓成交后立即挂出的平仓单(limit/conditional/market)，None不平仓
+        exit_settle_delay_ms: market平仓在结算后多久发出
+        pnl_store: tools.pnl_sync.PnlStore，记录每次套利的订单号用于核对实际收益
+        api_key/api_secret: 下单账户，默认使用config中的账户
+        client: 账户共用的下单客户端，同一账户的多个symbol共用一个连接池
+        market_client: 行情客户端，多账户时传入共用的Clients.shared_market_data.SharedMarketData
+        trigger: 共用的触发器(single_direction_trade.shared_trigger.SharedTrigger)，
+            只有一个实例轮询服务器时间，到点后所有账户同时下单
+        endpoint_selector: Clients.endpoint_selector.EndpointSelector，每次结算前切到最快的域名
+        account_config: 账户共用的Clients.account_config.AccountConfigCache，
+            杠杆与缓存一致时不再调用设置接口
+        firing_pool: 进程共用的tools.firing_thread.FiringPool，每次结算取一个独占核心的触发线程
+            执行最后一段等待和下单，为None在当前线程下单
         """
+        hedge_connections = kwargs.pop("hedge_connections", 1)
+        hedge_delay = kwargs.pop("hedge_delay", 0.0)
+        self.order_book_manager = kwargs.pop("order_book_manager", None)
+        self.max_slippage_bps = kwargs.pop("max_slippage_bps", 30)
+        # Bybit深度推送间隔为几十毫秒，连接断开时订单簿超过半秒未更新就不再可信
+        self.order_book_max_age_ms = kwargs.pop("order_book_max_age_ms", 500)
+        self.allocation: Optional[dict] = kwargs.pop("allocation", None)
+        self.max_child_orders = kwargs.pop("max_child_orders", 1)
+        exit_mode = kwargs.pop("exit_mode", None)
+        exit_settle_delay_ms = kwargs.pop("exit_settle_delay_ms", 200)
+        self.pnl_store = kwargs.pop("pnl_store", None)
+        api_key = kwargs.pop("api_key", BYBIT_API_KEY)
+        api_secret = kwargs.pop("api_secret", BYBIT_API_SECRET)
+        client = kwargs.pop("client", None)
+        market_client = kwargs.pop("market_client", None)
+        self.trigger = kwargs.pop("trigger", None)
+        self.endpoint_selector = kwargs.pop("endpoint_selector", None)
+        account_config = kwargs.pop("account_config", None)
+        self.firing_pool = kwargs.pop("firing_pool", None)
+        self.firing_thread: Optional[FiringThread] = None
         super().__init__(*args, **kwargs)
         demo = kwargs.get("demo", True)
-        self.client = BybitTimeRecordClient(
-            api_key=BYBIT_API_KEY,
-            api_secret=BYBIT_API_SECRET,
+        self.client = client or BybitTimeRecordClient(
+            api_key=api_key,
+            api_secret=api_secret,
             demo=demo,  # 设置为True使用测试网络
             logger=self.logger,
         )
+        self.market_client = market_client or self.client
+        self.account_config = account_config or AccountConfigCache(
+            self.client, self.logger
+        )
+        self.hedged_sender: Optional[HedgedOrderSender] = None
+        if hedge_connections > 1:
+            # 每个客户端有独立的连接，主连接复用self.client
+            clients = [self.client] + [
+                BybitTimeRecordClient(
+                    api_key=api_key,
+                    api_secret=api_secret,
+                    demo=demo,
+                    logger=self.logger,
+                )
+                for _ in range(hedge_connections - 1)
+            ]
+            self.hedged_sender = HedgedOrderSender(
+                clients,
+                hedge_delay=hedge_delay,
+                logger=self.logger,
+                concurrent_orders=self.max_child_orders,
+            )
+        self.exit_engine: Optional[ExitEngine] = None
+        if exit_mode:
+            self.exit_engine = ExitEngine(
+                self.client,
+                mode=exit_mode,
+                settle_delay_ms=exit_settle_delay_ms,
+                place_order=self.place_order,
+                logger=self.logger,
+                clock=self.clock,
+            )
+        self.order_slicer: Optional[OrderSlicer] = None
+        if self.max_child_orders > 1:
+            self.order_slicer = OrderSlicer(
+                self.place_order, max_workers=self.max_child_orders, logger=self.logger
+            )
 
-    def get_server_time(self) -> Optional[datetime]:
-        """获取Bybit服务器时间"""
+    def get_server_time_ns(self) -> Optional[int]:
+        """获取Bybit服务器时间(纳秒)，直接使用timeNano，不经过浮点数"""
         try:
-            time_response = self.client.get_server_time()
+            time_response = self.market_client.get_server_time()
             if time_response.get("retCode") == 0:
-                current_server_time = datetime.fromtimestamp(
-                    int(time_response["result"]["timeNano"]) / 1000000000
-                )
-                self.logger.info(f"当前服务器时间：{current_server_time}")
-                return current_server_time
+                server_ns = int(time_response["result"]["timeNano"])
+                self.logger.info(f"当前服务器时间(ns)：{server_ns}")
+                return server_ns
         except Exception as e:
             self.logger.info(f"获取服务器时间失败: {str(e)}")
         return None
 
+    def get_average_response_time(self) -> float:
+        # 共用行情客户端时，下单客户端可能还没有请求记录
+        return (
+            self.client.get_average_response_time()
+            or self.market_client.get_average_response_time()
+        )
+
+    def get_linear_ticker(self) -> dict:
+        """获取合约最新行情，优先读共享内存行情板，过期或没有时走REST"""
+        if self.ticker_board is not None:
+            ticker = self.ticker_board.get_ticker(self.symbol)
+            if ticker:
+                return ticker
+        ticker = self.market_client.get_tickers(category="linear", symbol=self.symbol)
+        return ticker["result"]["list"][0]
+
+    def limit_qty_by_order_book(self, qty, max_position_value, qty_step) -> Decimal:
+        """
+        按本地订单簿修正开仓数量，不发REST请求
+        用吃单均价代替lastPrice重算数量，并限制在max_slippage_bps滑点内可成交的数量
+        订单簿不可用(未同步、为空、连接断开且过期)时原样返回(按lastPrice定量)并记录原因
+        """
+        if self.order_book_manager is None:
+            return qty
+        book, reason = self.order_book_manager.usable_book(
+            self.symbol, self.order_book_max_age_ms
+        )
+        if book is None:
+            self.logger.warning(f"{reason}，不检查深度，按lastPrice定量")
+            return qty
+        limited, vwap, worst_price, depth_qty = book.limit_qty(
+            "Buy", float(qty), float(max_position_value), self.max_slippage_bps
+        )
+        self.logger.info(
+            f"订单簿定量: 吃单均价{vwap}, 最差价{worst_price}, "
+            f"{self.max_slippage_bps}bps内可成交{depth_qty}"
+        )
+        return format_num_by_step(min(qty, Decimal(str(limited))), qty_step)
+
+    def arm_exit(self, open_order: dict, settlement_ns: int) -> Optional[dict]:
+        """确认开仓成交后立即挂出平仓单，拆单时按各子单合计的成交量和均价，返回平仓记录"""
+        if "accepted_qty" in open_order:
+            qty, fill_price = self.confirm_sliced_fill(open_order)
+        else:
+            fill = self.exit_engine.confirm_fill(
+                "linear", self.symbol, order_id=open_order["result"]["orderId"]
+            )
+            if fill is None:
+                self.logger.info("未确认开仓成交，不挂平仓单")
+                return None
+            qty, fill_price = fill["cumExecQty"], fill["avgPrice"]
+        if not qty:
+            self.logger.info("开仓没有成交，不挂平仓单")
+            return None
+        with self.tracer.span("arm_exit", mode=self.exit_engine.mode):
+            return self.exit_engine.arm(
+                "linear",
+                self.symbol,
+                "Buy",
+                qty=qty,
+                fill_price=fill_price,
+                settlement_ms=ns_to_ms(settlement_ns),
+                on_fire=lambda record: self.record_exit_order(record, settlement_ns),
+            )
+
+    def confirm_sliced_fill(self, open_order: dict, timeout: float = 3.0):
+        """
+        按orderLinkId逐个轮询受理的子单直到终态，所有子单共用一个超时，
+        返回(合计成交量, 成交均价)
+        """
+        clock = self.exit_engine.clock
+        deadline = clock.perf_counter() + timeout
+        filled_qty = Decimal(0)
+        filled_value = Decimal(0)
+        children = []
+        for child in open_order["result"]["list"]:
+            if not child["ok"]:
+                continue
+            fill = self.exit_engine.confirm_fill(
+                "linear",
+                self.symbol,
+                order_link_id=child["orderLinkId"],
+                timeout=max(0.0, deadline - clock.perf_counter()),
+            )
+            if fill is None:
+                children.append((child["orderLinkId"], Decimal(0)))
+                continue
+            child_qty = Decimal(fill["cumExecQty"])
+            filled_qty += child_qty
+            filled_value += child_qty * Decimal(fill["avgPrice"])
+            children.append((child["orderLinkId"], child_qty))
+        fill_price = filled_value / filled_qty if filled_qty else Decimal(0)
+        self.logger.info(
+            f"子单成交: {filled_qty}/{open_order['requested_qty']}, "
+            f"均价{fill_price}, 明细{children}"
+        )
+        return filled_qty, fill_price
+
+    def record_exit_order(self, exit_record: dict, settlement_ns: int) -> None:
+        """market平仓在结算后才发出，发出后把订单号补记到本次套利"""
+        if self.pnl_store is None or not exit_record.get("response"):
+            return
+        try:
+            self.pnl_store.add_order(
+                self.symbol,
+                ns_to_ms(settlement_ns),
+                exit_record["response"].get("result", {}).get("orderId"),
+            )
+        except Exception as e:
+            self.logger.info(f"记录平仓订单失败: {str(e)}")
+
+    def record_attempt(
+        self,
+        open_order: dict,
+        exit_record: Optional[dict],
+        settlement_ns: int,
+        qty,
+        funding_rate,
+    ) -> None:
+        """
+        记录本次套利的订单号，之后由tools.pnl_sync按账户流水核对实际收益
+        market平仓单此时还没有发出，由record_exit_order在发出后补记
+        """
+        if "accepted_qty" in open_order:
+            responses = [
+                child["response"]
+                for child in open_order["result"]["list"]
+                if child["ok"]
+            ]
+        else:
+            responses = [open_order]
+        if exit_record is not None and exit_record.get("response"):
+            responses.append(exit_record["response"])
+        try:
+            self.pnl_store.record_attempt(
+                self.symbol,
+                ns_to_ms(settlement_ns),
+                [r.get("result", {}).get("orderId") for r in responses],
+                open_time_ms=open_order["time"],
+                qty=qty,
+                funding_rate=funding_rate,
+            )
+        except Exception as e:
+            self.logger.info(f"记录套利失败: {str(e)}")
+
+    def place_order(self, **kwargs) -> dict:
+        """下单，统一带上orderLinkId，开启对冲时通过多条连接发出"""
+        kwargs.setdefault("orderLinkId", new_order_link_id(self.symbol[:8]))
+        if self.hedged_sender is not None:
+            return self.hedged_sender.place_order(**kwargs)
+        return self.client.place_order(**kwargs)
+
     # def get_upcoming_timing_from_preset(self, current_hour):
     #     """从预设的时间点中获取最近的时间点"""
     #     for hour, time_tuple in supported_arbitrage_timing_dict.items():
@@ -81,73 +315,167 @@ class BybitSingleDirectionTrade(SingleDirectionTrade):
     #         target_close_time = trade_time + timedelta(days=1)
     #     return trade_time
 
-    def wait_until_place_linear_arbitrage_order(
+    def fire_open_order(
         self,
-        target_open_time,
-        target_close_time,
-        promising_arbitrage_time,
+        open_request,
+        max_position_value,
         qty_step,
         max_order_qty,
         min_order_qty,
-        leverage,
-        amount,
-    ):
+        max_qty,
+        minimal_funding_rate,
+    ) -> Optional[tuple]:
         """
-        倒计时等待下合约套利单
+        触发后的下单路径：取最新价格、定量、检查费率并开仓
+        返回(开仓回报, 下单数量, 资金费率)，放弃开仓时返回None
+        配置了触发线程时在触发线程中执行
         """
-        # 等待开仓时间
-        self.logger.info(f"等待开仓时间: {target_open_time}")
-        self.wait_until(target_open_time)
-
         # 获取当前价格
-        ticker = self.client.get_tickers(category="linear", symbol=self.symbol)
-        current_price = Decimal(ticker["result"]["list"][0]["lastPrice"])
+        with self.tracer.span("ticker"):
+            ticker = self.get_linear_ticker()
+        current_price = Decimal(ticker["lastPrice"])
 
-        # 获取合约数量相关参数
-        # 计算基于余额和杠杆的最大可开仓数量（以合约数量为单位）
-        max_position_value = Decimal(amount) * Decimal(leverage)  # 最大持仓价值
-        qty = max_position_value / Decimal(current_price)  # 转换为合约数量
-
-        # 确保数量符合步长要求并不超过最大下单限制
-        qty = format_num_by_step(qty, qty_step)  # 按步长格式化
-        qty = max(
-            min_order_qty, min(qty, max_order_qty)
-        )  # 确保在最小和最大下单限制之间
-        # 最终确定下单数量
-        finalQTY = qty
-        fundingRate = Decimal(ticker["result"]["list"][0]["fundingRate"])
+        with self.tracer.span("sizing"):
+            # 获取合约数量相关参数
+            # 计算基于余额和杠杆的最大可开仓数量（以合约数量为单位）
+            qty = max_position_value / Decimal(current_price)  # 转换为合约数量
+
+            # 确保数量符合步长要求并不超过最大下单限制
+            qty = format_num_by_step(qty, qty_step)  # 按步长格式化
+            qty = max(
+                min_order_qty, min(qty, max_qty)
+            )  # 确保在最小和最大下单限制之间，开启拆单时上限为子单数*单笔上限
+            qty = self.limit_qty_by_order_book(qty, max_position_value, qty_step)
+            qty = max(min_order_qty, qty)
+            # 最终确定下单数量
+            finalQTY = qty
+        fundingRate = Decimal(ticker["fundingRate"])
         self.logger.info(f"当前资金费率: {fundingRate}")
-        enclosure_time = datetime.fromtimestamp(
-            int(ticker["result"]["list"][0]["nextFundingTime"]) / 1000
-        )
-        self.logger.info(f"本次结算时间(ms): {enclosure_time}")
+        self.logger.info(f"本次结算时间(ms): {ticker['nextFundingTime']}")
         if fundingRate >= Decimal(0):
             # 正税率暂不支持
             self.logger.info("暂不支持正税率套利")
-            return
-        elif fundingRate > Decimal(MINIMAL_ACCEPTABLE_FUNDING_RATE):
+            return None
+        elif fundingRate > minimal_funding_rate:
             # 负税率但收益低
             self.logger.info("资金费率过低，停止此次套利")
-            return
+            return None
+
+        # 开仓，span开始即请求发出，结束即收到回报
+        with self.tracer.span("place_order", qty=str(finalQTY)) as span:
+            if finalQTY > max_order_qty:
+                # 超过单笔上限，拆成子单并发发出
+                open_order = self.order_slicer.place_sliced_order(
+                    split_qty(finalQTY, max_order_qty, min_order_qty, qty_step),
+                    **open_request,
+                )
+            else:
+                open_order = self.place_order(qty=finalQTY, **open_request)
+            span.set(
+                ret_code=open_order.get("retCode"), exchange_time_ms=open_order["time"]
+            )
+        return open_order, finalQTY, fundingRate
 
-        # 开仓
-        open_order = self.client.place_order(
-            category="linear",
-            symbol=self.symbol,
-            side="Buy",
-            order_type="Market",
-            qty=finalQTY,
-            reduce_only=False,
+    def wait_until_place_linear_arbitrage_order(
+        self,
+        target_open_ns,
+        target_close_ns,
+        settlement_ns,
+        qty_step,
+        max_order_qty,
+        min_order_qty,
+        leverage,
+        amount,
+    ):
+        """
+        倒计时等待下合约套利单，时间参数均为纳秒
+        """
+        # 与行情无关的请求参数和数值在等待前准备好，触发后只剩定量和下单
+        open_request = {
+            "category": "linear",
+            "symbol": self.symbol,
+            "side": "Buy",
+            "order_type": "Market",
+            "reduce_only": False,
+        }
+        max_position_value = Decimal(amount) * Decimal(leverage)  # 最大持仓价值
+        max_qty = max_order_qty * self.max_child_orders
+        minimal_funding_rate = Decimal(MINIMAL_ACCEPTABLE_FUNDING_RATE)
+        # 等待开仓时间，配置了关键窗口时在触发前进入窗口
+        self.logger.info(f"等待开仓时间: {format_ns(target_open_ns)}")
+        fire_args = (
+            open_request,
+            max_position_value,
+            qty_step,
+            max_order_qty,
+            min_order_qty,
+            max_qty,
+            minimal_funding_rate,
         )
+        deadline_ns = None
+        if self.trigger is not None:
+            self.trigger.wait_until(self, target_open_ns)
+        elif self.firing_thread is not None:
+            deadline_ns = self.wait_until(
+                target_open_ns, handoff_ns=self.firing_thread.handoff_ns
+            )
+        else:
+            self.wait_until(target_open_ns)
+        if self.firing_thread is not None:
+            # 最后一段等待和下单路径在触发线程中执行
+            fired = self.firing_thread.fire_at(
+                deadline_ns, self.fire_open_order, *fire_args
+            ).result()
+        else:
+            fired = self.fire_open_order(*fire_args)
+        if fired is None:
+            return
+        open_order, finalQTY, fundingRate = fired
+        if self.critical_window is not None:
+            # 收到回报，恢复GC并补写窗口内的日志
+            self.critical_window.exit()
+        self.tracer.exchange_instant("exchange_order_time", open_order["time"])
+        exit_record = None
+        if self.exit_engine is not None:
+            exit_record = self.arm_exit(open_order, settlement_ns)
+        order_ns = ms_to_ns(open_order["time"])
+        ORDER_ACK_LAG.observe((order_ns - settlement_ns) / NS_PER_SECOND)
+        if self.lead_time_controller is not None:
+            new_lead_ms = self.lead_time_controller.record(
+                self.symbol,
+                self.get_endpoint(),
+                trigger_ms=ns_to_ms(target_open_ns),
+                exchange_ms=open_order["time"],
+                settlement_ms=ns_to_ms(settlement_ns),
+            )
+            self.logger.info(f"下次提前量调整为: {new_lead_ms}ms")
         self.logger.info(
-            f"{self.symbol}开仓成功: {open_order}, 订单时间：{datetime.fromtimestamp(open_order['time'] / 1000)}"
+            f"{self.symbol}开仓成功: {open_order}, 订单时间：{format_ns(order_ns)}"
         )
-        if promising_arbitrage_time < datetime.fromtimestamp(open_order["time"] / 1000):
+        if settlement_ns < order_ns:
             self.logger.info(
                 f"{self.symbol}开仓时间晚于预期结算时间, 可能是网络延迟导致的, 预期套利失败"
             )
         else:
             self.logger.info(f"{self.symbol}开仓时间早于预期结算时间, 预期套利成功")
+        if self.hedged_sender is not None:
+            self.logger.info(f"对冲下单统计: {self.hedged_sender.get_stats()}")
+        if self.pnl_store is not None:
+            self.record_attempt(
+                open_order,
+                exit_record,
+                settlement_ns,
+                finalQTY,
+                fundingRate,
+            )
+        if self.exit_engine is not None:
+            self.logger.info(f"平仓统计: {self.exit_engine.get_stats()}")
+        elif "accepted_qty" in open_order:
+            fills = self.order_slicer.track_fills(self.client, open_order)
+            self.logger.info(
+                f"子单成交: {fills['filled_qty']}/{finalQTY}, 均价{fills['avg_price']}, "
+                f"明细{fills['children']}"
+            )
 
         # open_order_info = self.client.get_order_history(
         #     order_id=open_order["result"]["orderId"]
@@ -180,21 +508,30 @@ class BybitSingleDirectionTrade(SingleDirectionTrade):
         # else:
         #     self.logger.info(f"{self.symbol}平仓时间晚于预期结算时间, 预期套利成功")
 
+    def select_endpoint(self) -> None:
+        """切换下单客户端到当前最快的域名，在等待触发之前调用"""
+        clients = [self.client]
+        if self.hedged_sender is not None:
+            clients = self.hedged_sender.clients
+        for client in clients:
+            if self.endpoint_selector.apply(client):
+                self.logger.info(f"切换域名: {client.endpoint}")
+
     def workflow(self):
-        # 设置目标时间
-        server_time = self.get_server_time()
-        if not server_time:
+        if self.endpoint_selector is not None:
+            # 提前量按symbol+域名学习，需在计算开仓时间前切换
+            self.select_endpoint()
+        # 设置目标时间，全部为纳秒
+        server_ns = self.get_server_time_ns()
+        if not server_ns:
             raise Exception("无法获取服务器时间")
-        ticker = self.client.get_tickers(category="linear", symbol=self.symbol)
+        ticker = self.get_linear_ticker()
         # 获取结算时间
-        enclosure_time = datetime.fromtimestamp(
-            int(ticker["result"]["list"][0]["nextFundingTime"]) / 1000
-        )
-        promising_arbitrage_time = enclosure_time
-        fundingRate = Decimal(ticker["result"]["list"][0]["fundingRate"])
-        self.logger.info(f"下次结算时间: {enclosure_time}")
+        settlement_ns = ms_to_ns(ticker["nextFundingTime"])
+        fundingRate = Decimal(ticker["fundingRate"])
+        self.logger.info(f"下次结算时间: {format_ns(settlement_ns)}")
         self.logger.info(f"下次结算费率: {fundingRate}")
-        if server_time >= enclosure_time:
+        if server_ns >= settlement_ns:
             self.logger.info("当前时间大于下次结算时间, 结束本次结算")
             return
         if fundingRate >= Decimal(0):
@@ -209,11 +546,9 @@ class BybitSingleDirectionTrade(SingleDirectionTrade):
         ### 开始准备套利
 
         # 获取开平仓时间
-        target_open_time, target_close_time = self.get_trade_time(
-            server_time=server_time, promising_arbitrage_time=promising_arbitrage_time
-        )
+        target_open_ns, target_close_ns = self.get_trade_time(settlement_ns)
         # 获取交易对信息
-        instrument_info = self.client.get_instruments_info(
+        instrument_info = self.market_client.get_instruments_info(
             category="linear", symbol=self.symbol
         )["result"]["list"][0]
         # 数量步长
@@ -227,41 +562,69 @@ class BybitSingleDirectionTrade(SingleDirectionTrade):
         # 获取杠杆信息
         max_leverage = Decimal(instrument_info["leverageFilter"]["maxLeverage"])
         leverage = Decimal("50") if max_leverage > Decimal("50") else max_leverage
-        # 获取当前余额
-        current_balance = self.client.get_wallet_balance(
-            accountType="UNIFIED", coin="USDT"
-        )
-        current_balance = Decimal(
-            current_balance["result"]["list"][0]["totalAvailableBalance"]
-        ) * Decimal(self.balance_ratio)
-        # 预留3%的余额作为缓冲，避免因手续费和滑点导致开仓失败
-        buffer_ratio = Decimal("0.97")
-        amount = current_balance * buffer_ratio / 10  # 合约和现货杠杆的保证金金额
+        if self.allocation is not None:
+            # 统一分配过的保证金，已考虑缓冲和各symbol之间的取舍
+            amount = self.allocation["amount"]
+            leverage = min(leverage, self.allocation["leverage"])
+        else:
+            # 获取当前余额
+            current_balance = self.client.get_wallet_balance(
+                accountType="UNIFIED", coin="USDT"
+            )
+            current_balance = Decimal(
+                current_balance["result"]["list"][0]["totalAvailableBalance"]
+            ) * Decimal(self.balance_ratio)
+            # 预留3%的余额作为缓冲，避免因手续费和滑点导致开仓失败
+            buffer_ratio = Decimal("0.97")
+            amount = current_balance * buffer_ratio / 10  # 合约和现货杠杆的保证金金额
         self.logger.info(f"本次交易保证金金额:{amount}")
 
-        # 设置合约端杠杆
+        # 设置合约端杠杆，与缓存一致时不发请求
+        try:
+            self.account_config.ensure_leverage("linear", self.symbol, leverage)
+        except Exception as e:
+            self.logger.warning(f"{self.symbol}设置杠杆失败: {str(e)}")
+
+        if self.hedged_sender is not None:
+            # 触发前预热所有连接
+            self.hedged_sender.warm_up()
+        if self.order_slicer is not None:
+            self.order_slicer.warm_up()
+        settlement_ms = ns_to_ms(settlement_ns)
+        self.tracer.exchange_instant("settlement", settlement_ms)
+        if self.firing_pool is not None:
+            self.firing_thread = self.firing_pool.acquire()
         try:
-            self.client.set_leverage(
-                category="linear",
-                symbol=self.symbol,
-                buyLeverage=str(leverage),
-                sellLeverage=str(leverage),
+            self.wait_until_place_linear_arbitrage_order(
+                target_open_ns,
+                target_close_ns,
+                settlement_ns,
+                qty_step,
+                max_order_qty,
+                min_order_qty,
+                leverage,
+                amount,
             )
         except Exception as e:
-            if "leverage not modified" in str(e):
-                # 已经设置过相同杠杆，再次设置就会报错
-                pass
-
-        self.wait_until_place_linear_arbitrage_order(
-            target_open_time,
-            target_close_time,
-            promising_arbitrage_time,
-            qty_step,
-            max_order_qty,
-            min_order_qty,
-            leverage,
-            amount,
-        )
+            # 杠杆/保证金相关的拒单说明缓存可能已过期(如手动改过杠杆)
+            self.account_config.invalidate_on_reject(e, "linear", self.symbol)
+            raise
+        finally:
+            if self.critical_window is not None:
+                # 提前返回或异常时也要恢复GC
+                self.critical_window.exit()
+            if self.firing_thread is not None:
+                self.logger.info(
+                    f"{self.firing_thread.name}唤醒误差: {self.firing_thread.get_stats()}"
+                )
+                self.firing_pool.release(self.firing_thread)
+                self.firing_thread = None
+            # 每次结算导出一个trace文件，可用chrome://tracing或Perfetto打开
+            if self.trace_dir:
+                trace_file = self.tracer.dump(
+                    f"{self.trace_dir}/{self.symbol}_{settlement_ms}.json"
+                )
+                self.logger.info(f"时间线已导出: {trace_file}")
 
 
 def run(*args, **kwargs) -> None:
@@ -272,6 +635,29 @@ def run(*args, **kwargs) -> None:
     demo: bool = True,
     debug_mode: bool = False,
     logger=logger,
+    ticker_board=None,
+    trace_dir: Optional[str] = None,
+    lead_time_controller=None,
+    clock=None,
+    critical_window=None,
+    hedge_connections: int = 1,
+    hedge_delay: float = 0.0,
+    order_book_manager=None,
+    max_slippage_bps: float = 30,
+    order_book_max_age_ms: int = 500,
+    allocation: Optional[dict] = None,
+    max_child_orders: int = 1,
+    exit_mode: Optional[str] = None,
+    exit_settle_delay_ms: int = 200,
+    pnl_store=None,
+    api_key: str = BYBIT_API_KEY,
+    api_secret: str = BYBIT_API_SECRET,
+    client=None,
+    market_client=None,
+    trigger=None,
+    endpoint_selector=None,
+    account_config=None,
+    firing_pool=None,
     """
     client = BybitSingleDirectionTrade(*args, **kwargs)
     client.workflow()
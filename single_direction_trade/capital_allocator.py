@@ -0,0 +1,207 @@
+from decimal import Decimal
+from typing import Dict, Iterable, List
+
+
+class CapitalAllocator(object):
+    """
+    每次结算前统一分配各symbol的保证金
+    只读取一次余额、一次全量行情和一次全量交易对信息，
+    按单位保证金的预期收益从高到低贪心分配，每个symbol的分配额受
+    最大杠杆、maxMktOrderQty和订单簿滑点限制，收益对保证金是线性的，
+    所以贪心结果就是这个分数背包问题的最优解
+    """
+
+    def __init__(
+        self,
+        client,
+        logger,
+        minimal_acceptable_funding_rate=None,
+        max_leverage=Decimal("50"),
+        margin_ratio=Decimal("0.1"),
+        buffer_ratio=Decimal("0.97"),
+        fee_rate=Decimal("0.0011"),
+        default_slippage_bps=Decimal("5"),
+        max_slippage_bps=30,
+        order_book_manager=None,
+        market_client=None,
+        max_child_orders=1,
+    ) -> None:
+        """
+        minimal_acceptable_funding_rate: 资金费率需不高于该值才参与分配，为None时只要求为负
+        max_leverage: 杠杆上限，与交易对的最大杠杆取小
+        margin_ratio: 可用余额中用作保证金的比例，与单币种下单时除以10一致
+        buffer_ratio: 预留缓冲，避免因手续费和滑点导致开仓失败
+        fee_rate: 开平仓手续费合计(相对持仓价值)
+        default_slippage_bps: 没有订单簿时假设的滑点
+        max_slippage_bps: 有订单簿时每个symbol只分配该滑点内可成交的数量
+        order_book_manager: 本地订单簿(tools.order_book.OrderBookManager)
+        market_client: 读取行情和交易对信息的客户端，多账户时传入共用的SharedMarketData，为空使用client
+        max_child_orders: 下单时最多拆成的子单数，每个symbol的数量上限为子单数*maxMktOrderQty
+        """
+        self.client = client
+        self.market_client = market_client or client
+        self.logger = logger
+        self.minimal_acceptable_funding_rate = (
+            None
+            if minimal_acceptable_funding_rate is None
+            else Decimal(str(minimal_acceptable_funding_rate))
+        )
+        self.max_leverage = Decimal(max_leverage)
+        self.margin_ratio = Decimal(margin_ratio)
+        self.buffer_ratio = Decimal(buffer_ratio)
+        self.fee_rate = Decimal(fee_rate)
+        self.default_slippage_bps = Decimal(default_slippage_bps)
+        self.max_slippage_bps = max_slippage_bps
+        self.order_book_manager = order_book_manager
+        self.max_child_orders = max_child_orders
+
+    def get_available_balance(self) -> Decimal:
+        response = self.client.get_wallet_balance(accountType="UNIFIED", coin="USDT")
+        return Decimal(response["result"]["list"][0]["totalAvailableBalance"])
+
+    def get_tickers(self, symbols: Iterable[str]) -> Dict[str, dict]:
+        symbols = set(symbols)
+        response = self.market_client.get_tickers(category="linear")
+        return {
+            item["symbol"]: item
+            for item in response["result"]["list"]
+            if item["symbol"] in symbols
+        }
+
+    def get_instruments(self, symbols: Iterable[str]) -> Dict[str, dict]:
+        """按nextPageCursor分页拉取交易对信息，需要的symbol都拿到后不再翻页"""
+        symbols = set(symbols)
+        instruments = {}
+        cursor = None
+        seen_cursors = set()
+        while True:
+            params = {"category": "linear", "limit": 1000}
+            if cursor:
+                params["cursor"] = cursor
+            response = self.market_client.get_instruments_info(**params)
+            if isinstance(response, tuple):
+                response = response[0]
+            if response.get("retCode") != 0:
+                raise Exception(f"获取linear交易对失败: {response.get('retMsg')}")
+            result = response.get("result", {})
+            for item in result.get("list", []):
+                if item["symbol"] in symbols:
+                    instruments[item["symbol"]] = item
+            cursor = result.get("nextPageCursor")
+            if len(instruments) == len(symbols) or not cursor or cursor in seen_cursors:
+                return instruments
+            seen_cursors.add(cursor)
+
+    def is_eligible(self, funding_rate: Decimal) -> bool:
+        # 与单币种套利一致，只做负费率
+        if funding_rate >= Decimal(0):
+            return False
+        if self.minimal_acceptable_funding_rate is None:
+            return True
+        return funding_rate <= self.minimal_acceptable_funding_rate
+
+    def estimate_slippage(self, symbol: str, price: Decimal, qty: Decimal):
+        """
+        返回 (滑点比例, 可成交数量)
+        有新鲜订单簿时按吃单均价计算，并把数量限制在max_slippage_bps内
+        """
+        book = None
+        if self.order_book_manager is not None:
+            book, _ = self.order_book_manager.usable_book(symbol, max_age_ms=5000)
+        if book is None:
+            return self.default_slippage_bps / 10000, qty
+        qty = min(
+            qty,
+            Decimal(str(book.max_qty_within_bps("Buy", self.max_slippage_bps))),
+        )
+        if qty <= 0:
+            return Decimal(0), qty
+        vwap = book.vwap("Buy", float(qty))[0]
+        if not vwap:
+            return self.default_slippage_bps / 10000, qty
+        return max(Decimal(0), Decimal(str(vwap)) / price - 1), qty
+
+    def build_candidates(
+        self, symbols: List[str], tickers: Dict[str, dict], instruments: Dict
+    ) -> List[dict]:
+        """计算每个symbol单位保证金的预期收益和保证金上限"""
+        candidates = []
+        for symbol in symbols:
+            ticker = tickers.get(symbol)
+            instrument = instruments.get(symbol)
+            if not ticker or not instrument or instrument.get("status") != "Trading":
+                self.logger.info(f"{symbol}无行情或不可交易，不分配资金")
+                continue
+            funding_rate = Decimal(ticker["fundingRate"])
+            if not self.is_eligible(funding_rate):
+                self.logger.info(
+                    f"{symbol}资金费率{funding_rate}不满足条件，不分配资金"
+                )
+                continue
+            price = Decimal(ticker["lastPrice"])
+            leverage = min(
+                self.max_leverage,
+                Decimal(instrument["leverageFilter"]["maxLeverage"]),
+            )
+            # 与下单时一致，开启拆单时上限为子单数*单笔上限
+            max_qty = (
+                Decimal(instrument["lotSizeFilter"]["maxMktOrderQty"])
+                * self.max_child_orders
+            )
+            slippage, max_qty = self.estimate_slippage(symbol, price, max_qty)
+            # 单位持仓价值的净收益，乘以杠杆即单位保证金的收益
+            net_rate = abs(funding_rate) - self.fee_rate - slippage
+            if net_rate <= 0 or max_qty <= 0:
+                self.logger.info(f"{symbol}扣除成本后无收益，不分配资金")
+                continue
+            candidates.append(
+                {
+                    "symbol": symbol,
+                    "funding_rate": funding_rate,
+                    "next_funding_time": int(ticker["nextFundingTime"]),
+                    "leverage": leverage,
+                    "yield_per_margin": net_rate * leverage,
+                    "max_margin": max_qty * price / leverage,
+                }
+            )
+        return candidates
+
+    def allocate(self, symbols: Iterable[str]) -> Dict[str, dict]:
+        """
+        返回 {symbol: {"amount": 保证金, "leverage": 杠杆, "expected_profit": 预期收益}}
+        只给最近一次结算的symbol分配，未分配到资金的symbol不在结果中
+        """
+        symbols = list(dict.fromkeys(symbols))
+        balance = self.get_available_balance()
+        budget = balance * self.buffer_ratio * self.margin_ratio
+        tickers = self.get_tickers(symbols)
+        instruments = self.get_instruments(symbols)
+        candidates = self.build_candidates(symbols, tickers, instruments)
+        if not candidates:
+            return {}
+        next_settlement = min(c["next_funding_time"] for c in candidates)
+        candidates = [
+            c for c in candidates if c["next_funding_time"] == next_settlement
+        ]
+        candidates.sort(key=lambda c: c["yield_per_margin"], reverse=True)
+
+        allocations = {}
+        remaining = budget
+        for candidate in candidates:
+            if remaining <= 0:
+                break
+            amount = min(remaining, candidate["max_margin"])
+            remaining -= amount
+            allocations[candidate["symbol"]] = {
+                "amount": amount,
+                "leverage": candidate["leverage"],
+                "expected_profit": amount * candidate["yield_per_margin"],
+            }
+        self.logger.info(
+            f"资金分配: 可用余额{balance}, 保证金预算{budget}, 未分配{remaining}, "
+            + ", ".join(
+                f"{symbol}={allocation['amount']:.4f}"
+                for symbol, allocation in allocations.items()
+            )
+        )
+        return allocations
@@ -0,0 +1,161 @@
+import json
+import math
+import os
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+
+class LeadTimeController(object):
+    """
+    按 symbol+endpoint 学习提前开仓时间
+    每次开仓后记录 交易所订单时间 - 计划开仓时间 的滞后，
+    提前量取滞后分布的target_probability分位数再加安全余量，
+    即以target_probability的概率在结算前成交，同时尽量贴近结算点
+    状态保存到state_file，重启后继续使用
+    """
+
+    def __init__(
+        self,
+        state_file: Optional[str] = None,
+        target_probability: float = 0.95,
+        default_lead_ms: int = 1800,
+        min_lead_ms: int = 100,
+        max_lead_ms: int = 5000,
+        margin_ms: int = 50,
+        max_step_ms: int = 300,
+        min_samples: int = 5,
+        window: int = 50,
+    ) -> None:
+        """
+        target_probability: 目标在结算前成交的概率
+        default_lead_ms: 样本不足时使用的提前量，与原先写死的1.8秒一致
+        margin_ms: 在分位数之上额外预留的余量
+        max_step_ms: 单次调整的最大幅度，避免一次异常样本导致提前量剧烈变化
+        min_samples: 开始自适应所需的最少样本数
+        window: 每个key保留的最近样本数
+        """
+        self.state_file = state_file
+        self.target_probability = target_probability
+        self.default_lead_ms = default_lead_ms
+        self.min_lead_ms = min_lead_ms
+        self.max_lead_ms = max_lead_ms
+        self.margin_ms = margin_ms
+        self.max_step_ms = max_step_ms
+        self.min_samples = min_samples
+        self.window = window
+        self.lock = threading.Lock()
+        # key -> {"lead_ms": int, "lags": deque, "hits": int, "misses": int}
+        self.states: Dict[str, Dict] = {}
+        if state_file and os.path.exists(state_file):
+            self.load()
+
+    @staticmethod
+    def make_key(symbol: str, endpoint: str = "") -> str:
+        return f"{symbol}@{endpoint}"
+
+    def _get_state(self, key: str) -> Dict:
+        state = self.states.get(key)
+        if state is None:
+            state = self.states[key] = {
+                "lead_ms": self.default_lead_ms,
+                "lags": deque(maxlen=self.window),
+                "hits": 0,
+                "misses": 0,
+            }
+        return state
+
+    def get_lead_ms(self, symbol: str, endpoint: str = "") -> int:
+        """当前应使用的提前量(ms)"""
+        with self.lock:
+            state = self.states.get(self.make_key(symbol, endpoint))
+            return state["lead_ms"] if state else self.default_lead_ms
+
+    def _quantile(self, values, probability: float) -> float:
+        ordered = sorted(values)
+        index = math.ceil(probability * len(ordered)) - 1
+        index = min(len(ordered) - 1, max(0, index))
+        return ordered[index]
+
+    def record(
+        self,
+        symbol: str,
+        endpoint: str,
+        trigger_ms: int,
+        exchange_ms: int,
+        settlement_ms: int,
+    ) -> int:
+        """
+        记录一次开仓结果并更新提前量，返回新的提前量(ms)
+        trigger_ms: 计划开仓时间，即 settlement_ms - 当时使用的提前量
+        exchange_ms: 交易所返回的订单时间
+        """
+        with self.lock:
+            state = self._get_state(self.make_key(symbol, endpoint))
+            lag = int(exchange_ms) - int(trigger_ms)
+            state["lags"].append(lag)
+            if exchange_ms <= settlement_ms:
+                state["hits"] += 1
+            else:
+                state["misses"] += 1
+            if len(state["lags"]) >= self.min_samples:
+                desired = (
+                    self._quantile(state["lags"], self.target_probability)
+                    + self.margin_ms
+                )
+                step = max(
+                    -self.max_step_ms,
+                    min(self.max_step_ms, desired - state["lead_ms"]),
+                )
+                state["lead_ms"] = int(
+                    max(
+                        self.min_lead_ms,
+                        min(self.max_lead_ms, state["lead_ms"] + step),
+                    )
+                )
+            if exchange_ms > settlement_ms:
+                # 错过结算，提前量至少覆盖这次的滞后，不等样本攒够
+                state["lead_ms"] = int(
+                    min(self.max_lead_ms, max(state["lead_ms"], lag + self.margin_ms))
+                )
+            lead_ms = state["lead_ms"]
+        self.save()
+        return lead_ms
+
+    def load(self) -> None:
+        try:
+            with open(self.state_file) as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"读取提前量状态失败: {str(e)}")
+            return
+        with self.lock:
+            for key, state in data.items():
+                self.states[key] = {
+                    "lead_ms": int(state["lead_ms"]),
+                    "lags": deque(state.get("lags", []), maxlen=self.window),
+                    "hits": int(state.get("hits", 0)),
+                    "misses": int(state.get("misses", 0)),
+                }
+
+    def save(self) -> None:
+        if not self.state_file:
+            return
+        with self.lock:
+            data = {
+                key: {
+                    "lead_ms": state["lead_ms"],
+                    "lags": list(state["lags"]),
+                    "hits": state["hits"],
+                    "misses": state["misses"],
+                }
+                for key, state in self.states.items()
+            }
+        directory = os.path.dirname(self.state_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 先写临时文件再替换，避免写一半崩溃导致状态损坏
+        tmp_file = f"{self.state_file}.{threading.get_ident()}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_file, self.state_file)
@@ -0,0 +1,126 @@
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from Clients.account_config import AccountConfigCache
+from Clients.bybit_client import BybitTimeRecordClient
+from Clients.shared_market_data import SharedMarketData
+from single_direction_trade.bybit import run
+from single_direction_trade.capital_allocator import CapitalAllocator
+from single_direction_trade.shared_trigger import SharedTrigger
+from tools.customer_loger import logger
+
+
+class MultiAccountRunner(object):
+    """
+    多账户并行套利
+    行情、服务器时间、交易对信息和触发器所有账户共用一份，
+    每个账户有独立的签名客户端(连接池和限频额度按账户独立)和独立的资金分配，
+    所有账户的同一symbol在同一触发时刻并发下单
+    """
+
+    def __init__(
+        self,
+        accounts: List[dict],
+        symbols: Iterable[str],
+        demo: bool = False,
+        logger=logger,
+        use_capital_allocator: bool = True,
+        minimal_acceptable_funding_rate=None,
+        **trade_kwargs,
+    ) -> None:
+        """
+        accounts: 账户列表，格式：[{"name": "sub1", "api_key": "", "api_secret": ""}]
+        use_capital_allocator: 每个账户各自读取余额并分配保证金，不开启则按balance_ratio平分
+        trade_kwargs: 传给每个交易实例的其他参数，如ticker_board、clock、exit_mode等
+        """
+        self.accounts = accounts
+        self.symbols = list(symbols)
+        self.demo = demo
+        self.logger = logger
+        self.use_capital_allocator = use_capital_allocator
+        self.minimal_acceptable_funding_rate = minimal_acceptable_funding_rate
+        self.trade_kwargs = trade_kwargs
+        self.market_client = BybitTimeRecordClient(
+            demo=demo, logger=logger.bind(name="market")
+        )
+        self.market_data = SharedMarketData(self.market_client)
+        self.trigger = SharedTrigger()
+        # 每个账户一个客户端，连接池足够所有symbol同时下单(拆单时每个symbol多个子单)
+        pool_size = len(self.symbols) * trade_kwargs.get("max_child_orders", 1)
+        self.clients: Dict[str, BybitTimeRecordClient] = {
+            account["name"]: BybitTimeRecordClient(
+                api_key=account["api_key"],
+                api_secret=account["api_secret"],
+                demo=demo,
+                logger=logger.bind(name=account["name"]),
+                pool_size=max(10, pool_size),
+            )
+            for account in accounts
+        }
+        # 每个账户一份杠杆缓存，同一账户的所有symbol共用
+        self.account_configs: Dict[str, AccountConfigCache] = {
+            name: AccountConfigCache(client, logger.bind(name=name))
+            for name, client in self.clients.items()
+        }
+
+    def allocate(self, account: dict) -> Optional[Dict[str, dict]]:
+        """按账户余额分配保证金，行情和交易对信息走共用的行情层"""
+        if not self.use_capital_allocator:
+            return None
+        account_logger = self.logger.bind(name=account["name"])
+        allocator = CapitalAllocator(
+            self.clients[account["name"]],
+            account_logger,
+            minimal_acceptable_funding_rate=self.minimal_acceptable_funding_rate,
+            order_book_manager=self.trade_kwargs.get("order_book_manager"),
+            market_client=self.market_data,
+            max_child_orders=self.trade_kwargs.get("max_child_orders", 1),
+        )
+        return allocator.allocate(self.symbols)
+
+    def seed_account_config(self, account: dict) -> None:
+        """一次持仓请求预载账户所有交易对的杠杆，失败时退化为每个symbol首次设置"""
+        name = account["name"]
+        try:
+            count = self.account_configs[name].seed("linear")
+            self.logger.info(f"{name}预载杠杆: {count}个交易对")
+        except Exception as e:
+            self.logger.warning(f"{name}预载杠杆失败: {str(e)}")
+
+    def run(self) -> None:
+        endpoint_selector = self.trade_kwargs.get("endpoint_selector")
+        if endpoint_selector is not None:
+            # 账户客户端在各自的workflow中切换
+            endpoint_selector.apply(self.market_client)
+        threads = []
+        for account in self.accounts:
+            name = account["name"]
+            allocations = self.allocate(account)
+            self.seed_account_config(account)
+            for symbol in self.symbols:
+                if allocations is not None and symbol not in allocations:
+                    continue
+                kwargs = dict(self.trade_kwargs)
+                kwargs.update(
+                    balance_ratio=1 / len(self.symbols),
+                    demo=self.demo,
+                    logger=self.logger.bind(name=f"{name}:{symbol}"),
+                    allocation=allocations.get(symbol) if allocations else None,
+                    api_key=account["api_key"],
+                    api_secret=account["api_secret"],
+                    client=self.clients[name],
+                    market_client=self.market_data,
+                    trigger=self.trigger,
+                    account_config=self.account_configs[name],
+                )
+                thread = threading.Thread(
+                    target=run, args=(symbol,), kwargs=kwargs, name=f"{name}-{symbol}"
+                )
+                thread.start()
+                threads.append(thread)
+        for thread in threads:
+            thread.join()
+        self.logger.info(f"共用行情请求统计: {self.market_data.get_stats()}")
+        for name, client in self.clients.items():
+            self.logger.info(f"{name}限频余量: {client.rate_limits}")
+            self.logger.info(f"{name}配置请求数: {self.account_configs[name].calls}")
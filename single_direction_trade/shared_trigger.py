@@ -0,0 +1,50 @@
+import threading
+from typing import Dict
+
+
+class SharedTrigger(object):
+    """
+    多个交易实例共用的触发器
+    同一目标时间只有第一个到达的实例轮询服务器时间，其余实例等待，到点后同时放行
+    等待的实例在领头实例进入关键窗口后也加入窗口，各自收到回报后退出
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        # {目标时间(纳秒): 到点事件}
+        self.events: Dict[int, threading.Event] = {}
+        # 轮询失败的目标时间，等待的实例不下单
+        self.failed = set()
+
+    def wait_until(self, trade, target_ns: int) -> None:
+        with self.lock:
+            event = self.events.get(target_ns)
+            leader = event is None
+            if leader:
+                event = self.events[target_ns] = threading.Event()
+        if not leader:
+            window = getattr(trade, "critical_window", None)
+            if window is None:
+                event.wait()
+            else:
+                # 领头实例进入关键窗口后跟随加入，所有实例都收到回报退出后才恢复GC
+                while not event.wait(0.05):
+                    if window.join_active():
+                        event.wait()
+                        break
+            if target_ns in self.failed:
+                raise Exception(f"等待触发时间失败: {target_ns}")
+            return
+        succeeded = False
+        try:
+            trade.wait_until(target_ns)
+            succeeded = True
+        finally:
+            with self.lock:
+                if not succeeded:
+                    self.failed.add(target_ns)
+                # 只保留最近的目标时间，避免长期运行时无限增长
+                for key in [key for key in self.events if key < target_ns]:
+                    del self.events[key]
+                    self.failed.discard(key)
+            event.set()
@@ -1,9 +1,33 @@
+import threading
 import time
-from datetime import datetime, timedelta
+from datetime import datetime
+from decimal import Decimal
 from typing import Dict, List, Optional, Tuple
 
-from pybit.unified_trading import HTTP
+from Clients.fast_json import FastHTTP
+from Clients.account_config import AccountConfigCache
+from Clients.exit_engine import ExitEngine
+from Clients.hedged_order import new_order_link_id
 from ArbitrageData.arbitrage_list import get_bybit_interestArbitrage_data
+from ArbitrageData.bybit_native import get_bybit_native_data
+from strategies.opportunity_book import OpportunityBook
+from strategies.param_sweep import SnapshotRecorder
+from strategies.position_journal import PositionJournal
+from strategies.universe_index import UniverseIndex
+from tools.clock import REAL_CLOCK
+from tools.metrics import OPPORTUNITIES, SCAN_DURATION, STRATEGY_LOOPS
+from tools.ns_time import (
+    FUNDING_INTERVAL_NS,
+    NS_PER_HOUR,
+    NS_PER_SECOND,
+    from_utc_datetime,
+    ms_to_ns,
+    next_funding_ns,
+    ns_to_ms,
+    to_utc_datetime,
+)
+
+DATA_SOURCES = ("coinglass", "bybit", "bybit+coinglass")
 
 
 # 资金费率套利策略类
@@ -22,6 +46,17 @@ class FundingRateArbitrage:
         max_position_value: float = 1000,  # 单个币种最大持仓价值(USDT)
         fee_rate: float = 0.0006,  # 交易手续费率
         margin_interest_rate: float = 0.0002,  # 每8小时杠杆利息率
+        journal_file: str = "./journal/positions.jsonl",  # 持仓预写日志
+        snapshot_file: Optional[str] = None,  # 资金费率快照记录，用于参数回测
+        exit_mode: str = "market",  # 合约开仓成交后的平仓方式
+        clock=None,  # 时钟，模拟时传入tools.clock.VirtualClock
+        data_source: str = "coinglass",  # 资金费率数据来源
+        endpoint_selector=None,  # 域名选择器，每轮循环前切到最快的域名
+        ticker_board=None,  # 共享内存行情板，资金费率变化时提前唤醒主循环
+        ticker_poll_interval: float = 0.5,  # 读取行情板的间隔(秒)
+        order_book_manager=None,  # 本地订单簿，开仓按合约深度定量
+        max_slippage_bps: float = 30,  # 按订单簿定量时允许的最大滑点(bps)
+        order_book_max_age_ms: int = 500,  # 行情连接断开时订单簿的最大允许延迟
     ):
         """初始化资金费率套利策略
         Args:
@@ -32,31 +67,93 @@ class FundingRateArbitrage:
             max_position_value: 单个币种最大持仓价值(USDT)
             fee_rate: 交易手续费率
             margin_interest_rate: 每8小时杠杆利息率
+            journal_file: 持仓预写日志路径，启动时重放恢复持仓
+            snapshot_file: 每个结算周期的资金费率快照追加到该文件，供strategies.param_sweep回测
+            exit_mode: 合约成交后立即挂出的平仓单，默认market为结算后立即平掉两腿，
+                limit为成交均价只减仓限价单，conditional为止损条件单，
+                这两种可能在结算前成交只平掉合约腿，平仓时按实际合约持仓补平
+            clock: 取时间和主循环睡眠使用的时钟，为空使用系统时钟
+            data_source: coinglass为coinglass套利列表，bybit为Bybit linear全量行情，
+                bybit+coinglass为Bybit行情并合并coinglass的跨周期字段
+            endpoint_selector: Clients.endpoint_selector.EndpointSelector，为空固定使用默认域名
+            ticker_board: tools.ticker_board.TickerBoard，run()中后台按ticker_poll_interval读取，
+                资金费率变化只重算该交易对，机会进入排行或排序变化时主循环立即开仓，
+                不用等下一次每分钟的扫描；为空时只按每分钟扫描
+            ticker_poll_interval: 读取行情板的间隔(秒)
+            order_book_manager: tools.order_book.OrderBookManager(linear)，开仓时用合约吃单均价
+                代替lastPrice定量，并限制在max_slippage_bps滑点内，为空按lastPrice定量
+            max_slippage_bps: 按订单簿定量时允许的最大滑点(bps)
+            order_book_max_age_ms: 行情连接断开时订单簿超过多久没有更新视为过期
         """
+        if data_source not in DATA_SOURCES:
+            raise Exception(
+                f"不支持的数据来源: {data_source}, 可选: {', '.join(DATA_SOURCES)}"
+            )
         # 初始化Bybit API客户端
-        self.client = HTTP(demo=demo, api_key=api_key, api_secret=api_secret)
+        self.client = FastHTTP(demo=demo, api_key=api_key, api_secret=api_secret)
         # 设置策略参数
         self.min_funding_rate = min_funding_rate
         self.max_position_value = max_position_value
         self.fee_rate = fee_rate
         self.margin_interest_rate = margin_interest_rate
+        self.snapshot_file = snapshot_file
+        # 每个结算周期只记录一条快照，结算后回填实际费率
+        self.snapshot_recorder = (
+            SnapshotRecorder(snapshot_file) if snapshot_file else None
+        )
+        self.data_source = data_source
+        self.endpoint_selector = endpoint_selector
+        self.clock = clock or REAL_CLOCK
+        # 合约开仓成交后立即挂出平仓单，{symbol: 平仓记录}
+        self.exit_engine = ExitEngine(self.client, mode=exit_mode, clock=self.clock)
+        self.exits: Dict[str, Dict] = {}
+        # 结算后的定时平仓与主循环平仓在不同线程，开平仓对持仓记录的读写都在锁内
+        # 对账时会在持锁状态下调用平仓，需可重入
+        self.positions_lock = threading.RLock()
         # 记录当前持仓信息，格式：{symbol: {direction, amount, open_time}}
-        self.positions: Dict[str, Dict] = {}
+        # 启动时从预写日志重放恢复，开仓中/平仓中的交易对在run()开始时定向对账
+        self.journal = PositionJournal(journal_file)
+        self.positions, self.unfinished_positions = self.journal.replay()
+        self.journal.compact(self.positions, self.unfinished_positions)
+        # 增量维护的套利机会排行，可通过subscribe订阅机会变化
+        # 主循环扫描和行情板线程都会更新排行，读写都在锁内
+        self.opportunity_book = OpportunityBook(
+            self.calculate_profit, self.min_funding_rate
+        )
+        self.opportunity_lock = threading.RLock()
+        self.ticker_board = ticker_board
+        self.ticker_poll_interval = ticker_poll_interval
+        self.order_book_manager = order_book_manager
+        self.max_slippage_bps = max_slippage_bps
+        self.order_book_max_age_ms = order_book_max_age_ms
+        # 排行中有机会进入或排序变化时置位，唤醒主循环
+        self.opportunity_changed = threading.Event()
+        self.opportunity_book.subscribe(self.on_opportunity_change)
+        # 可交易交易对索引，run()中后台刷新，扫描时不再全量拉取交易对
+        self.universe = UniverseIndex(self.client)
+        self.universe.subscribe(self.on_universe_change)
+        # 杠杆和抵押开关缓存，run()开始时批量预载
+        self.account_config = AccountConfigCache(self.client)
+        self._universe_version = None
+
+    def get_next_funding_time_ns(self) -> int:
+        """获取下一个资金费率结算时间(纳秒)"""
+        # Bybit资金费率结算时间为UTC 0:00, 8:00, 16:00，与纪元对齐，直接整除
+        return next_funding_ns(self.clock.time_ns())
 
     def get_next_funding_time(self) -> datetime:
-        """获取下一个资金费率结算时间"""
-        now = datetime.utcnow()
-        # Bybit资金费率结算时间为UTC 0:00, 8:00, 16:00
-        hours = [0, 8, 16]
-        next_hour = (
-            next(h for h in hours if h > now.hour % 24)
-            if now.hour % 24 < 16
-            else hours[0]
-        )
-        next_date = (
-            now.date() if next_hour > now.hour % 24 else now.date() + timedelta(days=1)
+        """获取下一个资金费率结算时间(UTC)，仅用于显示"""
+        return to_utc_datetime(self.get_next_funding_time_ns())
+
+    def fetch_funding_data(self) -> List[Dict]:
+        """按data_source获取资金费率数据，格式均为coinglass套利列表格式"""
+        if self.data_source == "coinglass":
+            return get_bybit_interestArbitrage_data()
+        return get_bybit_native_data(
+            self.client,
+            instruments=self.universe.instruments["linear"],
+            with_coinglass=self.data_source == "bybit+coinglass",
         )
-        return datetime.combine(next_date, datetime.min.time().replace(hour=next_hour))
 
     def calculate_profit(self, funding_rate: float, holding_hours: float) -> float:
         """计算预期收益率
@@ -73,6 +170,19 @@ class FundingRateArbitrage:
         # 总收益 = 资金费率收益 - 手续费成本 - 杠杆利息成本
         return abs(funding_rate) - fee_cost - interest_cost
 
+    def get_holding_hours(self, item: Dict, now_ns: int) -> Optional[float]:
+        """
+        按数据中该交易对自己的nextFundingTime(Bybit原生数据)计算持仓时间(小时)，
+        结算周期不是8小时的交易对不按8小时网格估算，没有该字段时返回None
+        """
+        next_funding_ms = item.get("nextFundingTime")
+        if not next_funding_ms:
+            return None
+        remaining_ns = ms_to_ns(int(next_funding_ms)) - now_ns
+        if remaining_ns <= 0:
+            return None
+        return remaining_ns / NS_PER_HOUR
+
     def find_arbitrage_opportunities(self) -> List[Dict]:
         """寻找套利机会
         通过分析当前市场资金费率，寻找符合条件的套利机会
@@ -83,79 +193,166 @@ class FundingRateArbitrage:
         """
         opportunities = []
         try:
-            # 获取所有可交易的合约交易对
-            linear_symbols = set()
-            linear_instruments = self.client.get_instruments_info(
-                category="linear", status="Trading"
-            )
-            if linear_instruments.get("retCode") == 0:
-                for instrument in linear_instruments.get("result", {}).get("list", []):
-                    linear_symbols.add(instrument.get("symbol"))
-
-            # 获取所有可交易的杠杆交易对
-            spot_symbols = set()
-            spot_instruments = self.client.get_instruments_info(
-                category="spot", status="Trading"
-            )
-            if spot_instruments.get("retCode") == 0:
-                for instrument in spot_instruments.get("result", {}).get("list", []):
-                    if instrument.get("marginTrading") != "none":
-                        spot_symbols.add(instrument.get("symbol"))
-
-            # 获取同时支持现货和合约交易的交易对
-            available_symbols = linear_symbols.intersection(spot_symbols)
+            # 同时支持现货杠杆和合约交易的交易对，由交易对索引维护
+            if not self.universe.ready:
+                self.universe.refresh()
 
             # 获取所有交易对的资金费率数据
-            data = get_bybit_interestArbitrage_data()
-            # 计算持仓时间
-            next_funding_time = self.get_next_funding_time()
-            holding_hours = (
-                next_funding_time - datetime.utcnow()
-            ).total_seconds() / 3600
-
-            # 筛选出资金费率超过阈值的Bybit交易对，且必须是可交易的交易对
-            data_list = [
-                item
-                for item in data
-                if item.get("exchangeName") == "Bybit"
-                and abs(item.get("fundingRate", 0)) >= self.min_funding_rate * 100
-                and item.get("symbol") in available_symbols
-            ]
-
-            for item in data_list:
-                symbol = item.get("symbol")
-                try:
-                    # 验证交易对是否可以获取价格
-                    ticker = self.client.get_tickers(category="spot", symbol=symbol)
-                    if ticker.get("retCode") != 0:
-                        print(
-                            f"警告：无法获取交易对价格 - 交易对: {symbol}, 错误: {ticker.get('retMsg')}"
-                        )
+            data = self.fetch_funding_data()
+            # 计算持仓时间，原生数据中带结算时间的交易对按各自的结算时间计算
+            now_ns = self.clock.time_ns()
+            next_funding_time_ns = self.get_next_funding_time_ns()
+            holding_hours = (next_funding_time_ns - now_ns) / NS_PER_HOUR
+            if self.snapshot_recorder:
+                # 快照只记录可交易的交易对，与机会排行的口径一致，回测不会选到实盘不能开仓的交易对
+                available = self.universe.available
+                self.snapshot_recorder.record(
+                    [item for item in data if item.get("symbol") in available],
+                    holding_hours,
+                    ns_to_ms(next_funding_time_ns),
+                    ns_to_ms(now_ns),
+                )
+
+            # 更新机会排行，只重算资金费率或可交易状态有变化的交易对
+            with self.opportunity_lock:
+                book = self.opportunity_book
+                book.set_holding_hours(holding_hours)
+                if self._universe_version != self.universe.version:
+                    # 可交易交易对有变化时才重算
+                    book.set_universe(self.universe.available)
+                    self._universe_version = self.universe.version
+                bybit_symbols = set()
+                for item in data:
+                    if item.get("exchangeName") != "Bybit":
                         continue
+                    bybit_symbols.add(item.get("symbol"))
+                    item_hours = self.get_holding_hours(item, now_ns)
+                    if item_hours is not None:
+                        item["holdingHours"] = item_hours
+                    book.update(item)
+                for symbol in list(book.items.keys() - bybit_symbols):
+                    book.remove(symbol)
 
-                    funding_rate = float(item.get("fundingRate", 0))
-                    # 计算预期收益率（考虑手续费和利息成本）
-                    expected_profit = self.calculate_profit(funding_rate, holding_hours)
+            opportunities = self.select_opportunities()
 
-                    # 如果预期收益率超过阈值，添加到套利机会列表
-                    if abs(expected_profit) > self.min_funding_rate:
-                        item["expected_profit"] = expected_profit
-                        opportunities.append(item)
+        except Exception as e:
+            print(f"错误：获取交易对信息失败 - {str(e)}")
+            return []
+
+        return opportunities
 
-                except Exception as e:
+    def select_opportunities(self) -> List[Dict]:
+        """
+        从当前排行中取出能获取现货价格的机会，不重新拉取资金费率数据
+        行情板唤醒主循环时直接调用，排行本身已按预期收益率绝对值降序排序
+        """
+        opportunities = []
+        with self.opportunity_lock:
+            ranking = self.opportunity_book.top()
+        for item in ranking:
+            symbol = item.get("symbol")
+            try:
+                # 验证交易对是否可以获取价格
+                ticker = self.client.get_tickers(category="spot", symbol=symbol)
+                if ticker.get("retCode") != 0:
                     print(
-                        f"警告：处理交易对数据失败 - 交易对: {symbol}, 错误: {str(e)}"
+                        f"警告：无法获取交易对价格 - 交易对: {symbol}, 错误: {ticker.get('retMsg')}"
                     )
                     continue
+                opportunities.append(item)
 
-        except Exception as e:
-            print(f"错误：获取交易对信息失败 - {str(e)}")
-            return []
+            except Exception as e:
+                print(f"警告：处理交易对数据失败 - 交易对: {symbol}, 错误: {str(e)}")
+                continue
+        return opportunities
+
+    def on_universe_change(self, category: str, symbol: str, event: str, instrument):
+        """交易对上架/下架/状态变化，持仓中的交易对需要提醒"""
+        if symbol in self.positions and event != "listed":
+            status = instrument.get("status") if instrument else None
+            print(
+                f"警告：持仓交易对状态变化 - 交易对: {symbol}, 市场: {category}, "
+                f"事件: {event}, 状态: {status}"
+            )
 
-        # 按预期收益率绝对值降序排序
-        return sorted(
-            opportunities, key=lambda x: abs(x["expected_profit"]), reverse=True
+    def on_ticker_update(
+        self, symbol: str, funding_rate: float, price: Optional[float] = None
+    ):
+        """
+        单个交易对行情更新（如行情板/WebSocket推送），只调整该交易对的排行
+        funding_rate: Bybit原始资金费率（小数形式）
+        """
+        with self.opportunity_lock:
+            self.opportunity_book.update_funding(symbol, funding_rate * 100, price)
+
+    def on_opportunity_change(self, symbol: str, item: Optional[Dict]):
+        """机会进入排行或排序变化时唤醒主循环，退出排行不需要开仓"""
+        if item is not None:
+            self.opportunity_changed.set()
+
+    def poll_ticker_board(self, last_seqs: Dict[str, int]) -> int:
+        """
+        读取一次行情板，把seq有变化的交易对推给排行
+        last_seqs: 每个交易对上次处理的seq，原地更新
+        Returns: 有变化的交易对数
+        """
+        changed = 0
+        for symbol in self.ticker_board.symbols():
+            record = self.ticker_board.read(symbol)
+            if record is None or last_seqs.get(symbol) == record[0]:
+                continue
+            last_seqs[symbol] = record[0]
+            self.on_ticker_update(symbol, record[2], record[1])
+            changed += 1
+        return changed
+
+    def follow_ticker_board(self):
+        """行情板线程：按ticker_poll_interval读取行情板，直到程序退出"""
+        last_seqs: Dict[str, int] = {}
+        while True:
+            try:
+                self.poll_ticker_board(last_seqs)
+            except Exception as e:
+                print(f"警告：读取行情板失败 - 错误: {str(e)}")
+            time.sleep(self.ticker_poll_interval)
+
+    def wait_for_opportunity(self, timeout: float) -> bool:
+        """
+        等待下一轮循环，开启行情板时排行变化会提前唤醒
+        Returns: 是否被排行变化提前唤醒
+        """
+        if self.ticker_board is None:
+            self.clock.sleep(timeout)
+            return False
+        woken = self.opportunity_changed.wait(timeout)
+        self.opportunity_changed.clear()
+        return woken
+
+    def limit_amount_by_order_book(
+        self, symbol: str, side: str, amount: float, qty_step: float, min_qty: float
+    ) -> float:
+        """
+        按本地合约订单簿修正开仓数量，不发REST请求
+        用吃单均价代替lastPrice按max_position_value重算，并限制在max_slippage_bps滑点内可成交的数量
+        没有订单簿或订单簿不可用时原样返回(按lastPrice定量)
+        """
+        if self.order_book_manager is None:
+            return amount
+        book, reason = self.order_book_manager.usable_book(
+            symbol, self.order_book_max_age_ms
         )
+        if book is None:
+            print(f"警告：{reason}，按lastPrice定量 - 交易对: {symbol}")
+            return amount
+        limited, vwap, worst_price, depth_qty = book.limit_qty(
+            side, amount, self.max_position_value, self.max_slippage_bps
+        )
+        print(
+            f"订单簿定量 - 交易对: {symbol}, 吃单均价: {vwap}, 最差价: {worst_price}, "
+            f"{self.max_slippage_bps}bps内可成交: {depth_qty}"
+        )
+        step = Decimal(str(qty_step))
+        return max(min_qty, float(Decimal(str(limited)) // step * step))
 
     def open_arbitrage_position(self, position: dict, amount: float):
         """开启套利仓位
@@ -178,6 +375,8 @@ class FundingRateArbitrage:
             )
             return
 
+        # 本次开仓的对账状态，落盘开仓意图后才有值，失败时只按本次的订单对账
+        attempt = None
         try:
             # 设置更大的接收窗口，处理时间同步问题
             self.client.recv_window = 60000
@@ -221,31 +420,38 @@ class FundingRateArbitrage:
             adjusted_amount = max(
                 min_qty, round(min(amount, max_amount_by_balance) / qty_step * qty_step)
             )
-
-            # 设置合约端杠杆
-            try:
-                self.client.set_leverage(
-                    category="linear",
-                    symbol=position["symbol"],
-                    buyLeverage="2",
-                    sellLeverage="2",
-                )
-            except Exception as e:
-                if "leverage not modified" in str(e):
-                    # 已经设置过2倍杠杆，再次设置就会报错
-                    pass
-
-            # 设置现货端杠杆
-            self.client.set_leverage(
-                category="spot",
-                symbol=position["symbol"],
-                buyLeverage="2",
-                sellLeverage="2",
+            adjusted_amount = self.limit_amount_by_order_book(
+                position["symbol"],
+                "Buy" if position["futuresType"] == "long" else "Sell",
+                adjusted_amount,
+                qty_step,
+                min_qty,
             )
 
+            # 杠杆和抵押开关与缓存一致时不发请求，稳定运行时开仓前没有配置请求
+            self.account_config.ensure_leverage("linear", position["symbol"], 2)
+            # 设置现货端杠杆
+            self.account_config.ensure_leverage("spot", position["symbol"], 2)
             # 设置现货杠杆资产抵押
-            self.client.set_collateral_coin(
-                coin=position["currency"], collateralSwitch="ON"
+            self.account_config.ensure_collateral(position["currency"])
+
+            # 下单前先落盘开仓意图和本次各腿的orderLinkId，崩溃后可据此对账
+            attempt = {
+                "status": "opening",
+                "direction": position["futuresType"],
+                "orders": {},
+                "orderLinkIds": {
+                    "futures": new_order_link_id(),
+                    "spot": new_order_link_id(),
+                },
+            }
+            self.journal.append(
+                "intent",
+                position["symbol"],
+                sync=True,
+                direction=position["futuresType"],
+                amount=adjusted_amount,
+                orderLinkIds=attempt["orderLinkIds"],
             )
 
             # 合约端开仓
@@ -257,24 +463,45 @@ class FundingRateArbitrage:
                 order_type="Market",
                 qty=str(adjusted_amount),  # 转换为字符串，避免精度问题
                 reduce_only=False,
+                orderLinkId=attempt["orderLinkIds"]["futures"],
             )
-            history = self.client.get_order_history(orderId=order["result"]["orderId"])
-            side = "Sell" if position["futuresType"] == "long" else "Buy"
-            # filled之后
-            avg_open_order_price = float(history["result"]["list"][0]["avgPrice"])
-            self.client.place_order(
-                category="linear",
-                symbol=position["symbol"],
-                side=side,
-                order_type="Limit",
-                qty=str(adjusted_amount),  # 转换为字符串，避免精度问题
-                reduce_only=True,
+            attempt["orders"]["futures"] = order["result"]["orderId"]
+            self.journal.append(
+                "order",
+                position["symbol"],
+                leg="futures",
+                orderId=order["result"]["orderId"],
+            )
+            # 确认成交后立即挂出平仓单，缩短结算后的裸露时间
+            fill = self.exit_engine.confirm_fill(
+                "linear", position["symbol"], order_id=order["result"]["orderId"]
             )
+            if fill is None:
+                raise Exception("合约开仓未确认成交")
+            exit_record = self.exit_engine.arm(
+                "linear",
+                position["symbol"],
+                side,
+                qty=fill["cumExecQty"],
+                fill_price=fill["avgPrice"],
+                # 原生数据带各自的结算时间，结算周期不是8小时的交易对不按8小时网格
+                settlement_ms=int(position.get("nextFundingTime") or 0)
+                or ns_to_ms(self.get_next_funding_time_ns()),
+                close=lambda: self.close_arbitrage_position(position["symbol"]),
+            )
+            self.exits[position["symbol"]] = exit_record
+            if exit_record.get("response"):
+                self.journal.append(
+                    "order",
+                    position["symbol"],
+                    leg="exit",
+                    orderId=exit_record["response"].get("result", {}).get("orderId"),
+                )
             # 现货端开反向仓位（使用相同的币数量）
             spot_side = "Sell" if position["spotType"] == "sell" else "Buy"
             # 计算现货交易的USDT价值
             spot_value = adjusted_amount * current_price
-            self.client.place_order(
+            spot_order = self.client.place_order(
                 category="spot",
                 symbol=position["symbol"],
                 side=spot_side,
@@ -282,21 +509,45 @@ class FundingRateArbitrage:
                 isLeverage=1,
                 qty=str(adjusted_amount),  # 现货交易使用USDT价值
                 marketUnit="baseCoin",
+                orderLinkId=attempt["orderLinkIds"]["spot"],
+            )
+            attempt["orders"]["spot"] = spot_order["result"]["orderId"]
+            self.journal.append(
+                "order",
+                position["symbol"],
+                leg="spot",
+                orderId=spot_order["result"]["orderId"],
             )
 
             # 记录持仓信息
-            self.positions[position["symbol"]] = {
-                "direction": position["futuresType"],
-                "amount": adjusted_amount,
-                "spot_amount": round(spot_value, 6),
-                "open_time": datetime.utcnow(),
-            }
+            with self.positions_lock:
+                self.positions[position["symbol"]] = {
+                    "direction": position["futuresType"],
+                    "amount": adjusted_amount,
+                    "spot_amount": round(spot_value, 6),
+                    "open_time": self.clock.utcnow(),
+                }
+                self.journal.append(
+                    "open",
+                    position["symbol"],
+                    position=self.positions[position["symbol"]],
+                )
 
         except Exception as e:
             error_msg = f"开仓失败 - 币种: {position['symbol']}, .P方向: {position['futuresType']}, 数量: {adjusted_amount}, 错误: {str(e)}"
             print(error_msg)
+            # 杠杆/保证金相关的拒单说明缓存可能已过期(如手动改过杠杆)
+            self.account_config.invalidate_on_reject(e, "linear", position["symbol"])
+            self.account_config.invalidate_on_reject(e, "spot", position["symbol"])
             # 如果其中一个订单失败，需要关闭另一个订单，避免单边持仓
-            self.close_arbitrage_position(position["symbol"])
+            if position["symbol"] in self.positions:
+                self.close_arbitrage_position(position["symbol"])
+            elif attempt is not None:
+                exit_record = self.exits.pop(position["symbol"], None)
+                if exit_record is not None and exit_record["mode"] != "market":
+                    self.exit_engine.cancel(exit_record)
+                # 只对账本次带orderLinkId发出的订单，账户上其他来源的仓位不动
+                self.recover_position(position["symbol"], attempt)
 
     def get_usdt_balance(self) -> float:
         """获取USDT余额
@@ -351,58 +602,181 @@ class FundingRateArbitrage:
             2. 合约和现货同时平仓，以清除所有风险敞口
             3. 平仓后会从self.positions中删除该交易对的记录
         """
-        if symbol not in self.positions:
-            return
+        with self.positions_lock:
+            if symbol not in self.positions:
+                return
+            position = self.positions[symbol]
+            self.journal.append("closing", symbol, sync=True)
+            exit_record = self.exits.pop(symbol, None)
+            if exit_record is not None and exit_record["mode"] != "market":
+                # 主动平仓前撤掉还挂着的平仓单
+                self.exit_engine.cancel(exit_record)
+            try:
+                # 合约端按实际持仓平仓，限价平仓单可能已在结算前成交，合约腿已平时只平现货
+                futures_size = min(
+                    self.get_linear_position_size(symbol), float(position["amount"])
+                )
+                if futures_size > 0:
+                    side = "Sell" if position["direction"] == "long" else "Buy"
+                    self.client.place_order(
+                        category="linear",
+                        symbol=symbol,
+                        side=side,
+                        order_type="Market",
+                        qty=str(futures_size),
+                        reduce_only=True,  # 确保是平仓操作
+                    )
+                else:
+                    print(f"合约腿已平 - 交易对: {symbol}, 只平现货")
+
+                # 现货端平仓，与开仓方向相反
+                spot_side = "Buy" if position["direction"] == "long" else "Sell"
+                self.client.place_order(
+                    category="spot",
+                    symbol=symbol,
+                    side=spot_side,
+                    order_type="Market",
+                    marketUnit="quoteCoin",  # 使用USDT金额下单
+                    qty=position["spot_amount"],
+                )
 
-        position = self.positions[symbol]
-        try:
-            # 合约端平仓，与开仓方向相反
-            side = "Sell" if position["direction"] == "long" else "Buy"
-            self.client.place_order(
-                category="linear",
-                symbol=symbol,
-                side=side,
-                order_type="Market",
-                qty=position["amount"],
-                reduce_only=True,  # 确保是平仓操作
-            )
+                # 删除持仓记录
+                del self.positions[symbol]
+                self.journal.append("closed", symbol, sync=True)
 
-            # 现货端平仓，与开仓方向相反
-            spot_side = "Buy" if position["direction"] == "long" else "Sell"
-            self.client.place_order(
-                category="spot",
-                symbol=symbol,
-                side=spot_side,
-                order_type="Market",
-                marketUnit="quoteCoin",  # 使用USDT金额下单
-                qty=position["spot_amount"],
-            )
+            except Exception as e:
+                error_msg = f"平仓失败 - 币种: {symbol}, 方向: {position['direction']}, 现货数量: {position['spot_amount']}, 合约数量: {position['amount']}, 错误: {str(e)}"
+                print(error_msg)
+
+    def get_linear_position_size(self, symbol: str) -> float:
+        """查询单个交易对的合约持仓数量"""
+        response = self.client.get_positions(category="linear", symbol=symbol)
+        position_list = response.get("result", {}).get("list", [])
+        return sum(float(item.get("size") or 0) for item in position_list)
 
-            # 删除持仓记录
-            del self.positions[symbol]
+    def get_own_filled_qty(
+        self, category: str, symbol: str, state: Dict, leg: str
+    ) -> float:
+        """
+        按本次开仓的orderId/orderLinkId查询某一腿的成交数量，没有发出或没有成交时为0
+        日志中没有orderLinkId(旧版本写入)且没有orderId时视为未下单
+        """
+        order_id = state.get("orders", {}).get(leg)
+        order_link_id = state.get("orderLinkIds", {}).get(leg)
+        if not order_id and not order_link_id:
+            return 0.0
+        fill = self.exit_engine.confirm_fill(
+            category, symbol, order_id=order_id, order_link_id=order_link_id
+        )
+        if fill is None:
+            return 0.0
+        return float(fill.get("cumExecQty") or 0)
 
+    def recover_position(self, symbol: str, state: Dict):
+        """
+        对单个未完成的交易对做定向对账
+        开仓中：只处理本次开仓的订单(按日志中的orderId/orderLinkId查询成交)，
+            两腿都有成交则恢复为持仓，只有合约腿则平掉本次成交的数量，避免单边持仓，
+            账户上其他来源的同symbol仓位不动
+        平仓中：继续完成未平掉的一腿
+        """
+        try:
+            if state["status"] == "opening":
+                own_size = self.get_own_filled_qty("linear", symbol, state, "futures")
+                if own_size:
+                    # 本次成交的数量可能已被手动或平仓单部分平掉
+                    own_size = min(own_size, self.get_linear_position_size(symbol))
+                spot_filled = self.get_own_filled_qty("spot", symbol, state, "spot")
+                if own_size and spot_filled:
+                    spot_price = float(
+                        self.client.get_tickers(category="spot", symbol=symbol)[
+                            "result"
+                        ]["list"][0]["lastPrice"]
+                    )
+                    with self.positions_lock:
+                        self.positions[symbol] = {
+                            "direction": state["direction"],
+                            "amount": own_size,
+                            "spot_amount": round(spot_filled * spot_price, 6),
+                            "open_time": self.clock.utcnow(),
+                        }
+                        self.journal.append(
+                            "open", symbol, sync=True, position=self.positions[symbol]
+                        )
+                    print(f"对账恢复持仓 - 交易对: {symbol}, 合约数量: {own_size}")
+                    return
+                if own_size:
+                    side = "Sell" if state["direction"] == "long" else "Buy"
+                    self.client.place_order(
+                        category="linear",
+                        symbol=symbol,
+                        side=side,
+                        order_type="Market",
+                        qty=str(own_size),
+                        reduce_only=True,
+                    )
+                    print(f"对账平掉单边合约 - 交易对: {symbol}, 数量: {own_size}")
+                elif spot_filled:
+                    print(f"警告：交易对{symbol}合约无仓位但现货已成交，请人工处理")
+                self.journal.append("failed", symbol, sync=True)
+            elif state["status"] == "closing":
+                # 平仓按实际合约持仓处理，合约腿已平时只平现货腿
+                with self.positions_lock:
+                    self.positions[symbol] = state["position"]
+                    self.close_arbitrage_position(symbol)
         except Exception as e:
-            error_msg = f"平仓失败 - 币种: {symbol}, 方向: {position['direction']}, 现货数量: {position['spot_amount']}, 合约数量: {position['amount']}, 错误: {str(e)}"
-            print(error_msg)
+            print(f"对账失败 - 交易对: {symbol}, 错误: {str(e)}")
+
+    def recover_unfinished_positions(self):
+        """启动时只对日志中未完成的交易对对账，不扫描全部交易对"""
+        for symbol, state in list(self.unfinished_positions.items()):
+            self.recover_position(symbol, state)
+        self.unfinished_positions = {}
+
+    def seed_account_config(self):
+        """一次持仓请求和一次抵押信息请求预载杠杆和抵押开关，失败时退化为首次开仓时设置"""
+        try:
+            self.account_config.seed("linear")
+            self.account_config.seed_collateral()
+        except Exception as e:
+            print(f"警告：预载账户配置失败 - 错误: {str(e)}")
 
     def run(self):
         """运行策略
         主循环：
         1. 在资金费率结算前30分钟，寻找并执行新的套利机会
-        2. 在资金费率结算前1分钟，关闭所有持仓
+        2. 在资金费率结算后1分钟，关闭结算前开的持仓
         3. 每分钟检查一次市场状态
         """
+        self.recover_unfinished_positions()
+        self.universe.start()
+        self.seed_account_config()
+        if self.ticker_board is not None:
+            threading.Thread(
+                target=self.follow_ticker_board, name="ticker-board", daemon=True
+            ).start()
+        # 被行情板唤醒时只从排行中取机会，不重新拉取资金费率数据
+        woken = False
         while True:
             try:
+                if self.endpoint_selector is not None:
+                    # 在开仓/平仓请求之间切换，不影响进行中的请求
+                    self.endpoint_selector.apply(self.client)
                 # 获取下一个资金费率结算时间
-                next_funding_time = self.get_next_funding_time()
-                now = datetime.utcnow()
+                next_settlement_ns = self.get_next_funding_time_ns()
+                now_ns = self.clock.time_ns()
 
                 # 如果距离下次资金费率结算还有30分钟，寻找新的套利机会
-                time_to_funding = (next_funding_time - now).total_seconds()
+                time_to_funding = (next_settlement_ns - now_ns) / NS_PER_SECOND
                 if True:  # 在结算前30-29分钟之间开仓
                     # 寻找新的套利机会
-                    opportunities = self.find_arbitrage_opportunities()
+                    scan_start = time.perf_counter()
+                    if woken:
+                        opportunities = self.select_opportunities()
+                    else:
+                        opportunities = self.find_arbitrage_opportunities()
+                    SCAN_DURATION.observe(time.perf_counter() - scan_start)
+                    OPPORTUNITIES.set(len(opportunities))
                     for opp in opportunities:
                         # 控制最大持仓数量，避免资金分散
                         if len(self.positions) >= 5:  # 最多同时持有5个币种的仓位
@@ -432,19 +806,35 @@ class FundingRateArbitrage:
                         if amount > 0:
                             self.open_arbitrage_position(opp, amount)
 
-                # 在资金费率结算后1分钟关闭所有仓位
-                elif time_to_funding < -60:  # 结算后1分钟
-                    for opp["symbol"] in list(self.positions.keys()):
-                        self.close_arbitrage_position(opp["symbol"])
-
-                time.sleep(60)  # 每分钟检查一次
+                # 在资金费率结算后1分钟关闭上次结算前开的仓位，
+                # exit_mode为market时平仓已在结算后由ExitEngine完成
+                last_funding_ns = next_settlement_ns - FUNDING_INTERVAL_NS
+                if now_ns - last_funding_ns > 60 * NS_PER_SECOND:  # 结算后1分钟
+                    with self.positions_lock:
+                        positions = list(self.positions.items())
+                    for symbol, position in positions:
+                        open_time = position["open_time"]
+                        if isinstance(open_time, str):
+                            # 从日志恢复的持仓
+                            open_time = datetime.fromisoformat(open_time)
+                        # open_time为UTC时间
+                        if from_utc_datetime(open_time) < last_funding_ns:
+                            self.close_arbitrage_position(symbol)
+
+                STRATEGY_LOOPS.labels("ok").inc()
+                # 每分钟检查一次，行情板推送的资金费率变化会提前唤醒
+                woken = self.wait_for_opportunity(60)
 
             except Exception as e:
-                error_msg = f"策略运行错误 - 时间: {datetime.utcnow()}, 错误: {str(e)}"
+                STRATEGY_LOOPS.labels("error").inc()
+                error_msg = (
+                    f"策略运行错误 - 时间: {self.clock.utcnow()}, 错误: {str(e)}"
+                )
                 if "opportunities" in locals():
                     error_msg += f"\n当前套利机会: {opportunities}"
                 print(error_msg)
-                time.sleep(60)
+                woken = False
+                self.clock.sleep(60)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,184 @@
+from bisect import bisect_left, insort
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+
+# 增量维护的套利机会排行
+# 按symbol接收资金费率/价格更新，只重算变化的symbol的预期收益率，
+# 排行用按 -abs(expected_profit) 排序的有序列表维护，读取前K个是O(k)
+# 定位是O(log n)的二分查找，插入/删除是列表内存移动，严格来说是O(n)；
+# Bybit可套利的交易对只有几百个，实测比sortedcontainers.SortedList的O(log n)更快，也不引入依赖
+# 机会进入、退出排行或资金费率变化使排序改变时通知订阅者
+class OpportunityBook:
+    def __init__(
+        self,
+        calculate_profit: Callable[[float, float], float],
+        min_funding_rate: float,
+        holding_hours: float = 8,
+    ):
+        """
+        Args:
+            calculate_profit: 预期收益率计算函数，参数为(资金费率, 持仓小时数)
+            min_funding_rate: 最小资金费率阈值，与策略保持一致
+            holding_hours: 持仓时间（小时）
+        """
+        self.calculate_profit = calculate_profit
+        self.min_funding_rate = min_funding_rate
+        self.holding_hours = holding_hours
+        # 可交易的交易对，为None时不过滤
+        self.universe: Optional[Set[str]] = None
+        # 所有收到过的数据，格式：{symbol: item}，item与coinglass套利列表格式一致
+        self.items: Dict[str, Dict] = {}
+        # 排行，元素为(-abs(expected_profit), symbol)
+        self._ranking: List[tuple] = []
+        # 当前在排行中的symbol -> 排序键
+        self._keys: Dict[str, tuple] = {}
+        self._listeners: List[Callable[[str, Optional[Dict]], None]] = []
+
+    def subscribe(self, listener: Callable[[str, Optional[Dict]], None]):
+        """订阅排行变化，回调参数为(symbol, item)，退出排行时item为None"""
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self, symbol: str, item: Optional[Dict]):
+        for listener in list(self._listeners):
+            try:
+                listener(symbol, item)
+            except Exception as e:
+                print(f"警告：套利机会通知失败 - 交易对: {symbol}, 错误: {str(e)}")
+
+    def _eligible(self, item: Dict) -> bool:
+        if self.universe is not None and item.get("symbol") not in self.universe:
+            return False
+        if abs(item.get("fundingRate", 0)) < self.min_funding_rate * 100:
+            return False
+        return abs(item["expected_profit"]) > self.min_funding_rate
+
+    def _remove_key(self, symbol: str):
+        key = self._keys.pop(symbol, None)
+        if key is None:
+            return False
+        index = bisect_left(self._ranking, key)
+        del self._ranking[index]
+        return True
+
+    def _holding_hours(self, item: Dict) -> float:
+        # 带holdingHours的数据(按该交易对自己的结算时间)不使用统一的持仓时间
+        holding_hours = item.get("holdingHours")
+        if holding_hours is None:
+            return self.holding_hours
+        return round(holding_hours, 2)
+
+    def _refresh(self, symbol: str, notify_change: bool = True):
+        """
+        重算单个symbol的收益率并调整排行位置
+        进入/退出排行总是通知，排序键变化只在notify_change时通知，排序键没变不通知
+        """
+        item = self.items[symbol]
+        item["expected_profit"] = self.calculate_profit(
+            float(item.get("fundingRate", 0)), self._holding_hours(item)
+        )
+        old_key = self._keys.get(symbol)
+        if self._eligible(item):
+            key = (-abs(item["expected_profit"]), symbol)
+            if key == old_key:
+                return
+            self._remove_key(symbol)
+            insort(self._ranking, key)
+            self._keys[symbol] = key
+            if old_key is None or notify_change:
+                self._notify(symbol, item)
+        elif self._remove_key(symbol):
+            self._notify(symbol, None)
+
+    def update(self, item: Dict):
+        """
+        更新一条完整数据（coinglass套利列表格式）
+        带holdingHours时按该值计算收益率，否则使用set_holding_hours设置的统一持仓时间
+        """
+        symbol = item.get("symbol")
+        if not symbol:
+            return
+        old_item = self.items.get(symbol)
+        self.items[symbol] = item
+        if (
+            old_item is not None
+            and "expected_profit" in old_item
+            and old_item.get("fundingRate") == item.get("fundingRate")
+            and self._holding_hours(old_item) == self._holding_hours(item)
+        ):
+            # 资金费率和持仓时间都没变，沿用已算好的收益率和排行位置
+            item["expected_profit"] = old_item["expected_profit"]
+            return
+        # 只有持仓时间随时间流逝变化时只重排不通知
+        self._refresh(
+            symbol,
+            notify_change=old_item is None
+            or old_item.get("fundingRate") != item.get("fundingRate"),
+        )
+
+    def update_funding(
+        self,
+        symbol: str,
+        funding_rate: Optional[float] = None,
+        price: Optional[float] = None,
+    ):
+        """
+        更新单个symbol的资金费率/价格
+        funding_rate: 百分比形式，与coinglass数据一致（-0.5即-0.5%）
+        """
+        item = self.items.get(symbol)
+        if item is None:
+            item = self.items[symbol] = {"symbol": symbol, "exchangeName": "Bybit"}
+        if price is not None:
+            item["lastPrice"] = price
+        if funding_rate is None or funding_rate == item.get("fundingRate"):
+            return
+        item["fundingRate"] = funding_rate
+        self._refresh(symbol)
+
+    def remove(self, symbol: str):
+        self.items.pop(symbol, None)
+        if self._remove_key(symbol):
+            self._notify(symbol, None)
+
+    def set_universe(self, symbols: Optional[Iterable[str]]):
+        """设置可交易交易对，只重算可交易状态发生变化的symbol"""
+        new_universe = set(symbols) if symbols is not None else None
+        old_universe = self.universe
+        self.universe = new_universe
+        if old_universe is None or new_universe is None:
+            changed = self.items.keys()
+        else:
+            changed = (old_universe ^ new_universe) & self.items.keys()
+        for symbol in list(changed):
+            self._refresh(symbol)
+
+    def set_holding_hours(self, holding_hours: float):
+        """
+        持仓时间按0.01小时(36秒)取整，每次扫描时间流逝不会触发全量重算
+        持仓时间变化对所有symbol的收益率影响相同，只重排不逐个通知，进入/退出排行仍会通知
+        """
+        holding_hours = round(holding_hours, 2)
+        if holding_hours == self.holding_hours:
+            return
+        self.holding_hours = holding_hours
+        for symbol, item in list(self.items.items()):
+            if item.get("holdingHours") is None:
+                self._refresh(symbol, notify_change=False)
+
+    def top(self, k: Optional[int] = None) -> List[Dict]:
+        """按预期收益率绝对值降序返回前k个机会"""
+        ranking = self._ranking if k is None else self._ranking[:k]
+        return [self.items[symbol] for _, symbol in ranking]
+
+    def get(self, symbol: str) -> Optional[Dict]:
+        return self.items.get(symbol) if symbol in self._keys else None
+
+    def __len__(self):
+        return len(self._ranking)
+
+    def __contains__(self, symbol: str):
+        return symbol in self._keys
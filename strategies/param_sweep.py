@@ -0,0 +1,326 @@
+"""
+FundingRateArbitrage 参数网格回测
+
+用法（在仓库根目录执行）：
+    python -m strategies.param_sweep --snapshots snapshots.jsonl --grid grid.json
+
+snapshots.jsonl 每个结算周期一行资金费率快照，由 FundingRateArbitrage(snapshot_file=...) 记录：
+    {"time": 毫秒时间戳, "settlement": 结算时间(毫秒), "holding_hours": 持仓小时数,
+     "items": [coinglass套利列表格式]}
+    快照取结算前开仓窗口内的第一次扫描，结算后才写入
+    items 只包含记录时可交易(同时支持现货杠杆和合约)的交易对
+    item 中的 realizedFundingRate（百分比）为结算前最后一次扫描到的费率，即实际结算费率，
+    缺省按快照费率计算
+grid.json 为参数名到候选值列表的映射，未给出的参数使用策略默认值：
+    {"min_funding_rate": [0.0005, 0.001], "max_positions": [3, 5]}
+
+快照数据在主进程打包为列式数组放进共享内存，工作进程只读映射，不随任务序列化
+"""
+
+import argparse
+import itertools
+import json
+import time
+from array import array
+from multiprocessing import Pool, shared_memory
+from typing import Dict, List, Optional
+
+# 可扫描的参数及默认值，与FundingRateArbitrage/run()/config保持一致
+DEFAULT_PARAMS = {
+    "min_funding_rate": 0.001,
+    "fee_rate": 0.0006,
+    "margin_interest_rate": 0.0002,
+    "max_position_value": 1000,
+    "max_positions": 5,
+    # 单向套利的资金费率阈值(小数)，为None时不限制
+    "minimal_acceptable_funding_rate": None,
+    # 回测账户余额(USDT)
+    "balance": 1000,
+}
+
+
+def append_snapshot(
+    path: str,
+    items: List[Dict],
+    holding_hours: float,
+    time_ms: Optional[int] = None,
+    settlement_ms: Optional[int] = None,
+):
+    """追加一条资金费率快照"""
+    snapshot = {
+        "time": int(time.time() * 1000) if time_ms is None else time_ms,
+        "holding_hours": holding_hours,
+        "items": items,
+    }
+    if settlement_ms is not None:
+        snapshot["settlement"] = settlement_ms
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(snapshot, ensure_ascii=False) + "\n")
+
+
+class SnapshotRecorder(object):
+    """
+    每个结算周期只记录一条快照
+    结算前decision_lead_ms内的第一次扫描作为开仓时看到的快照，之后每次扫描刷新各交易对的费率，
+    结算时间变化(上一周期已结算)时把最后看到的费率作为realizedFundingRate回填后写入。
+    Bybit按结算时刻的预测费率收取资金费，结算前最后一次扫描的费率与实际结算费率的差别
+    只有一个扫描间隔内的变化
+    """
+
+    def __init__(self, path: str, decision_lead_ms: int = 30 * 60 * 1000) -> None:
+        self.path = path
+        self.decision_lead_ms = decision_lead_ms
+        self.settlement_ms: Optional[int] = None
+        # 本周期的快照: (扫描时间, 持仓小时数, items)，开仓窗口前为None
+        self.pending = None
+        # 本周期快照中各交易对最后一次扫描到的费率，{(exchangeName, symbol): fundingRate}
+        self.latest: Dict = {}
+
+    @staticmethod
+    def make_key(item: Dict):
+        return item.get("exchangeName"), item.get("symbol")
+
+    def record(
+        self, items: List[Dict], holding_hours: float, settlement_ms: int, now_ms: int
+    ) -> bool:
+        """记录一次扫描，返回是否写入了上一周期的快照"""
+        written = False
+        if settlement_ms != self.settlement_ms:
+            written = self.flush()
+            self.settlement_ms = settlement_ms
+        if self.pending is None:
+            if settlement_ms - now_ms > self.decision_lead_ms:
+                return written
+            # 复制一份，策略之后会往item里写持仓时间等字段
+            self.pending = (now_ms, holding_hours, [dict(item) for item in items])
+            self.latest = {}
+        for item in items:
+            self.latest[self.make_key(item)] = item.get("fundingRate")
+        return written
+
+    def flush(self) -> bool:
+        """写入本周期的快照，未到开仓窗口时不写"""
+        if self.pending is None:
+            return False
+        time_ms, holding_hours, items = self.pending
+        for item in items:
+            realized = self.latest.get(self.make_key(item))
+            if realized is not None:
+                item["realizedFundingRate"] = realized
+        append_snapshot(self.path, items, holding_hours, time_ms, self.settlement_ms)
+        self.pending = None
+        self.latest = {}
+        return True
+
+
+def load_snapshots(path: str) -> List[Dict]:
+    snapshots = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                snapshots.append(json.loads(line))
+    return snapshots
+
+
+class SharedSnapshots(object):
+    """
+    快照的列式共享内存表示，全部为double
+    头部: 快照数 n, 行数 m
+    快照列: start[n] end[n] holding_hours[n]
+    行列:   rate[m] realized[m]  (百分比，每个快照内按|rate|降序)
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool) -> None:
+        self.shm = shm
+        self.owner = owner
+        values = shm.buf.cast("d")
+        self.values = values
+        n = int(values[0])
+        m = int(values[1])
+        offset = 2
+        self.start = values[offset : offset + n]
+        self.end = values[offset + n : offset + 2 * n]
+        self.holding_hours = values[offset + 2 * n : offset + 3 * n]
+        offset += 3 * n
+        self.rate = values[offset : offset + m]
+        self.realized = values[offset + m : offset + 2 * m]
+        self.count = n
+
+    @classmethod
+    def create(cls, snapshots: List[Dict]):
+        start = array("d")
+        end = array("d")
+        holding_hours = array("d")
+        rate = array("d")
+        realized = array("d")
+        for snapshot in snapshots:
+            rows = [
+                (
+                    float(item.get("fundingRate", 0)),
+                    float(item.get("realizedFundingRate", item.get("fundingRate", 0))),
+                )
+                for item in snapshot["items"]
+                if item.get("exchangeName", "Bybit") == "Bybit"
+            ]
+            # 预期收益只与|费率|单调相关，预先排序后回测只需顺序取前k个
+            rows.sort(key=lambda row: abs(row[0]), reverse=True)
+            start.append(len(rate))
+            for row_rate, row_realized in rows:
+                rate.append(row_rate)
+                realized.append(row_realized)
+            end.append(len(rate))
+            holding_hours.append(float(snapshot.get("holding_hours", 8)))
+        values = array("d", [len(start), len(rate)])
+        for column in (start, end, holding_hours, rate, realized):
+            values.extend(column)
+        shm = shared_memory.SharedMemory(create=True, size=max(8, len(values) * 8))
+        shm.buf[: len(values) * 8] = values.tobytes()
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str):
+        shm = shared_memory.SharedMemory(name=name)
+        return cls(shm, owner=False)
+
+    def close(self):
+        for view in (
+            self.start,
+            self.end,
+            self.holding_hours,
+            self.rate,
+            self.realized,
+            self.values,
+        ):
+            view.release()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def evaluate(snapshots: SharedSnapshots, params: Dict) -> Dict:
+    """
+    按策略规则回测一组参数
+    每个快照按预期收益率取前max_positions个机会，仓位价值为min(max_position_value, 余额/2)，
+    收益 = 仓位价值 * (实际费率 - 手续费 - 利息)，实际费率方向与预期相反时为负
+    """
+    min_funding_rate = params["min_funding_rate"]
+    fee_cost = params["fee_rate"] * 2
+    interest_rate = params["margin_interest_rate"]
+    max_positions = int(params["max_positions"])
+    threshold = params["minimal_acceptable_funding_rate"]
+    position_value = min(params["max_position_value"], params["balance"] / 2)
+    rate = snapshots.rate
+    realized = snapshots.realized
+    pnl = 0.0
+    trades = 0
+    hits = 0
+    for i in range(snapshots.count):
+        interest_cost = interest_rate * (snapshots.holding_hours[i] / 8)
+        taken = 0
+        for j in range(int(snapshots.start[i]), int(snapshots.end[i])):
+            if taken >= max_positions:
+                break
+            funding_rate = rate[j]
+            if abs(funding_rate) < min_funding_rate * 100:
+                # 已按|费率|降序，后面的都不满足
+                break
+            if threshold is not None and funding_rate / 100 > threshold:
+                continue
+            expected_profit = abs(funding_rate) - fee_cost - interest_cost
+            if abs(expected_profit) <= min_funding_rate:
+                continue
+            # 筛选沿用FundingRateArbitrage的口径（百分比数值与手续费比较），
+            # 收益按小数费率计算：实际费率与预期同向则收取资金费，反向则支付
+            realized_rate = abs(realized[j]) / 100
+            if realized[j] * funding_rate < 0:
+                realized_rate = -realized_rate
+            trade_pnl = position_value * (realized_rate - fee_cost - interest_cost)
+            pnl += trade_pnl
+            trades += 1
+            hits += trade_pnl > 0
+            taken += 1
+    return {
+        "params": params,
+        "pnl": pnl,
+        "trades": trades,
+        "hit_rate": hits / trades if trades else 0.0,
+    }
+
+
+_worker_snapshots: Optional[SharedSnapshots] = None
+
+
+def _init_worker(shm_name: str):
+    global _worker_snapshots
+    _worker_snapshots = SharedSnapshots.attach(shm_name)
+
+
+def _evaluate_in_worker(params: Dict) -> Dict:
+    return evaluate(_worker_snapshots, params)
+
+
+def expand_grid(grid: Dict[str, List]) -> List[Dict]:
+    unknown = set(grid) - set(DEFAULT_PARAMS)
+    if unknown:
+        raise Exception(f"不支持的参数: {', '.join(sorted(unknown))}")
+    names = list(grid)
+    combinations = []
+    for values in itertools.product(*(grid[name] for name in names)):
+        params = dict(DEFAULT_PARAMS)
+        params.update(zip(names, values))
+        combinations.append(params)
+    return combinations
+
+
+def sweep(
+    snapshots: List[Dict],
+    grid: Dict[str, List],
+    processes: Optional[int] = None,
+    chunksize: int = 16,
+) -> List[Dict]:
+    """并行回测所有参数组合，按收益、命中率降序返回"""
+    combinations = expand_grid(grid)
+    shared = SharedSnapshots.create(snapshots)
+    try:
+        with Pool(
+            processes=processes, initializer=_init_worker, initargs=(shared.shm.name,)
+        ) as pool:
+            results = pool.map(_evaluate_in_worker, combinations, chunksize=chunksize)
+    finally:
+        shared.close()
+    return sorted(results, key=lambda r: (r["pnl"], r["hit_rate"]), reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="资金费率套利参数网格回测")
+    parser.add_argument("--snapshots", required=True, help="资金费率快照文件")
+    parser.add_argument("--grid", required=True, help="参数网格JSON文件")
+    parser.add_argument("--processes", type=int, default=None, help="进程数")
+    parser.add_argument("--top", type=int, default=20, help="输出前N个结果")
+    parser.add_argument("--output", help="完整结果输出文件")
+    args = parser.parse_args()
+
+    with open(args.grid) as f:
+        grid = json.load(f)
+    snapshots = load_snapshots(args.snapshots)
+    start = time.perf_counter()
+    results = sweep(snapshots, grid, processes=args.processes)
+    print(
+        f"{len(results)}组参数 x {len(snapshots)}个快照，耗时{time.perf_counter() - start:.2f}秒"
+    )
+    for result in results[: args.top]:
+        changed = {
+            k: v for k, v in result["params"].items() if DEFAULT_PARAMS.get(k) != v
+        }
+        print(
+            f"收益: {result['pnl']:.4f} 命中率: {result['hit_rate']:.2%} "
+            f"交易次数: {result['trades']} 参数: {changed}"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Tuple
+
+
+# 持仓预写日志
+# 每个动作发生前先追加一条事件(JSON行)，崩溃重启后重放日志即可恢复持仓，
+# 只需对处于"开仓中/平仓中"的交易对做定向对账，不用扫描所有交易对
+#
+# 事件类型：
+#   intent   准备开仓，携带方向、数量和本次各腿的orderLinkId(下单前生成，用于对账时只认本次的订单)
+#   order    某一腿已下单，携带leg(futures/spot/futures_close/spot_close)和orderId
+#   open     两腿都已成交，携带完整持仓信息
+#   closing  准备平仓
+#   closed   平仓完成
+#   failed   开仓失败
+class PositionJournal:
+    def __init__(self, path: str, flush_interval: float = 0.05):
+        """
+        Args:
+            path: 日志文件路径
+            flush_interval: 后台批量fsync的间隔(秒)，sync=True的事件会立即落盘
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.file = open(path, "a", encoding="utf-8")
+        self.dirty = False
+        self.closed = False
+        self.flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self.flusher.start()
+
+    def append(self, event_type: str, symbol: str, sync: bool = False, **fields):
+        """追加一条事件，sync=True时返回前保证已落盘"""
+        event = {"type": event_type, "symbol": symbol, "ts": time.time(), **fields}
+        line = json.dumps(event, default=str, separators=(",", ":"))
+        with self.lock:
+            self.file.write(line + "\n")
+            self.dirty = True
+            if sync:
+                self._sync_locked()
+
+    def _sync_locked(self):
+        if not self.dirty:
+            return
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.dirty = False
+
+    def sync(self):
+        with self.lock:
+            self._sync_locked()
+
+    def _flush_loop(self):
+        while not self.closed:
+            time.sleep(self.flush_interval)
+            try:
+                self.sync()
+            except Exception as e:
+                print(f"持仓日志落盘失败: {str(e)}")
+
+    def replay(self) -> Tuple[Dict[str, Dict], Dict[str, Dict]]:
+        """
+        重放日志
+        Returns:
+            (持仓, 未完成的交易对)
+            持仓格式与FundingRateArbitrage.positions一致
+            未完成格式：{symbol: {"status": "opening"/"closing", "orders": {leg: orderId},
+                                "orderLinkIds": {leg: orderLinkId}, ...}}
+        """
+        states: Dict[str, Dict] = {}
+        self.sync()
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    # 崩溃时最后一行可能只写了一半
+                    continue
+                symbol = event["symbol"]
+                event_type = event["type"]
+                if event_type == "intent":
+                    states[symbol] = {
+                        "status": "opening",
+                        "direction": event.get("direction"),
+                        "amount": event.get("amount"),
+                        "orders": {},
+                        "orderLinkIds": event.get("orderLinkIds") or {},
+                    }
+                elif event_type == "order" and symbol in states:
+                    states[symbol]["orders"][event["leg"]] = event.get("orderId")
+                elif event_type == "open":
+                    states[symbol] = {
+                        "status": "open",
+                        "position": event["position"],
+                        "orders": states.get(symbol, {}).get("orders", {}),
+                    }
+                elif event_type == "closing" and symbol in states:
+                    states[symbol]["status"] = "closing"
+                elif event_type in ("closed", "failed"):
+                    states.pop(symbol, None)
+
+        positions = {}
+        unfinished = {}
+        for symbol, state in states.items():
+            if state["status"] == "open":
+                positions[symbol] = state["position"]
+            else:
+                unfinished[symbol] = state
+        return positions, unfinished
+
+    def compact(self, positions: Dict[str, Dict], unfinished: Dict[str, Dict]):
+        """用当前状态重写日志，避免日志无限增长拖慢重放"""
+        events: List[Dict] = []
+        for symbol, position in positions.items():
+            events.append({"type": "open", "symbol": symbol, "position": position})
+        for symbol, state in unfinished.items():
+            if "position" in state:
+                events.append(
+                    {"type": "open", "symbol": symbol, "position": state["position"]}
+                )
+            else:
+                events.append(
+                    {
+                        "type": "intent",
+                        "symbol": symbol,
+                        "direction": state.get("direction"),
+                        "amount": state.get("amount"),
+                        "orderLinkIds": state.get("orderLinkIds") or {},
+                    }
+                )
+            for leg, order_id in state.get("orders", {}).items():
+                events.append(
+                    {"type": "order", "symbol": symbol, "leg": leg, "orderId": order_id}
+                )
+            if state["status"] == "closing":
+                events.append({"type": "closing", "symbol": symbol})
+
+        tmp_path = f"{self.path}.tmp"
+        with self.lock:
+            self._sync_locked()
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for event in events:
+                    f.write(json.dumps(event, default=str) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.file.close()
+            os.replace(tmp_path, self.path)
+            self.file = open(self.path, "a", encoding="utf-8")
+
+    def close(self):
+        self.closed = True
+        with self.lock:
+            self._sync_locked()
+            self.file.close()
@@ -0,0 +1,190 @@
+import threading
+import time
+from typing import Callable, Dict, FrozenSet, List, Optional
+
+
+# 可交易交易对索引
+# 按cursor完整分页拉取合约和现货交易对，后台定时刷新，
+# 与上一次快照对比发出上架/下架/状态变化事件，成员和杠杆可交易查询都是O(1)
+class UniverseIndex:
+    CATEGORIES = ("linear", "spot")
+
+    def __init__(
+        self,
+        client,
+        refresh_interval: float = 300,
+        page_limit: int = 1000,
+        retry_interval: float = 5,
+    ):
+        """
+        Args:
+            client: Bybit HTTP客户端
+            refresh_interval: 后台刷新间隔（秒）
+            page_limit: 每页条数，Bybit上限为1000
+            retry_interval: 启动时刷新失败后首次重试的间隔（秒），之后翻倍直到refresh_interval
+        """
+        self.client = client
+        self.refresh_interval = refresh_interval
+        self.retry_interval = retry_interval
+        self.page_limit = page_limit
+        self.lock = threading.Lock()
+        # 每个category的快照，格式：{symbol: instrument}
+        self.instruments: Dict[str, Dict[str, Dict]] = {
+            category: {} for category in self.CATEGORIES
+        }
+        # 合约可交易且现货可杠杆交易的交易对，整体替换，读取无需加锁
+        self.available: FrozenSet[str] = frozenset()
+        # available每变化一次加1，调用方据此判断是否需要重算
+        self.version = 0
+        self.last_refresh: Optional[float] = None
+        self._listeners: List[Callable[[str, str, str, Optional[Dict]], None]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.last_refresh is not None
+
+    def subscribe(self, listener: Callable[[str, str, str, Optional[Dict]], None]):
+        """
+        订阅交易对变化，回调参数为(category, symbol, event, instrument)
+        event为listed/delisted/status_changed/margin_changed，下架时instrument为None
+        """
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self, category: str, symbol: str, event: str, instrument):
+        for listener in list(self._listeners):
+            try:
+                listener(category, symbol, event, instrument)
+            except Exception as e:
+                print(f"警告：交易对变化通知失败 - 交易对: {symbol}, 错误: {str(e)}")
+
+    def fetch_instruments(self, category: str) -> Dict[str, Dict]:
+        """按nextPageCursor拉取全部交易对（包括非Trading状态，用于发现状态变化）"""
+        instruments = {}
+        cursor = None
+        seen_cursors = set()
+        while True:
+            params = {"category": category, "limit": self.page_limit}
+            if cursor:
+                params["cursor"] = cursor
+            response = self.client.get_instruments_info(**params)
+            if isinstance(response, tuple):
+                response = response[0]
+            if response.get("retCode") != 0:
+                raise Exception(f"获取{category}交易对失败: {response.get('retMsg')}")
+            result = response.get("result", {})
+            for instrument in result.get("list", []):
+                instruments[instrument["symbol"]] = instrument
+            cursor = result.get("nextPageCursor")
+            if not cursor or cursor in seen_cursors:
+                return instruments
+            seen_cursors.add(cursor)
+
+    @staticmethod
+    def _is_trading(instrument: Optional[Dict]) -> bool:
+        return bool(instrument) and instrument.get("status") == "Trading"
+
+    @staticmethod
+    def _is_margin(instrument: Optional[Dict]) -> bool:
+        return (
+            UniverseIndex._is_trading(instrument)
+            and instrument.get("marginTrading", "none") != "none"
+        )
+
+    def _diff(self, category: str, old: Dict[str, Dict], new: Dict[str, Dict]):
+        events = []
+        for symbol in new.keys() - old.keys():
+            events.append((category, symbol, "listed", new[symbol]))
+        for symbol in old.keys() - new.keys():
+            events.append((category, symbol, "delisted", None))
+        for symbol in new.keys() & old.keys():
+            before, after = old[symbol], new[symbol]
+            if before.get("status") != after.get("status"):
+                events.append((category, symbol, "status_changed", after))
+            elif before.get("marginTrading") != after.get("marginTrading"):
+                events.append((category, symbol, "margin_changed", after))
+        return events
+
+    def refresh(self) -> List[tuple]:
+        """拉取最新交易对并与上一次快照对比，返回变化事件列表"""
+        snapshots = {
+            category: self.fetch_instruments(category) for category in self.CATEGORIES
+        }
+        linear, spot = snapshots["linear"], snapshots["spot"]
+        available = frozenset(
+            symbol
+            for symbol, instrument in linear.items()
+            if self._is_trading(instrument) and self._is_margin(spot.get(symbol))
+        )
+        with self.lock:
+            first = not self.ready
+            events = []
+            if not first:
+                for category in self.CATEGORIES:
+                    events.extend(
+                        self._diff(
+                            category, self.instruments[category], snapshots[category]
+                        )
+                    )
+            self.instruments = snapshots
+            if available != self.available:
+                self.available = available
+                self.version += 1
+            self.last_refresh = time.time()
+        for event in events:
+            self._notify(*event)
+        return events
+
+    def is_listed(self, symbol: str, category: str = "linear") -> bool:
+        return symbol in self.instruments[category]
+
+    def is_tradable(self, symbol: str, category: str = "linear") -> bool:
+        return self._is_trading(self.instruments[category].get(symbol))
+
+    def is_margin_tradable(self, symbol: str) -> bool:
+        return self._is_margin(self.instruments["spot"].get(symbol))
+
+    def is_available(self, symbol: str) -> bool:
+        """合约可交易且现货可杠杆交易"""
+        return symbol in self.available
+
+    def get(self, symbol: str, category: str = "linear") -> Optional[Dict]:
+        return self.instruments[category].get(symbol)
+
+    def _refresh_loop(self):
+        # 还没有成功刷新过时按retry_interval起指数退避重试，之后按refresh_interval定时刷新
+        delay = self.refresh_interval if self.ready else self.retry_interval
+        while not self._stop.wait(delay):
+            try:
+                self.refresh()
+                delay = self.refresh_interval
+            except Exception as e:
+                print(f"警告：交易对索引刷新失败 - 错误: {str(e)}")
+                if not self.ready:
+                    delay = min(delay * 2, self.refresh_interval)
+
+    def start(self):
+        """
+        在后台线程定时刷新，未刷新过时先同步刷新一次
+        同步刷新失败时不抛出，由后台线程退避重试，期间ready为False
+        """
+        if not self.ready:
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"警告：交易对索引首次刷新失败，后台重试 - 错误: {str(e)}")
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._refresh_loop, name="universe-index", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
@@ -1,7 +1,19 @@
 import sys
 import copy
+from Clients.bybit_client import BybitTimeRecordClient
+from config import BYBIT_API_KEY, BYBIT_API_SECRET, MINIMAL_ACCEPTABLE_FUNDING_RATE
 from single_direction_trade.bybit import run
+from single_direction_trade.capital_allocator import CapitalAllocator
+from single_direction_trade.multi_account import MultiAccountRunner
+from Clients.endpoint_selector import EndpointSelector, default_endpoints
+from Clients.account_config import AccountConfigCache
+from tools.critical_window import CriticalWindow
 from tools.customer_loger import logger
+from tools.firing_thread import FiringPool, reserve_cpus
+from tools.metrics import start_metrics_server
+from tools.order_book import OrderBookManager
+from tools.pnl_sync import PnlStore
+from tools.ticker_board import start_ticker_feed
 from loguru import _defaults
 import threading
 from threading import Thread
@@ -33,8 +45,105 @@ if __name__ == "__main__":
         # "AUCTIONUSDT",
         # "VANAUSDT",
     ]  #
+    # 触发线程：最后一段等待和下单在绑定到cpus的专用线程执行，其余线程让出这些CPU
+    # 实时调度需要root或CAP_SYS_NICE，没有权限时照常运行，唤醒误差见日志和firing_wake_jitter_seconds
+    # 每个核心一个触发线程，同时触发的币种各自独占一个核心，核心数不够时多出的币种不绑核
+    use_firing_thread = False
+    firing_pool = None
+    if use_firing_thread:
+        firing_cpus = [2, 3]
+        # 需在创建其他线程之前调用，之后创建的线程继承让出后的亲和性
+        reserve_cpus(firing_cpus)
+        firing_pool = FiringPool(
+            firing_cpus, realtime=True, logger=logger.bind(name="firing")
+        )
+    # 共享内存行情板，所有币种共用一个行情进程，不开启则各线程各自请求REST
+    use_ticker_board = False
+    ticker_board = None
+    if use_ticker_board:
+        ticker_board, feed_process = start_ticker_feed(symbols, demo=False)
+    # 本地订单簿：WebSocket维护各币种深度，触发时按吃单均价和滑点上限定量，不开启则按lastPrice定量
+    use_order_book = False
+    order_book_manager = None
+    if use_order_book:
+        order_book_manager = OrderBookManager(symbols)
+        order_book_manager.start()
+    # 本地指标接口 http://127.0.0.1:9108/metrics ，为None时不开启
+    metrics_port = None
+    if metrics_port:
+        start_metrics_server(metrics_port)
+    # 统一分配资金：读一次余额，按预期收益把保证金分给各币种，不开启则各币种按balance_ratio平分
+    use_capital_allocator = False
+    allocations = None
+    if use_capital_allocator:
+        allocator = CapitalAllocator(
+            BybitTimeRecordClient(
+                api_key=BYBIT_API_KEY,
+                api_secret=BYBIT_API_SECRET,
+                demo=False,
+                logger=logger.bind(name="allocator"),
+            ),
+            logger.bind(name="allocator"),
+            minimal_acceptable_funding_rate=MINIMAL_ACCEPTABLE_FUNDING_RATE,
+            order_book_manager=order_book_manager,
+        )
+        allocations = allocator.allocate(symbols)
+    # 记录每次套利的订单号，之后用 python -m tools.pnl_sync 按账户流水核对实际收益，为None时不记录
+    pnl_db = None
+    pnl_store = PnlStore(pnl_db) if pnl_db else None
+    # 触发前1秒关闭GC、推迟日志，收到开仓回报后恢复，所有币种共用一个窗口
+    use_critical_window = False
+    critical_window = (
+        CriticalWindow(lead_seconds=1.0, logger=logger.bind(name="critical_window"))
+        if use_critical_window
+        else None
+    )
+    # 启动时探测各候选域名，后台定时复测，每次结算前切到p99延迟最低的域名
+    use_endpoint_selector = False
+    endpoint_selector = None
+    if use_endpoint_selector:
+        endpoint_selector = EndpointSelector(
+            default_endpoints(demo=False), BYBIT_API_KEY, BYBIT_API_SECRET
+        )
+        logger.info(f"最快域名: {endpoint_selector.start()}")
+    # 启动时批量预载杠杆，所有币种共用，杠杆不变时每次结算前不再调用设置接口
+    use_account_config = False
+    account_config = None
+    if use_account_config:
+        account_config = AccountConfigCache(
+            BybitTimeRecordClient(
+                api_key=BYBIT_API_KEY,
+                api_secret=BYBIT_API_SECRET,
+                demo=False,
+                logger=logger.bind(name="account_config"),
+            ),
+            logger.bind(name="account_config"),
+        )
+        logger.info(f"预载杠杆: {account_config.seed('linear')}个交易对")
+    # 多账户：共用行情和触发器，每个账户独立的连接池和资金分配，所有账户同时下单
+    # 格式：[{"name": "sub1", "api_key": "", "api_secret": ""}]，为None时只用config中的账户
+    accounts = None
+    if accounts:
+        MultiAccountRunner(
+            accounts,
+            symbols,
+            demo=False,
+            logger=logger,
+            minimal_acceptable_funding_rate=MINIMAL_ACCEPTABLE_FUNDING_RATE,
+            ticker_board=ticker_board,
+            pnl_store=pnl_store,
+            critical_window=critical_window,
+            endpoint_selector=endpoint_selector,
+            firing_pool=firing_pool,
+            order_book_manager=order_book_manager,
+        ).run()
+        # 多账户已运行完毕，不再按单账户启动
+        symbols = []
     threads = []
     for symbol in symbols:
+        if allocations is not None and symbol not in allocations:
+            continue
+
         # 为每个 symbol 创建一个过滤器函数
         def make_filter(s):
             return lambda record: record["extra"]["name"] == s
@@ -54,9 +163,22 @@ if __name__ == "__main__":
                 "balance_ratio": 1 / len(symbols),
                 "logger": symbol_logger,
                 "demo": False,
+                "ticker_board": ticker_board,
+                "allocation": allocations.get(symbol) if allocations else None,
+                "pnl_store": pnl_store,
+                "critical_window": critical_window,
+                "endpoint_selector": endpoint_selector,
+                "account_config": account_config,
+                "firing_pool": firing_pool,
+                "order_book_manager": order_book_manager,
             },
         )
         thread.start()
         threads.append(thread)
     for thread in threads:
         thread.join()
+    if order_book_manager is not None:
+        order_book_manager.stop()
+    if ticker_board is not None:
+        feed_process.terminate()
+        ticker_board.close()
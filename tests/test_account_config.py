@@ -0,0 +1,96 @@
+from unittest import mock
+
+import pytest
+
+from Clients.account_config import LEVERAGE_NOT_MODIFIED, AccountConfigCache
+
+
+class LeverageNotModified(Exception):
+    status_code = LEVERAGE_NOT_MODIFIED
+
+
+def make_client(pages):
+    client = mock.Mock()
+    client.get_positions.side_effect = [
+        {"retCode": 0, "result": {"list": positions, "nextPageCursor": cursor}}
+        for positions, cursor in pages
+    ]
+    client.get_collateral_info.return_value = {
+        "retCode": 0,
+        "result": {
+            "list": [
+                {"currency": "BTC", "collateralSwitch": True},
+                {"currency": "LAI", "collateralSwitch": "OFF"},
+            ]
+        },
+    }
+    return client
+
+
+@pytest.fixture
+def cache():
+    client = make_client(
+        [
+            ([{"symbol": "BTCUSDT", "leverage": "2"}], "page2"),
+            ([{"symbol": "LAIUSDT", "leverage": "10.0"}], ""),
+        ]
+    )
+    cache = AccountConfigCache(client)
+    cache.seed("linear")
+    cache.seed_collateral()
+    return cache
+
+
+def test_seed_follows_cursor(cache):
+    assert cache.client.get_positions.call_count == 2
+    assert cache.client.get_positions.call_args.kwargs["cursor"] == "page2"
+    assert cache.leverage == {("linear", "BTCUSDT"): "2", ("linear", "LAIUSDT"): "10"}
+
+
+def test_hit_sends_no_request(cache):
+    assert cache.ensure_leverage("linear", "BTCUSDT", "2.00") is False
+    assert cache.ensure_leverage("linear", "LAIUSDT", 10) is False
+    assert cache.ensure_collateral("BTC") is False
+
+    cache.client.set_leverage.assert_not_called()
+    cache.client.set_collateral_coin.assert_not_called()
+    assert cache.calls == 0
+
+
+def test_miss_sets_once_then_hits(cache):
+    assert cache.ensure_leverage("linear", "BTCUSDT", 3) is True
+    assert cache.ensure_leverage("linear", "BTCUSDT", 3) is False
+    assert cache.ensure_collateral("LAI") is True
+
+    cache.client.set_leverage.assert_called_once_with(
+        category="linear", symbol="BTCUSDT", buyLeverage="3", sellLeverage="3"
+    )
+    cache.client.set_collateral_coin.assert_called_once_with(
+        coin="LAI", collateralSwitch="ON"
+    )
+    assert cache.calls == 2
+
+
+def test_unseeded_symbol_already_at_target(cache):
+    cache.client.set_leverage.side_effect = LeverageNotModified("leverage not modified")
+
+    assert cache.ensure_leverage("linear", "ETHUSDT", 2) is True
+    assert cache.ensure_leverage("linear", "ETHUSDT", 2) is False
+
+
+def test_failed_set_is_not_cached(cache):
+    cache.client.set_leverage.side_effect = Exception("timeout")
+
+    with pytest.raises(Exception):
+        cache.ensure_leverage("linear", "BTCUSDT", 5)
+    assert cache.leverage[("linear", "BTCUSDT")] == "2"
+
+
+def test_margin_reject_invalidates(cache):
+    reject = Exception("Insufficient available balance (ErrCode: 110007)")
+
+    assert (
+        cache.invalidate_on_reject(Exception("timeout"), "linear", "BTCUSDT") is False
+    )
+    assert cache.invalidate_on_reject(reject, "linear", "BTCUSDT") is True
+    assert cache.ensure_leverage("linear", "BTCUSDT", 2) is True
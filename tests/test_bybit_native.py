@@ -0,0 +1,77 @@
+import pytest
+
+from ArbitrageData.bybit_native import merge_coinglass, parse_bybit_tickers
+
+
+def ticker(symbol, funding_rate, next_funding_time="1742140800000"):
+    return {
+        "symbol": symbol,
+        "lastPrice": "1.5",
+        "fundingRate": funding_rate,
+        "nextFundingTime": next_funding_time,
+    }
+
+
+PAYLOAD = {
+    "retCode": 0,
+    "time": 1742132740849,
+    "result": {
+        "list": [
+            ticker("LAIUSDT", "-0.03"),
+            ticker("BTCUSDT", "0.0001"),
+            # 交割合约没有资金费率
+            ticker("BTCUSDT-28MAR25", ""),
+            # 非USDT永续没有同名现货
+            ticker("BTCPERP", "0.0001"),
+        ]
+    },
+}
+
+
+def test_only_usdt_perpetuals_are_kept():
+    items = parse_bybit_tickers(PAYLOAD)
+
+    assert [item["symbol"] for item in items] == ["LAIUSDT", "BTCUSDT"]
+
+
+def test_rates_are_percent_and_direction_follows_sign():
+    lai, btc = parse_bybit_tickers(PAYLOAD)
+
+    assert lai["fundingRate"] == pytest.approx(-3.0)
+    assert lai["fundingRatePositive"] == pytest.approx(3.0)
+    assert (lai["futuresType"], lai["spotType"]) == ("long", "sell")
+    assert (btc["futuresType"], btc["spotType"]) == ("short", "buy")
+    assert lai["currency"] == "LAI"
+    assert lai["exchangeName"] == "Bybit"
+    assert lai["updateTime"] == 1742132740849
+    assert lai["nextFundingTime"] == 1742140800000
+
+
+def test_interval_comes_from_instruments():
+    instruments = {"LAIUSDT": {"fundingInterval": 240}}
+
+    lai, btc = parse_bybit_tickers(PAYLOAD, instruments)
+
+    assert lai["fundingIntervalHour"] == 4
+    assert lai["yearFundingRate"] == pytest.approx(3.0 * 6 * 365)
+    # 没有交易对信息时按8小时
+    assert btc["fundingIntervalHour"] == 8
+    assert btc["yearFundingRate"] == pytest.approx(0.01 * 3 * 365)
+
+
+def test_merge_coinglass_keeps_bybit_rate():
+    items = parse_bybit_tickers(PAYLOAD)
+    coinglass = [
+        {
+            "symbol": "LAIUSDT",
+            "exchangeName": "Bybit",
+            "fundingRate": -2.0,
+            "threeDayFundingRate": -17.4,
+        }
+    ]
+
+    merge_coinglass(items, coinglass)
+
+    assert items[0]["threeDayFundingRate"] == -17.4
+    assert items[0]["fundingRate"] == pytest.approx(-3.0)
+    assert "threeDayFundingRate" not in items[1]
@@ -0,0 +1,74 @@
+from decimal import Decimal
+from unittest import mock
+
+from single_direction_trade.capital_allocator import CapitalAllocator
+
+
+def page(symbols, cursor=""):
+    return {
+        "retCode": 0,
+        "result": {
+            "list": [{"symbol": symbol} for symbol in symbols],
+            "nextPageCursor": cursor,
+        },
+    }
+
+
+def make_allocator(pages):
+    client = mock.Mock()
+    client.get_instruments_info.side_effect = pages
+    return CapitalAllocator(client, logger=mock.Mock())
+
+
+def test_instruments_follow_cursor():
+    allocator = make_allocator(
+        [page(["AUSDT", "BUSDT"], "p2"), page(["CUSDT"], "p3"), page(["DUSDT"])]
+    )
+
+    instruments = allocator.get_instruments(["AUSDT", "DUSDT"])
+
+    assert set(instruments) == {"AUSDT", "DUSDT"}
+    calls = allocator.client.get_instruments_info.call_args_list
+    assert [call.kwargs.get("cursor") for call in calls] == [None, "p2", "p3"]
+
+
+def test_stops_paging_once_all_symbols_are_found():
+    allocator = make_allocator([page(["AUSDT", "BUSDT"], "p2"), page(["CUSDT"])])
+
+    assert set(allocator.get_instruments(["BUSDT"])) == {"BUSDT"}
+    assert allocator.client.get_instruments_info.call_count == 1
+
+
+def test_repeated_cursor_ends_paging():
+    allocator = make_allocator([page(["AUSDT"], "p2"), page(["BUSDT"], "p2")])
+
+    assert set(allocator.get_instruments(["AUSDT", "ZUSDT"])) == {"AUSDT"}
+    assert allocator.client.get_instruments_info.call_count == 2
+
+
+def test_margin_cap_covers_all_child_orders():
+    tickers = {
+        "AUSDT": {
+            "symbol": "AUSDT",
+            "fundingRate": "-0.01",
+            "lastPrice": "2",
+            "nextFundingTime": "1700000000000",
+        }
+    }
+    instruments = {
+        "AUSDT": {
+            "status": "Trading",
+            "leverageFilter": {"maxLeverage": "10"},
+            "lotSizeFilter": {"maxMktOrderQty": "100"},
+        }
+    }
+    single = CapitalAllocator(mock.Mock(), logger=mock.Mock())
+    sliced = CapitalAllocator(mock.Mock(), logger=mock.Mock(), max_child_orders=4)
+
+    # 单笔上限100个 * 价格2 / 杠杆10
+    assert single.build_candidates(["AUSDT"], tickers, instruments)[0][
+        "max_margin"
+    ] == Decimal("20")
+    assert sliced.build_candidates(["AUSDT"], tickers, instruments)[0][
+        "max_margin"
+    ] == Decimal("80")
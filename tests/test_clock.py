@@ -0,0 +1,77 @@
+import threading
+import time
+from datetime import datetime
+
+from tools.clock import VirtualClock
+
+START = datetime(2025, 3, 16, 15, 59, 0)
+
+
+def test_unregistered_sleep_jumps_immediately():
+    clock = VirtualClock(START)
+    started = clock.time()
+
+    clock.sleep(3600)
+
+    assert clock.time() == started + 3600
+
+
+def test_advance_never_goes_backwards():
+    clock = VirtualClock(START)
+    started = clock.time()
+
+    clock.advance(1.5)
+    clock.advance(-10)
+
+    assert clock.time() == started + 1.5
+
+
+def test_time_advances_only_when_every_participant_sleeps():
+    clock = VirtualClock(START)
+    started = clock.time()
+    woke = {}
+    joined = threading.Event()
+
+    def worker():
+        with clock.participant():
+            joined.set()
+            clock.sleep(5)
+            woke["worker"] = clock.time() - started
+
+    with clock.participant():
+        thread = threading.Thread(target=worker)
+        thread.start()
+        joined.wait(5)
+        time.sleep(0.05)
+        # 工作线程已睡下，但主线程还醒着，时间不能推进
+        assert clock.time() == started
+        clock.sleep(10)
+        woke["main"] = clock.time() - started
+    thread.join(5)
+
+    # 先唤醒最早到期的，工作线程退出后再推进到主线程的唤醒时间
+    assert woke == {"worker": 5, "main": 10}
+
+
+def test_call_later_runs_at_virtual_time():
+    clock = VirtualClock(START)
+    started = clock.time()
+    fired = []
+
+    timer = clock.call_later(30, lambda: fired.append(clock.time() - started))
+    timer.join(5)
+
+    assert fired == [30]
+
+
+def test_cancelled_timer_does_not_fire():
+    clock = VirtualClock(START)
+    fired = []
+
+    with clock.participant():
+        timer = clock.call_later(30, lambda: fired.append(True))
+        timer.cancel()
+        clock.sleep(60)
+    timer.join(5)
+
+    assert fired == []
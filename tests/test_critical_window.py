@@ -0,0 +1,111 @@
+import gc
+import threading
+from unittest import mock
+
+import pytest
+
+from tools.critical_window import CriticalWindow
+
+
+@pytest.fixture
+def window():
+    window = CriticalWindow(logger=mock.Mock())
+    yield window
+    # 断言失败时也恢复GC，不影响其他测试
+    while window.active:
+        window._holders = {threading.get_ident()}
+        window.exit()
+
+
+def in_thread(func, *args):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(func(*args)))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+def test_enter_disables_gc_until_exit(window):
+    assert gc.isenabled()
+
+    window.enter()
+    # 重复进入不重复计数
+    window.enter()
+    assert window.active and not gc.isenabled()
+
+    stats = window.exit()
+    assert not window.active and gc.isenabled()
+    assert stats["deferred"] == 0
+    assert window.windows == [stats]
+    window.logger.info.assert_called_once()
+
+
+def test_last_holder_closes_the_window(window):
+    window.enter()
+    entered = threading.Event()
+    leave = threading.Event()
+    results = []
+
+    def follower():
+        results.append(window.join_active())
+        entered.set()
+        leave.wait(2)
+        results.append(window.exit())
+
+    thread = threading.Thread(target=follower)
+    thread.start()
+    entered.wait(2)
+
+    # 还有跟随线程在窗口内，主线程退出不恢复GC
+    assert window.exit() is None
+    assert window.active and not gc.isenabled()
+
+    leave.set()
+    thread.join()
+    assert results[0] is True
+    assert results[1]["duration_ms"] >= 0
+    assert not window.active and gc.isenabled()
+
+
+def test_join_and_exit_without_active_window(window):
+    assert in_thread(window.join_active) is False
+    # 未进入窗口的线程退出无效
+    window.enter()
+    assert in_thread(window.exit) is None
+    assert window.active
+    assert window.exit() is not None
+
+
+def test_logs_are_deferred_and_replayed_in_order(window):
+    logger = mock.Mock(spec=["info", "warning", "bind"])
+    deferred_logger = window.wrap_logger(logger)
+
+    deferred_logger.info("before")
+    assert logger.info.call_args_list == [mock.call("before")]
+
+    window.enter()
+    deferred_logger.info("first {}", 1)
+    deferred_logger.warning("second")
+    recorded = []
+    window.defer(recorded.append, "bookkeeping")
+    assert logger.info.call_count == 1 and not logger.warning.called
+    assert recorded == []
+
+    stats = window.exit()
+    assert stats["deferred"] == 3
+    assert logger.info.call_args_list[1] == mock.call("first {}", 1)
+    logger.warning.assert_called_once_with("second")
+    assert recorded == ["bookkeeping"]
+    # 不推迟的方法直接透传
+    deferred_logger.bind(name="x")
+    logger.bind.assert_called_once_with(name="x")
+
+
+def test_deferred_failure_does_not_block_the_rest(window):
+    window.enter()
+    recorded = []
+    window.defer(mock.Mock(side_effect=RuntimeError("boom")))
+    window.defer(recorded.append, 1)
+
+    window.exit()
+    assert recorded == [1]
@@ -0,0 +1,61 @@
+from Clients.endpoint_selector import EndpointSelector
+
+FAST = "https://fast.example"
+SLOW = "https://slow.example"
+FLAKY = "https://flaky.example"
+DOWN = "https://down.example"
+
+
+def make_selector(results, max_error_rate=0.2):
+    selector = EndpointSelector(list(results), max_error_rate=max_error_rate)
+    for url, samples in results.items():
+        selector.results[url].extend(samples)
+    return selector
+
+
+def ranked_urls(selector):
+    return [item["url"] for item in selector.rank()]
+
+
+def test_lower_p99_ranks_first():
+    selector = make_selector({SLOW: [(0.05, True)] * 10, FAST: [(0.01, True)] * 10})
+
+    assert ranked_urls(selector) == [FAST, SLOW]
+
+
+def test_high_error_rate_ranks_after_healthy_endpoints():
+    selector = make_selector(
+        {
+            FLAKY: [(0.001, True)] * 5 + [(2.0, False)] * 5,
+            SLOW: [(0.05, True)] * 10,
+        }
+    )
+
+    assert ranked_urls(selector) == [SLOW, FLAKY]
+    assert selector.rank()[1]["error_rate"] == 0.5
+
+
+def test_endpoint_without_successes_ranks_last():
+    selector = make_selector(
+        {
+            DOWN: [(2.0, False)] * 10,
+            FLAKY: [(0.001, True)] * 5 + [(2.0, False)] * 5,
+            FAST: [(0.01, True)] * 10,
+        }
+    )
+
+    assert ranked_urls(selector) == [FAST, FLAKY, DOWN]
+    assert selector.rank()[-1]["p99_ms"] is None
+
+
+def test_probe_all_records_failures_and_picks_best():
+    def probe(url):
+        if url == DOWN:
+            raise Exception("connection refused")
+
+    selector = EndpointSelector([DOWN, FAST], samples=3, probe=probe)
+
+    assert selector.probe_all() == FAST
+    assert selector.best == FAST
+    assert selector.get_stats(DOWN)["error_rate"] == 1.0
+    assert selector.get_stats(FAST)["samples"] == 3
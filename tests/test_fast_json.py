@@ -0,0 +1,74 @@
+import json
+from unittest import mock
+
+import pytest
+import requests
+from pybit.exceptions import FailedRequestError, InvalidRequestError
+
+from Clients import fast_json
+from Clients.fast_json import FastHTTP
+
+TICKERS = {
+    "retCode": 0,
+    "retMsg": "OK",
+    "result": {
+        "category": "linear",
+        "list": [
+            {"symbol": "AUSDT", "lastPrice": "1.25", "fundingRate": "-0.005"},
+            {"symbol": "BUSDT", "lastPrice": "3", "fundingRate": "0.0001"},
+        ],
+    },
+    "time": 1700000000000,
+}
+
+
+def make_response(body: bytes, status_code=200):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = body
+    response.headers["Content-Type"] = "application/json"
+    return response
+
+
+def make_client(*bodies, **kwargs):
+    client = FastHTTP(max_retries=2, retry_delay=0, **kwargs)
+    client.client.send = mock.Mock(side_effect=[make_response(b) for b in bodies])
+    return client
+
+
+def test_responses_are_decoded_with_fast_loads():
+    client = make_client(json.dumps(TICKERS).encode())
+
+    with mock.patch.object(fast_json, "loads", wraps=fast_json.loads) as loads:
+        response = client.get_tickers(category="linear")
+
+    loads.assert_called_once()
+    assert response == TICKERS
+
+
+def test_error_codes_are_still_handled_by_pybit():
+    body = {"retCode": 10001, "retMsg": "params error", "result": {}}
+    client = make_client(json.dumps(body).encode())
+
+    with pytest.raises(InvalidRequestError) as e:
+        client.get_tickers(category="linear")
+    assert e.value.status_code == 10001
+
+
+def test_non_json_body_raises_pybit_decode_error():
+    client = make_client(b"<html>502 Bad Gateway</html>")
+
+    with pytest.raises(FailedRequestError) as e:
+        client.get_tickers(category="linear")
+    assert e.value.status_code == 409
+
+
+def test_non_json_body_is_retried_with_force_retry():
+    client = make_client(
+        b"<html>502 Bad Gateway</html>",
+        json.dumps(TICKERS).encode(),
+        force_retry=True,
+    )
+
+    assert client.get_tickers(category="linear") == TICKERS
+    assert client.client.send.call_count == 2
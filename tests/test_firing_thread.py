@@ -0,0 +1,99 @@
+import os
+import sys
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+from tools import firing_thread
+from tools.firing_thread import FiringPool, FiringThread, reserve_cpus
+
+
+@pytest.fixture
+def firing():
+    firing = FiringThread(logger=mock.Mock())
+    yield firing
+    firing.close()
+
+
+def test_fire_at_runs_on_the_firing_thread_after_deadline(firing):
+    deadline_ns = time.perf_counter_ns() + 20 * 1000 * 1000
+
+    future = firing.fire_at(
+        deadline_ns, lambda value: (threading.current_thread().name, value), 1
+    )
+
+    assert future.result(2) == ("firing", 1)
+    assert firing.jitters[0] >= 0
+    stats = firing.get_stats()
+    assert stats["count"] == 1 and stats["max_us"] >= stats["p50_us"]
+
+
+def test_fire_without_deadline_runs_immediately_and_passes_errors(firing):
+    assert firing.fire_at(None, lambda: "now").result(2) == "now"
+    assert len(firing.jitters) == 0
+
+    future = firing.fire_at(None, mock.Mock(side_effect=ValueError("rejected")))
+    with pytest.raises(ValueError, match="rejected"):
+        future.result(2)
+    # 异常后线程继续处理后续任务
+    assert firing.submit(lambda: 2).result(2) == 2
+
+
+def test_switch_interval_is_restored_by_the_last_waiter():
+    default = sys.getswitchinterval()
+    firing_thread._shorten_switch_interval(0.0001)
+    firing_thread._shorten_switch_interval(0.0001)
+    assert sys.getswitchinterval() < default
+
+    firing_thread._restore_switch_interval()
+    assert sys.getswitchinterval() < default
+    firing_thread._restore_switch_interval()
+    assert sys.getswitchinterval() == default
+    # 多余的恢复无效
+    firing_thread._restore_switch_interval()
+    assert sys.getswitchinterval() == default
+
+
+def test_unsupported_settings_are_recorded_not_raised():
+    with mock.patch.object(
+        firing_thread.os, "sched_setscheduler", side_effect=PermissionError("EPERM")
+    ):
+        firing = FiringThread(realtime=True, logger=mock.Mock())
+    try:
+        assert "realtime" in firing.applied["error"]
+        assert "scheduler" not in firing.applied
+        assert firing.fire_at(None, lambda: 1).result(2) == 1
+    finally:
+        firing.close()
+
+
+@pytest.mark.skipif(
+    not hasattr(os, "sched_getaffinity"), reason="需要Linux的CPU亲和性接口"
+)
+def test_reserve_cpus_keeps_at_least_one_cpu():
+    available = os.sched_getaffinity(0)
+    try:
+        # 让出全部CPU时不让出
+        assert reserve_cpus(available) == available
+        assert os.sched_getaffinity(0) == available
+    finally:
+        os.sched_setaffinity(0, available)
+
+
+def test_pool_hands_out_pinned_threads_then_overflow():
+    cpu = min(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else 0
+    pool = FiringPool([cpu], logger=mock.Mock(), spin_us=50)
+    try:
+        pinned = pool.acquire()
+        overflow = pool.acquire()
+        assert pinned is pool.threads[0]
+        assert overflow.name == "firing-overflow" and overflow.spin_ns == 50 * 1000
+
+        pool.release(overflow)
+        pool.release(pinned)
+        assert pool.acquire() is pinned
+        assert set(pool.get_stats()) == {f"firing-cpu{cpu}"}
+    finally:
+        pool.close()
@@ -0,0 +1,106 @@
+import time
+
+import pytest
+
+from ArbitrageData.funding_collector import (
+    DEFAULT_INTERVAL_SOURCES,
+    DEFAULT_SOURCES,
+    FundingRateCollector,
+)
+from benchmarks.fakes import StaticSession, load_arbitrage_list, make_venue_payloads
+
+URLS = {venue: source[0] for venue, source in DEFAULT_SOURCES.items()}
+INTERVAL_URL = DEFAULT_INTERVAL_SOURCES["Binance"][0]
+
+
+class CountingSession(StaticSession):
+    """记录每个url的请求次数"""
+
+    def __init__(self, payloads, delays=None):
+        super().__init__(payloads, delays)
+        self.calls = {}
+
+    def get(self, url, params=None, timeout=None):
+        self.calls[url] = self.calls.get(url, 0) + 1
+        return super().get(url, params, timeout)
+
+
+@pytest.fixture
+def arbitrage_list():
+    return load_arbitrage_list()
+
+
+@pytest.fixture
+def collector(arbitrage_list):
+    collector = FundingRateCollector(
+        session=CountingSession(make_venue_payloads(arbitrage_list))
+    )
+    yield collector
+    collector.close()
+
+
+def test_rows_are_normalized(collector, arbitrage_list):
+    table = collector.collect()
+    item = arbitrage_list[0]
+    rows = {row["venue"]: row for row in table.rows_for(item["symbol"])}
+
+    assert set(rows) == {"Bybit", "Binance", "OKX", "Gate"}
+    # 统一为小数形式的资金费率
+    assert rows["Binance"]["rate"] == pytest.approx(item["fundingRate"] / 200)
+    assert rows["OKX"]["rate"] == pytest.approx(item["fundingRate"] / 300)
+    assert rows["Gate"]["rate"] == pytest.approx(item["fundingRate"] / 400)
+    # 结算时间统一为毫秒，周期统一为小时
+    assert rows["Gate"]["next_settlement"] == 1742140800000
+    assert rows["Gate"]["interval"] == 4
+    assert rows["OKX"]["interval"] == 8
+
+
+def test_binance_interval_comes_from_funding_info(collector, arbitrage_list):
+    table = collector.collect()
+
+    def binance_interval(symbol):
+        rows = table.rows_for(symbol)
+        return next(row["interval"] for row in rows if row["venue"] == "Binance")
+
+    # 前5个交易对在fundingInfo中调整为4小时，其余按默认8小时
+    assert binance_interval(arbitrage_list[0]["symbol"]) == 4
+    assert binance_interval(arbitrage_list[10]["symbol"]) == 8
+
+
+def test_funding_info_is_cached(collector):
+    collector.collect()
+    collector.collect()
+
+    assert collector.session.calls[INTERVAL_URL] == 1
+    assert collector.session.calls[URLS["Binance"]] == 2
+
+
+def test_cycle_time_is_the_slowest_venue():
+    delay = 0.2
+    payloads = make_venue_payloads()
+    session = StaticSession(payloads, {url: delay for url in URLS.values()})
+    collector = FundingRateCollector(session=session)
+    try:
+        started = time.perf_counter()
+        collector.collect()
+        elapsed = time.perf_counter() - started
+    finally:
+        collector.close()
+
+    # 串行需要4 * delay
+    assert elapsed < 2 * delay
+
+
+def test_failed_venue_keeps_previous_rows_and_reports_staleness(collector):
+    assert collector.staleness("Gate") is None
+    collector.collect()
+    rows = collector.source_stats["Gate"]["rows"]
+
+    del collector.session.payloads[URLS["Gate"]]
+    time.sleep(0.05)
+    table = collector.collect()
+
+    assert "404" in collector.source_stats["Gate"]["error"]
+    assert table.venue.count("Gate") == rows
+    assert collector.staleness("Gate") >= 0.05
+    assert collector.staleness("Bybit") < 0.05
@@ -0,0 +1,160 @@
+import threading
+import time
+
+import pytest
+from pybit.exceptions import InvalidRequestError
+
+from Clients.hedged_order import HedgedOrderSender
+
+
+def rejection(code, message="rejected"):
+    return InvalidRequestError("place_order", message, code, "00:00:00", None)
+
+
+class FakeClient(object):
+    """place_order按给定的行为返回：延迟后返回成功回报或抛出异常"""
+
+    def __init__(self, delay=0.0, error=None, history=None, open_orders=None):
+        self.delay = delay
+        self.error = error
+        self.history = history or []
+        self.open_orders = open_orders or []
+        self.orders = []
+        self.lookups = []
+
+    def place_order(self, **kwargs):
+        self.orders.append(kwargs)
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return {
+            "retCode": 0,
+            "result": {
+                "orderId": f"id-{id(self)}",
+                "orderLinkId": kwargs["orderLinkId"],
+            },
+            "time": 1700000000000,
+        }
+
+    def get_order_history(self, **kwargs):
+        self.lookups.append(("history", kwargs))
+        return {"retCode": 0, "result": {"list": self.history}}
+
+    def get_open_orders(self, **kwargs):
+        self.lookups.append(("open", kwargs))
+        return {"retCode": 0, "result": {"list": self.open_orders}}
+
+
+def order(link_id="fra-1"):
+    return {
+        "category": "linear",
+        "symbol": "AUSDT",
+        "side": "Buy",
+        "qty": "1",
+        "orderLinkId": link_id,
+    }
+
+
+def test_fast_primary_wins_without_hedging():
+    primary, backup = FakeClient(), FakeClient()
+    sender = HedgedOrderSender([primary, backup], hedge_delay=0.5)
+    try:
+        response = sender.place_order(**order())
+        assert response["result"]["orderLinkId"] == "fra-1"
+        assert backup.orders == []
+        assert sender.get_stats()["hedges_sent"] == 0
+    finally:
+        sender.close()
+
+
+def test_slow_primary_is_hedged_and_backup_wins():
+    primary, backup = FakeClient(delay=0.3), FakeClient()
+    sender = HedgedOrderSender([primary, backup], hedge_delay=0.05)
+    try:
+        response = sender.place_order(**order())
+        assert response["result"]["orderId"] == f"id-{id(backup)}"
+        assert [o["orderLinkId"] for o in backup.orders] == ["fra-1"]
+        assert sender.get_stats()["wins"] == [0, 1]
+    finally:
+        sender.close()
+
+
+def test_definitive_rejection_is_not_hedged():
+    # 余额不足，交易所已明确拒绝
+    primary = FakeClient(error=rejection(110007, "ab not enough for new order"))
+    backup = FakeClient()
+    sender = HedgedOrderSender([primary, backup], hedge_delay=0.5)
+    try:
+        with pytest.raises(InvalidRequestError) as e:
+            sender.place_order(**order())
+        assert e.value.status_code == 110007
+        assert backup.orders == []
+        assert sender.get_stats()["hedges_sent"] == 0
+    finally:
+        sender.close()
+
+
+def test_transport_error_is_hedged():
+    primary = FakeClient(error=ConnectionError("connection reset"))
+    backup = FakeClient()
+    sender = HedgedOrderSender([primary, backup], hedge_delay=0.5)
+    try:
+        response = sender.place_order(**order())
+        assert response["result"]["orderId"] == f"id-{id(backup)}"
+    finally:
+        sender.close()
+
+
+def test_duplicates_are_reconciled_from_order_history():
+    # 两条连接都只收到重复错误：订单已被受理并立即成交，只在历史订单里
+    filled = {
+        "orderId": "filled-1",
+        "orderLinkId": "fra-1",
+        "orderStatus": "Filled",
+        "createdTime": "1700000000123",
+    }
+    primary = FakeClient(error=rejection(110072), history=[filled])
+    backup = FakeClient(error=rejection(110072))
+    sender = HedgedOrderSender([primary, backup])
+    try:
+        response = sender.place_order(**order())
+        assert response["result"] == {"orderId": "filled-1", "orderLinkId": "fra-1"}
+        assert response["time"] == 1700000000123
+        assert primary.lookups[0] == (
+            "history",
+            {"category": "linear", "symbol": "AUSDT", "orderLinkId": "fra-1"},
+        )
+        assert sender.get_stats()["reconciled"] == 1
+    finally:
+        sender.close()
+
+
+def test_reconcile_falls_back_to_open_orders():
+    resting = {"orderId": "open-1", "orderLinkId": "fra-1", "createdTime": "1"}
+    client = FakeClient(open_orders=[resting])
+    sender = HedgedOrderSender([client])
+    try:
+        response = sender.reconcile(order())
+        assert response["result"]["orderId"] == "open-1"
+        assert [kind for kind, _ in client.lookups] == ["history", "open"]
+    finally:
+        sender.close()
+
+
+def test_each_connection_sends_the_same_order_link_id():
+    started = threading.Barrier(3, timeout=2)
+
+    class BlockingClient(FakeClient):
+        def place_order(self, **kwargs):
+            started.wait()
+            return super().place_order(**kwargs)
+
+    clients = [BlockingClient() for _ in range(3)]
+    sender = HedgedOrderSender(clients)
+    try:
+        sender.place_order(**order("fra-same"))
+        link_ids = {o["orderLinkId"] for c in clients for o in c.orders}
+        assert link_ids == {"fra-same"}
+        assert sender.get_stats()["hedges_sent"] == 2
+    finally:
+        sender.close()
@@ -0,0 +1,95 @@
+from single_direction_trade.lead_time import LeadTimeController
+
+SETTLEMENT_MS = 1700000000000
+
+
+def record_lag(controller, lag_ms, lead_ms=None, symbol="AUSDT", endpoint="api"):
+    """按当前提前量触发，订单在触发后lag_ms到达交易所"""
+    if lead_ms is None:
+        lead_ms = controller.get_lead_ms(symbol, endpoint)
+    trigger_ms = SETTLEMENT_MS - lead_ms
+    return controller.record(
+        symbol, endpoint, trigger_ms, trigger_ms + lag_ms, SETTLEMENT_MS
+    )
+
+
+def test_default_until_enough_samples():
+    controller = LeadTimeController(default_lead_ms=1800, min_samples=5)
+
+    for _ in range(4):
+        assert record_lag(controller, 200) == 1800
+    assert controller.get_lead_ms("AUSDT", "api") == 1800
+    # 其他symbol/域名独立
+    assert controller.get_lead_ms("BUSDT", "api") == 1800
+
+
+def test_converges_to_quantile_plus_margin_in_bounded_steps():
+    controller = LeadTimeController(
+        default_lead_ms=1800, margin_ms=50, max_step_ms=300, min_samples=5
+    )
+
+    leads = [record_lag(controller, 200) for _ in range(10)]
+
+    # 第5个样本开始每次最多下调300ms，直到 分位数200 + 余量50
+    assert leads[4] == 1500
+    assert leads[5] == 1200
+    assert leads[-1] == 250
+    assert all(a - b <= 300 for a, b in zip(leads, leads[1:]))
+
+
+def test_quantile_covers_the_tail():
+    controller = LeadTimeController(
+        target_probability=0.9, margin_ms=0, max_step_ms=5000, min_samples=10
+    )
+
+    for lag in (100, 100, 100, 100, 100, 100, 100, 100, 100, 400):
+        lead = record_lag(controller, lag, lead_ms=1000)
+    # 10个样本的90%分位数是第9个
+    assert lead == 100
+
+    lead = record_lag(controller, 400, lead_ms=1000)
+    assert lead == 400
+
+
+def test_miss_widens_lead_immediately():
+    controller = LeadTimeController(default_lead_ms=500, margin_ms=50, min_samples=5)
+
+    # 滞后800ms，用500ms提前量错过结算
+    assert record_lag(controller, 800) == 850
+    state = controller.states[controller.make_key("AUSDT", "api")]
+    assert state["misses"] == 1 and state["hits"] == 0
+
+
+def test_bounds_are_respected():
+    controller = LeadTimeController(
+        min_lead_ms=100, max_lead_ms=1000, max_step_ms=5000, min_samples=1
+    )
+
+    assert record_lag(controller, 0) == 100
+    assert record_lag(controller, 3000) == 1000
+
+
+def test_state_persists_across_restarts(tmp_path):
+    state_file = str(tmp_path / "lead" / "state.json")
+    controller = LeadTimeController(state_file=state_file, min_samples=5)
+    for _ in range(6):
+        lead = record_lag(controller, 200)
+
+    restarted = LeadTimeController(state_file=state_file, min_samples=5)
+
+    assert restarted.get_lead_ms("AUSDT", "api") == lead
+    state = restarted.states[restarted.make_key("AUSDT", "api")]
+    assert list(state["lags"]) == [200] * 6
+    assert state["hits"] == 6
+    # 恢复的样本继续参与计算，从1200继续下调
+    assert lead == 1200
+    assert record_lag(restarted, 200) == 900
+
+
+def test_corrupt_state_file_falls_back_to_default(tmp_path):
+    state_file = tmp_path / "state.json"
+    state_file.write_text("{not json")
+
+    controller = LeadTimeController(state_file=str(state_file), default_lead_ms=1800)
+
+    assert controller.get_lead_ms("AUSDT", "api") == 1800
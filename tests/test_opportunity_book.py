@@ -0,0 +1,116 @@
+from strategies.funding_rate_arbitrage import FundingRateArbitrage
+from strategies.opportunity_book import OpportunityBook
+from tools.ticker_board import TickerBoard
+
+
+def calculate_profit(funding_rate, holding_hours):
+    # 与策略一致：资金费率(百分比)减去固定成本和按持仓时间的利息
+    return abs(funding_rate) - 0.0012 - 0.0002 * holding_hours / 8
+
+
+def make_book(events=None):
+    book = OpportunityBook(calculate_profit, min_funding_rate=0.001)
+    if events is not None:
+        book.subscribe(lambda symbol, item: events.append((symbol, item is not None)))
+    return book
+
+
+def item(symbol, funding_rate, **fields):
+    return {
+        "symbol": symbol,
+        "exchangeName": "Bybit",
+        "fundingRate": funding_rate,
+        **fields,
+    }
+
+
+def test_ranking_is_by_absolute_expected_profit():
+    book = make_book()
+    book.update(item("AUSDT", 0.3))
+    book.update(item("BUSDT", -0.9))
+    book.update(item("CUSDT", 0.5))
+    # 低于阈值的不进排行
+    book.update(item("DUSDT", 0.05))
+
+    assert [i["symbol"] for i in book.top()] == ["BUSDT", "CUSDT", "AUSDT"]
+    assert [i["symbol"] for i in book.top(2)] == ["BUSDT", "CUSDT"]
+    assert "DUSDT" not in book and len(book) == 3
+
+
+def test_update_funding_moves_only_the_changed_symbol():
+    events = []
+    book = make_book(events)
+    book.update(item("AUSDT", 0.3))
+    book.update(item("BUSDT", 0.5))
+    events.clear()
+
+    book.update_funding("AUSDT", 0.8)
+    assert [i["symbol"] for i in book.top()] == ["AUSDT", "BUSDT"]
+    assert events == [("AUSDT", True)]
+
+    # 资金费率没变不通知
+    book.update_funding("AUSDT", 0.8, price=1.5)
+    assert events == [("AUSDT", True)]
+    assert book.get("AUSDT")["lastPrice"] == 1.5
+
+    # 跌破阈值退出排行
+    book.update_funding("AUSDT", 0.01)
+    assert events[-1] == ("AUSDT", False)
+    assert [i["symbol"] for i in book.top()] == ["BUSDT"]
+
+
+def test_holding_hours_drift_reorders_without_notifying():
+    events = []
+    book = make_book(events)
+    book.update(item("AUSDT", 0.3))
+    events.clear()
+
+    book.set_holding_hours(7.999)
+    # 0.01小时内的变化被取整吸收
+    assert book.holding_hours == 8.0
+    book.set_holding_hours(4)
+    assert events == []
+    assert book.get("AUSDT")["expected_profit"] == calculate_profit(0.3, 4)
+
+
+def test_universe_filters_and_notifies_on_eligibility_change():
+    events = []
+    book = make_book(events)
+    book.update(item("AUSDT", 0.3))
+    book.update(item("BUSDT", 0.5))
+    events.clear()
+
+    book.set_universe({"BUSDT"})
+    assert events == [("AUSDT", False)]
+    assert [i["symbol"] for i in book.top()] == ["BUSDT"]
+
+    book.set_universe({"AUSDT", "BUSDT"})
+    assert events[-1] == ("AUSDT", True)
+    assert len(book) == 2
+
+
+def test_ticker_board_updates_wake_the_strategy(tmp_path):
+    strategy = FundingRateArbitrage(
+        api_key="test",
+        api_secret="test",
+        journal_file=str(tmp_path / "positions.jsonl"),
+    )
+    board = TickerBoard.create(["AUSDT", "BUSDT"])
+    strategy.ticker_board = board
+    try:
+        last_seqs = {}
+        # 从未写入过的交易对不处理
+        assert strategy.poll_ticker_board(last_seqs) == 0
+
+        board.write("AUSDT", 1.25, 0.006, 0)
+        assert strategy.poll_ticker_board(last_seqs) == 1
+        assert strategy.opportunity_changed.is_set()
+        assert strategy.opportunity_book.get("AUSDT")["fundingRate"] == 0.6
+
+        # seq没变不重复处理
+        assert strategy.poll_ticker_board(last_seqs) == 0
+        assert strategy.wait_for_opportunity(0) is True
+        assert strategy.wait_for_opportunity(0) is False
+    finally:
+        board.close()
+        strategy.journal.close()
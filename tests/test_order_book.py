@@ -0,0 +1,139 @@
+import time
+from unittest import mock
+
+import pytest
+
+from tools.order_book import LocalOrderBook, OrderBookManager
+
+
+def snapshot(u, bids, asks, symbol="AUSDT"):
+    return {
+        "topic": f"orderbook.50.{symbol}",
+        "type": "snapshot",
+        "data": {"s": symbol, "b": bids, "a": asks, "u": u, "seq": u * 10},
+    }
+
+
+def delta(u, bids=(), asks=(), symbol="AUSDT"):
+    return {
+        "topic": f"orderbook.50.{symbol}",
+        "type": "delta",
+        "data": {"s": symbol, "b": list(bids), "a": list(asks), "u": u, "seq": u * 10},
+    }
+
+
+def make_book():
+    book = LocalOrderBook("AUSDT")
+    assert not book.on_message(
+        snapshot(
+            100,
+            bids=[["0.99", "10"], ["0.98", "20"]],
+            asks=[["1.00", "10"], ["1.01", "20"], ["1.05", "100"]],
+        )
+    )
+    return book
+
+
+def test_snapshot_and_deltas_keep_levels_sorted():
+    book = make_book()
+
+    assert not book.on_message(delta(101, asks=[["1.005", "5"], ["1.00", "0"]]))
+    assert not book.on_message(delta(102, bids=[["0.995", "1"]]))
+
+    assert book.best_price("Buy") == 1.005
+    assert book.best_price("Sell") == 0.995
+    assert list(book.asks.sizes) == [5, 20, 100]
+    assert book.update_id == 102
+
+
+def test_vwap_and_slippage_queries():
+    book = make_book()
+
+    vwap, worst, filled = book.vwap("Buy", 20)
+    assert vwap == pytest.approx((10 * 1.00 + 10 * 1.01) / 20)
+    assert worst == 1.01 and filled == 20
+
+    # 深度不足时只返回可成交的数量
+    assert book.vwap("Buy", 1000)[2] == 130
+    # 最优价1.00，100bps内只到1.01
+    assert book.max_qty_within_bps("Buy", 100) == 30
+    assert book.max_qty_within_bps("Sell", 150) == 30
+
+
+def test_limit_qty_uses_vwap_and_depth():
+    book = make_book()
+
+    # 按价值上限重算：30 USDT按吃单均价只够约29.85个
+    qty, vwap, worst, depth = book.limit_qty("Buy", 40, 30, 100)
+    assert vwap == pytest.approx((10 * 1.00 + 20 * 1.01 + 10 * 1.05) / 40)
+    assert depth == 30
+    assert qty == pytest.approx(min(30, 30 / vwap))
+
+    # 滑点上限比价值上限更紧
+    assert book.limit_qty("Buy", 40, 1000, 10)[0] == 10
+
+
+def test_gap_marks_book_unsynced_until_next_snapshot():
+    book = make_book()
+
+    # 丢了u=101
+    assert book.on_message(delta(102, asks=[["1.00", "1"]]))
+    assert not book.synced and book.gaps == 1
+    assert not book.asks.keys and not book.is_fresh()
+    # 等快照期间的增量不应用
+    assert not book.on_message(delta(103, asks=[["1.00", "1"]]))
+    assert not book.asks.keys
+
+    assert not book.on_message(snapshot(200, bids=[["0.9", "1"]], asks=[["1.1", "1"]]))
+    assert book.synced and book.best_price("Buy") == 1.1
+    assert not book.on_message(delta(201, asks=[["1.1", "2"]]))
+    assert book.asks.sizes[0] == 2
+
+
+def test_u_equal_one_is_treated_as_snapshot():
+    book = make_book()
+
+    assert not book.on_message(delta(1, bids=[["0.5", "1"]], asks=[["0.6", "1"]]))
+    assert book.best_price("Buy") == 0.6
+    assert list(book.asks.keys) == [0.6]
+
+
+def test_manager_resyncs_once_per_gap():
+    manager = OrderBookManager(["AUSDT", "BUSDT"])
+    manager.ws = mock.Mock()
+    manager.on_message(snapshot(100, [["0.99", "1"]], [["1.00", "1"]]))
+
+    with mock.patch.object(manager, "start") as start:
+        manager.on_message(delta(105))
+        # 等待新快照期间的增量不再触发重建
+        manager.on_message(delta(106))
+        for _ in range(100):
+            if not manager._resyncing:
+                break
+            time.sleep(0.01)
+
+    assert manager.resyncs == 1
+    manager.ws.exit.assert_called_once()
+    start.assert_called_once()
+
+
+def test_usable_book_reasons():
+    manager = OrderBookManager(["AUSDT"])
+    manager.ws = mock.Mock()
+    manager.ws.is_connected.return_value = True
+
+    book, reason = manager.usable_book("AUSDT", 500)
+    assert book is None and "未同步" in reason
+    assert manager.usable_book("BUSDT", 500)[0] is None
+
+    manager.on_message(snapshot(100, [["0.99", "1"]], [["1.00", "1"]]))
+    # 连接正常时没有变化的订单簿即使很久没更新也可用
+    manager.books["AUSDT"].updated_at -= 60
+    assert manager.usable_book("AUSDT", 500)[0] is manager.books["AUSDT"]
+
+    # 连接断开后只用max_age内更新过的
+    manager.ws.is_connected.return_value = False
+    book, reason = manager.usable_book("AUSDT", 500)
+    assert book is None and "断开" in reason
+    manager.books["AUSDT"].updated_at = time.time()
+    assert manager.usable_book("AUSDT", 500)[0] is not None
@@ -0,0 +1,107 @@
+from decimal import Decimal
+from unittest import mock
+
+from Clients.order_slicer import OrderSlicer, split_qty
+
+
+def test_qty_within_max_is_not_split():
+    assert split_qty("5", "10", "1", "1") == [Decimal("5")]
+
+
+def test_children_are_even_and_within_max():
+    children = split_qty("25", "10", "1", "1")
+
+    assert children == [Decimal("9"), Decimal("8"), Decimal("8")]
+    assert sum(children) == Decimal("25")
+
+
+def test_children_are_multiples_of_step():
+    children = split_qty("1.05", "0.5", "0.01", "0.01")
+
+    assert sum(children) == Decimal("1.05")
+    assert all(child <= Decimal("0.5") for child in children)
+    assert all(child % Decimal("0.01") == 0 for child in children)
+
+
+def test_remainder_below_step_is_dropped():
+    assert split_qty("10.7", "100", "1", "1") == [Decimal("10")]
+
+
+def test_children_below_min_qty_are_dropped():
+    assert split_qty("3", "1", "2", "1") == []
+
+
+def test_nothing_to_split():
+    assert split_qty("0.5", "10", "1", "1") == []
+    assert split_qty("5", "0.5", "1", "1") == []
+
+
+def test_missing_exchange_time_falls_back_to_ack_time():
+    def place_order(**kwargs):
+        response = {"retCode": 0, "result": {"orderId": kwargs["orderLinkId"]}}
+        if kwargs["orderLinkId"].endswith("-0"):
+            response["time"] = 1700000000000
+        return response
+
+    slicer = OrderSlicer(place_order, max_workers=2)
+    try:
+        with mock.patch(
+            "Clients.order_slicer.time.time_ns", return_value=1800000000000 * 10**6
+        ):
+            response = slicer.place_sliced_order(
+                [Decimal("1"), Decimal("1")], symbol="AUSDT", orderLinkId="fra-1"
+            )
+    finally:
+        slicer.close()
+
+    assert response["first_time"] == 1700000000000
+    assert response["time"] == 1800000000000
+    assert response["accepted_qty"] == Decimal("2")
+
+
+def test_track_fills_polls_until_children_are_final():
+    def order(status, qty, price):
+        return {"orderStatus": status, "cumExecQty": qty, "avgPrice": price}
+
+    histories = {
+        # 刚成交时历史订单还查不到
+        "fra-1-0": [[], [], [order("Filled", "2", "10")]],
+        "fra-1-1": [[order("Filled", "1", "13")]],
+    }
+    client = mock.Mock()
+    client.get_order_history.side_effect = lambda category, orderLinkId: {
+        "result": {"list": histories[orderLinkId].pop(0)}
+    }
+    response = {
+        "result": {
+            "list": [
+                {"orderLinkId": "fra-1-0", "ok": True},
+                {"orderLinkId": "fra-1-1", "ok": True},
+                {"orderLinkId": "fra-1-2", "ok": False},
+            ]
+        }
+    }
+    slicer = OrderSlicer(mock.Mock(), max_workers=1)
+    try:
+        fills = slicer.track_fills(client, response, poll_interval=0)
+    finally:
+        slicer.close()
+
+    assert fills["filled_qty"] == Decimal("3")
+    assert fills["avg_price"] == Decimal("11")
+    # 已到终态的子单不再查询
+    assert client.get_order_history.call_count == 4
+
+
+def test_track_fills_gives_up_at_deadline():
+    client = mock.Mock()
+    client.get_order_history.return_value = {"result": {"list": []}}
+    response = {"result": {"list": [{"orderLinkId": "fra-1-0", "ok": True}]}}
+    slicer = OrderSlicer(mock.Mock(), max_workers=1)
+    try:
+        fills = slicer.track_fills(client, response, timeout=0.05, poll_interval=0.01)
+    finally:
+        slicer.close()
+
+    assert fills["filled_qty"] == 0 and fills["children"] == []
+    assert client.get_order_history.call_count > 1
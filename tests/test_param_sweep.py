@@ -0,0 +1,90 @@
+import pytest
+
+from strategies.param_sweep import (
+    DEFAULT_PARAMS,
+    SharedSnapshots,
+    SnapshotRecorder,
+    evaluate,
+    load_snapshots,
+)
+
+MINUTE_MS = 60 * 1000
+SETTLEMENT_MS = 1700000000000 - 1700000000000 % (8 * 60 * MINUTE_MS)
+
+
+def item(symbol, funding_rate):
+    return {"symbol": symbol, "exchangeName": "Bybit", "fundingRate": funding_rate}
+
+
+def scan(recorder, settlement_ms, minutes_before, rates):
+    items = [item(symbol, rate) for symbol, rate in rates.items()]
+    now_ms = settlement_ms - minutes_before * MINUTE_MS
+    return recorder.record(items, minutes_before / 60, settlement_ms, now_ms)
+
+
+def test_one_snapshot_per_settlement_window(tmp_path):
+    path = str(tmp_path / "snapshots.jsonl")
+    recorder = SnapshotRecorder(path, decision_lead_ms=30 * MINUTE_MS)
+
+    # 开仓窗口之前的扫描不记录
+    assert not scan(recorder, SETTLEMENT_MS, 120, {"AUSDT": 0.1})
+    # 窗口内第一次扫描作为快照，之后每分钟的扫描只刷新费率
+    for minutes_before in range(30, 0, -1):
+        assert not scan(recorder, SETTLEMENT_MS, minutes_before, {"AUSDT": 0.5})
+    assert not scan(recorder, SETTLEMENT_MS, 1, {"AUSDT": -0.2})
+
+    # 结算后第一次扫描写入上一周期
+    next_ms = SETTLEMENT_MS + 8 * 60 * MINUTE_MS
+    assert scan(recorder, next_ms, 479, {"AUSDT": 0.3})
+    snapshots = load_snapshots(path)
+    assert len(snapshots) == 1
+    assert snapshots[0]["settlement"] == SETTLEMENT_MS
+    assert snapshots[0]["time"] == SETTLEMENT_MS - 30 * MINUTE_MS
+    assert snapshots[0]["holding_hours"] == 0.5
+    assert snapshots[0]["items"] == [
+        {**item("AUSDT", 0.5), "realizedFundingRate": -0.2}
+    ]
+
+    # 没进入过开仓窗口的周期不写
+    assert not scan(recorder, next_ms + 8 * 60 * MINUTE_MS, 479, {"AUSDT": 0.3})
+    assert len(load_snapshots(path)) == 1
+
+
+def test_snapshot_items_are_copied(tmp_path):
+    path = str(tmp_path / "snapshots.jsonl")
+    recorder = SnapshotRecorder(path)
+    items = [item("AUSDT", 0.5)]
+    recorder.record(items, 0.5, SETTLEMENT_MS, SETTLEMENT_MS - 10 * MINUTE_MS)
+    # 策略之后往item里写的字段不进快照
+    items[0]["holdingHours"] = 0.1
+
+    assert recorder.flush()
+    assert "holdingHours" not in load_snapshots(path)[0]["items"][0]
+
+
+def test_realized_rate_drives_pnl_and_hit_rate():
+    snapshots = [
+        {
+            "holding_hours": 0.5,
+            "items": [
+                # 结算时费率反向
+                {**item("AUSDT", 0.5), "realizedFundingRate": -0.5},
+                {**item("BUSDT", 0.4), "realizedFundingRate": 0.4},
+            ],
+        },
+        # 没有回填的按快照费率计算
+        {"holding_hours": 0.5, "items": [item("CUSDT", -0.3)]},
+    ]
+    shared = SharedSnapshots.create(snapshots)
+    try:
+        result = evaluate(shared, dict(DEFAULT_PARAMS))
+    finally:
+        shared.close()
+
+    position_value = min(DEFAULT_PARAMS["max_position_value"], 1000 / 2)
+    cost = DEFAULT_PARAMS["fee_rate"] * 2 + DEFAULT_PARAMS["margin_interest_rate"] / 16
+    assert result["trades"] == 3
+    assert result["hit_rate"] == pytest.approx(2 / 3)
+    assert result["pnl"] == pytest.approx(
+        position_value * ((-0.005 - cost) + (0.004 - cost) + (0.003 - cost))
+    )
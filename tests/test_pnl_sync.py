@@ -0,0 +1,160 @@
+import pytest
+
+from tools.pnl_sync import PnlStore, PnlSync
+
+SETTLEMENT_MS = 1700006400000
+DAY_MS = 24 * 3600 * 1000
+
+
+def transaction(id, type, time_ms, symbol="AUSDT", order_id="", **amounts):
+    return {
+        "id": id,
+        "symbol": symbol,
+        "type": type,
+        "orderId": order_id,
+        "transactionTime": str(time_ms),
+        **{key: str(value) for key, value in amounts.items()},
+    }
+
+
+class FakeClient(object):
+    """按时间窗口过滤流水，每页page_size条，cursor为下一页的起始下标"""
+
+    def __init__(self, records, page_size=2):
+        self.records = records
+        self.page_size = page_size
+        self.calls = []
+
+    def get_transaction_log(self, startTime, endTime, limit, cursor=None, **kwargs):
+        self.calls.append((startTime, endTime, cursor))
+        matched = [
+            record
+            for record in self.records
+            if startTime <= int(record["transactionTime"]) <= endTime
+        ]
+        start = int(cursor or 0)
+        end = start + self.page_size
+        return {
+            "retCode": 0,
+            "result": {
+                "list": matched[start:end],
+                "nextPageCursor": str(end) if end < len(matched) else "",
+            },
+        }
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = PnlStore(str(tmp_path / "pnl" / "pnl.sqlite3"))
+    yield store
+    store.close()
+
+
+def test_attempt_results_join_funding_and_order_fees(store):
+    store.record_attempt(
+        "AUSDT", SETTLEMENT_MS, ["open-1"], open_time_ms=SETTLEMENT_MS - 500
+    )
+    # 重复记录合并订单号，已有字段不被空值覆盖
+    store.record_attempt("AUSDT", SETTLEMENT_MS, ["open-2"], qty="10")
+    # 结算后才发出的平仓单
+    store.add_order("AUSDT", SETTLEMENT_MS, "close-1")
+    store.add_transactions(
+        [
+            transaction(
+                "t1",
+                "TRADE",
+                SETTLEMENT_MS - 400,
+                order_id="open-1",
+                fee=0.1,
+                change=-0.1,
+            ),
+            transaction(
+                "t2",
+                "TRADE",
+                SETTLEMENT_MS - 300,
+                order_id="open-2",
+                fee=0.1,
+                change=-0.1,
+            ),
+            transaction("t3", "SETTLEMENT", SETTLEMENT_MS + 1000, funding=-0.5),
+            transaction(
+                "t4",
+                "TRADE",
+                SETTLEMENT_MS + 2000,
+                order_id="close-1",
+                fee=0.2,
+                change=-0.3,
+            ),
+            # 超出结算时间容差的资金费和其他订单的手续费不计入
+            transaction(
+                "t5", "SETTLEMENT", SETTLEMENT_MS + 8 * 3600 * 1000, funding=-1
+            ),
+            transaction(
+                "t6", "TRADE", SETTLEMENT_MS, order_id="other", fee=5, change=-5
+            ),
+        ]
+    )
+
+    [result] = store.attempt_results("AUSDT")
+
+    assert result["open_time_ms"] == SETTLEMENT_MS - 500 and result["qty"] == "10"
+    assert result["funding_collected"] == pytest.approx(0.5)
+    assert result["collected"] is True
+    assert result["fee"] == pytest.approx(0.4)
+    assert result["net"] == pytest.approx(0.5 - 0.5)
+    summary = store.symbol_summary()
+    assert summary["AUSDT"]["attempts"] == 1 and summary["AUSDT"]["collected"] == 1
+
+
+def test_duplicate_transactions_are_ignored(store):
+    records = [transaction("t1", "TRADE", SETTLEMENT_MS, fee=0.1)]
+
+    assert store.add_transactions(records) == 1
+    assert store.add_transactions(records + [{"symbol": "AUSDT"}]) == 0
+
+
+def test_first_sync_looks_back_and_pages_by_cursor(store):
+    now_ms = SETTLEMENT_MS + DAY_MS
+    records = [
+        transaction(f"t{i}", "TRADE", now_ms - DAY_MS + i * 1000, fee=0.1)
+        for i in range(5)
+    ]
+    client = FakeClient(records)
+    sync = PnlSync(client, store, lookback_days=2)
+
+    assert sync.sync(now_ms) == 5
+    assert [cursor for _, _, cursor in client.calls] == [None, "2", "4"]
+    assert client.calls[0][:2] == (now_ms - 2 * DAY_MS, now_ms)
+    assert store.get_checkpoint(sync.checkpoint_name) == now_ms
+
+
+def test_incremental_sync_overlaps_checkpoint_and_splits_windows(store):
+    checkpoint = SETTLEMENT_MS
+    store.set_checkpoint("transaction_log:UNIFIED:linear", checkpoint)
+    late = transaction("late", "SETTLEMENT", checkpoint - 1000, funding=-0.5)
+    store.add_transactions([late])
+    now_ms = checkpoint + 10 * DAY_MS
+    client = FakeClient([late, transaction("new", "TRADE", now_ms - 1000, fee=0.1)])
+    sync = PnlSync(client, store)
+
+    # 重叠区间内已有的流水不重复计数
+    assert sync.sync(now_ms) == 1
+    windows = [(start, end) for start, end, cursor in client.calls if cursor is None]
+    # 单次查询不超过7天，相邻窗口重叠1分钟
+    assert windows == [
+        (checkpoint - 60 * 1000, checkpoint - 60 * 1000 + 7 * DAY_MS),
+        (checkpoint - 120 * 1000 + 7 * DAY_MS, now_ms),
+    ]
+    assert store.get_checkpoint(sync.checkpoint_name) == now_ms
+
+
+def test_failed_page_keeps_previous_checkpoint(store):
+    store.set_checkpoint("transaction_log:UNIFIED:linear", SETTLEMENT_MS)
+
+    class FailingClient(object):
+        def get_transaction_log(self, **kwargs):
+            return {"retCode": 10002, "retMsg": "timeout"}
+
+    with pytest.raises(Exception, match="timeout"):
+        PnlSync(FailingClient(), store).sync(SETTLEMENT_MS + DAY_MS)
+    assert store.get_checkpoint("transaction_log:UNIFIED:linear") == SETTLEMENT_MS
@@ -0,0 +1,173 @@
+import json
+import os
+from unittest import mock
+
+from strategies.position_journal import PositionJournal
+
+POSITION = {"direction": "short", "amount": 10.0, "open_time": "2025-03-16T07:30:00"}
+
+
+def make_journal(tmp_path):
+    # 后台落盘间隔设长，落盘只来自sync=True和显式调用
+    return PositionJournal(
+        str(tmp_path / "journal" / "positions.jsonl"), flush_interval=3600
+    )
+
+
+def test_replay_rebuilds_positions_and_unfinished(tmp_path):
+    journal = make_journal(tmp_path)
+    link_ids = {"futures": "fra-f", "spot": "fra-s"}
+    # 完整开仓
+    journal.append("intent", "AUSDT", direction="short", amount=10, orderLinkIds={})
+    journal.append("order", "AUSDT", leg="futures", orderId="1")
+    journal.append("open", "AUSDT", position=POSITION)
+    # 只下了合约腿就崩溃
+    journal.append("intent", "BUSDT", direction="long", amount=5, orderLinkIds=link_ids)
+    journal.append("order", "BUSDT", leg="futures", orderId="2")
+    # 平仓中崩溃
+    journal.append("intent", "CUSDT", direction="short", amount=1, orderLinkIds={})
+    journal.append("open", "CUSDT", position=POSITION)
+    journal.append("closing", "CUSDT")
+    # 已结束的不恢复
+    journal.append("intent", "DUSDT", direction="short", amount=1, orderLinkIds={})
+    journal.append("failed", "DUSDT")
+    journal.append("intent", "EUSDT", direction="short", amount=1, orderLinkIds={})
+    journal.append("open", "EUSDT", position=POSITION)
+    journal.append("closed", "EUSDT")
+
+    positions, unfinished = journal.replay()
+    journal.close()
+
+    assert positions == {"AUSDT": POSITION}
+    assert set(unfinished) == {"BUSDT", "CUSDT"}
+    assert unfinished["BUSDT"]["status"] == "opening"
+    assert unfinished["BUSDT"]["orders"] == {"futures": "2"}
+    assert unfinished["BUSDT"]["orderLinkIds"] == link_ids
+    assert unfinished["CUSDT"]["status"] == "closing"
+    assert unfinished["CUSDT"]["position"] == POSITION
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+    journal = make_journal(tmp_path)
+    journal.append("intent", "AUSDT", direction="short", amount=1, orderLinkIds={})
+    journal.append("open", "AUSDT", position=POSITION)
+    journal.close()
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"type":"closed","symbol":"AU')
+
+    journal = make_journal(tmp_path)
+    positions, unfinished = journal.replay()
+    journal.close()
+
+    assert positions == {"AUSDT": POSITION} and unfinished == {}
+
+
+def test_sync_append_is_on_disk_before_returning(tmp_path):
+    journal = make_journal(tmp_path)
+    synced = []
+
+    def fsync(fd):
+        # fsync时这一行已经写入文件，不在用户态缓冲里
+        with open(journal.path, encoding="utf-8") as f:
+            synced.append([json.loads(line)["type"] for line in f])
+
+    with mock.patch("strategies.position_journal.os.fsync", side_effect=fsync):
+        journal.append("order", "AUSDT", leg="futures", orderId="1")
+        assert synced == []
+        journal.append("intent", "AUSDT", sync=True, direction="short", amount=1)
+        assert synced == [["order", "intent"]]
+        # 没有新事件时不重复fsync
+        journal.sync()
+        assert len(synced) == 1
+    journal.close()
+
+
+def test_compact_keeps_state_and_rewrites_atomically(tmp_path):
+    journal = make_journal(tmp_path)
+    link_ids = {"futures": "fra-f", "spot": "fra-s"}
+    for i in range(50):
+        journal.append("intent", "AUSDT", direction="short", amount=i, orderLinkIds={})
+        journal.append("failed", "AUSDT")
+    journal.append("open", "BUSDT", position=POSITION)
+    journal.append("intent", "CUSDT", direction="long", amount=2, orderLinkIds=link_ids)
+    journal.append("order", "CUSDT", leg="futures", orderId="9")
+    journal.append("open", "DUSDT", position=POSITION)
+    journal.append("closing", "DUSDT")
+    before = journal.replay()
+
+    journal.compact(*before)
+    with open(journal.path, encoding="utf-8") as f:
+        lines = f.readlines()
+    assert len(lines) == 5
+    assert not os.path.exists(f"{journal.path}.tmp")
+    assert journal.replay() == before
+
+    # 压缩后继续追加写入同一文件
+    journal.append("closed", "BUSDT", sync=True)
+    journal.close()
+    journal = make_journal(tmp_path)
+    positions, unfinished = journal.replay()
+    journal.close()
+    assert positions == {}
+    assert unfinished["CUSDT"]["orderLinkIds"] == link_ids
+    assert unfinished["CUSDT"]["orders"] == {"futures": "9"}
+    assert unfinished["DUSDT"]["status"] == "closing"
+
+
+def test_strategy_persists_intent_before_each_leg(tmp_path):
+    from strategies.funding_rate_arbitrage import FundingRateArbitrage
+
+    strategy = FundingRateArbitrage(
+        api_key="test", api_secret="test", journal_file=str(tmp_path / "p.jsonl")
+    )
+    client = strategy.client = mock.Mock()
+    client.get_instruments_info.return_value = {
+        "retCode": 0,
+        "result": {"list": [{"lotSizeFilter": {"qtyStep": "1", "minOrderQty": "1"}}]},
+    }
+    client.get_wallet_balance.return_value = {
+        "retCode": 0,
+        "result": {
+            "list": [
+                {
+                    "coin": [
+                        {"walletBalance": "100", "totalPositionIM": "0", "locked": "0"}
+                    ]
+                }
+            ]
+        },
+    }
+    client.get_tickers.return_value = {
+        "retCode": 0,
+        "result": {"list": [{"lastPrice": "1"}]},
+    }
+    strategy.account_config = mock.Mock()
+    strategy.exit_engine = mock.Mock()
+    strategy.exit_engine.confirm_fill.return_value = {
+        "cumExecQty": "10",
+        "avgPrice": "1",
+    }
+    strategy.exit_engine.arm.return_value = {}
+    on_disk = []
+
+    def place_order(**kwargs):
+        # 下单时开仓意图(带本腿的orderLinkId)必须已经落盘
+        with open(strategy.journal.path, encoding="utf-8") as f:
+            events = [json.loads(line) for line in f]
+        intents = [e for e in events if e["type"] == "intent"]
+        assert intents and kwargs["orderLinkId"] in intents[-1]["orderLinkIds"].values()
+        on_disk.append(kwargs["category"])
+        return {"result": {"orderId": f"{kwargs['category']}-1"}}
+
+    client.place_order.side_effect = place_order
+    strategy.open_arbitrage_position(
+        {"symbol": "AUSDT", "futuresType": "short", "spotType": "buy", "currency": "A"},
+        10,
+    )
+    strategy.journal.close()
+
+    assert on_disk == ["linear", "spot"]
+    journal = PositionJournal(strategy.journal.path)
+    positions, unfinished = journal.replay()
+    journal.close()
+    assert positions["AUSDT"]["amount"] == 10 and unfinished == {}
@@ -0,0 +1,126 @@
+import threading
+
+import pytest
+
+from single_direction_trade.shared_trigger import SharedTrigger
+from tools.critical_window import CriticalWindow
+
+TARGET_NS = 1700000000000000000
+
+
+class FakeTrade(object):
+    """领头实例的wait_until在release之后返回，或抛出error"""
+
+    def __init__(self, error=None, critical_window=None):
+        self.error = error
+        self.critical_window = critical_window
+        self.waited = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def wait_until(self, target_ns):
+        self.waited.append(target_ns)
+        self.started.set()
+        self.release.wait(2)
+        if self.error is not None:
+            raise self.error
+
+
+def run_in_thread(trigger, trade, target_ns=TARGET_NS):
+    result = {}
+
+    def target():
+        try:
+            trigger.wait_until(trade, target_ns)
+            result["ok"] = True
+            if trade.critical_window is not None:
+                # 收到回报后退出窗口
+                result["stats"] = trade.critical_window.exit()
+        except Exception as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    return thread, result
+
+
+def test_only_the_leader_polls_and_followers_are_released_together():
+    trigger = SharedTrigger()
+    leader = FakeTrade()
+    leader_thread, leader_result = run_in_thread(trigger, leader)
+    leader.started.wait(2)
+    followers = [FakeTrade() for _ in range(3)]
+    threads = [run_in_thread(trigger, trade) for trade in followers]
+
+    assert not any(result for _, result in threads)
+    leader.release.set()
+    leader_thread.join(2)
+    for thread, _ in threads:
+        thread.join(2)
+
+    assert leader_result == {"ok": True}
+    assert all(result == {"ok": True} for _, result in threads)
+    assert leader.waited == [TARGET_NS]
+    assert all(trade.waited == [] for trade in followers)
+
+
+def test_leader_failure_is_raised_in_followers():
+    trigger = SharedTrigger()
+    leader = FakeTrade(error=ConnectionError("server time"))
+    leader_thread, leader_result = run_in_thread(trigger, leader)
+    leader.started.wait(2)
+    follower_thread, follower_result = run_in_thread(trigger, FakeTrade())
+
+    leader.release.set()
+    leader_thread.join(2)
+    follower_thread.join(2)
+
+    assert isinstance(leader_result["error"], ConnectionError)
+    assert "等待触发时间失败" in str(follower_result["error"])
+    # 失败的目标时间之后到达的实例也不下单
+    with pytest.raises(Exception, match="等待触发时间失败"):
+        trigger.wait_until(FakeTrade(), TARGET_NS)
+
+
+def test_older_targets_are_pruned():
+    trigger = SharedTrigger()
+    first = FakeTrade(error=ConnectionError("server time"))
+    first.release.set()
+    with pytest.raises(ConnectionError):
+        trigger.wait_until(first, TARGET_NS)
+
+    second = FakeTrade()
+    second.release.set()
+    trigger.wait_until(second, TARGET_NS + 1)
+
+    assert set(trigger.events) == {TARGET_NS + 1}
+    assert trigger.failed == set()
+
+
+def test_followers_join_the_leaders_critical_window():
+    window = CriticalWindow()
+    trigger = SharedTrigger()
+    leader = FakeTrade()
+    leader_thread, _ = run_in_thread(trigger, leader)
+    leader.started.wait(2)
+    follower_thread, follower_result = run_in_thread(
+        trigger, FakeTrade(critical_window=window)
+    )
+    # 领头实例在触发前进入窗口，等待中的实例轮询到后加入
+    window.enter()
+    try:
+        for _ in range(100):
+            if len(window._holders) == 2:
+                break
+            threading.Event().wait(0.01)
+        assert len(window._holders) == 2
+    finally:
+        leader.release.set()
+        leader_thread.join(2)
+        follower_thread.join(2)
+
+    # 跟随实例先退出，窗口保持到领头实例退出
+    assert follower_result == {"ok": True, "stats": None}
+    assert window.active
+    assert window.exit() is not None
+    assert not window.active
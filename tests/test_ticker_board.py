@@ -0,0 +1,45 @@
+import os
+import subprocess
+import sys
+
+from tools.ticker_board import TickerBoard
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+READER = """
+import sys
+sys.path.insert(0, {root!r})
+from tools.ticker_board import TickerBoard
+board = TickerBoard.attach({name!r})
+print(",".join(board.symbols()))
+board.close()
+"""
+
+
+def test_independent_reader_does_not_unlink_the_board():
+    board = TickerBoard.create(["BTCUSDT", "ETHUSDT"])
+    try:
+        result = subprocess.run(
+            [sys.executable, "-c", READER.format(root=ROOT_DIR, name=board.name)],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        assert result.stdout.strip() == "BTCUSDT,ETHUSDT"
+        assert "leaked" not in result.stderr
+
+        # 读进程退出后行情板仍然存在
+        again = TickerBoard.attach(board.name)
+        assert again.symbols() == ["BTCUSDT", "ETHUSDT"]
+        again.close()
+    finally:
+        board.close()
+
+
+def test_same_process_reader_keeps_owner_registration(capfd):
+    board = TickerBoard.create(["BTCUSDT"])
+    reader = TickerBoard.attach(board.name)
+    reader.close()
+    board.close()
+
+    assert "KeyError" not in capfd.readouterr().err
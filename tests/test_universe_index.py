@@ -0,0 +1,129 @@
+import time
+from unittest import mock
+
+from strategies.universe_index import UniverseIndex
+
+
+def instrument(symbol, status="Trading", margin=None):
+    item = {"symbol": symbol, "status": status}
+    if margin is not None:
+        item["marginTrading"] = margin
+    return item
+
+
+def page(instruments, cursor=""):
+    return {
+        "retCode": 0,
+        "result": {"list": instruments, "nextPageCursor": cursor},
+    }
+
+
+class FakeClient(object):
+    """按category返回交易对，linear分两页"""
+
+    def __init__(self, linear, spot, page_size=2):
+        self.linear = linear
+        self.spot = spot
+        self.page_size = page_size
+        self.calls = []
+
+    def get_instruments_info(self, category, limit, cursor=None):
+        self.calls.append((category, cursor))
+        instruments = self.linear if category == "linear" else self.spot
+        start = int(cursor or 0)
+        end = start + self.page_size
+        return page(instruments[start:end], str(end) if end < len(instruments) else "")
+
+
+def make_index(linear, spot):
+    return UniverseIndex(FakeClient(linear, spot), refresh_interval=3600)
+
+
+def test_available_requires_linear_trading_and_spot_margin():
+    index = make_index(
+        [
+            instrument("AUSDT"),
+            instrument("BUSDT"),
+            instrument("CUSDT", status="Settling"),
+            instrument("DUSDT"),
+        ],
+        [
+            instrument("AUSDT", margin="both"),
+            instrument("BUSDT", margin="none"),
+            instrument("CUSDT", margin="both"),
+        ],
+    )
+
+    assert index.refresh() == []
+    assert index.ready and index.version == 1
+    assert index.available == frozenset({"AUSDT"})
+    # linear按cursor翻了两页
+    assert index.client.calls[:2] == [("linear", None), ("linear", "2")]
+    assert index.is_listed("DUSDT") and not index.is_margin_tradable("DUSDT")
+    assert not index.is_tradable("CUSDT")
+
+
+def test_refresh_emits_changes_and_bumps_version():
+    linear = [instrument("AUSDT"), instrument("BUSDT")]
+    spot = [instrument("AUSDT", margin="both"), instrument("BUSDT", margin="none")]
+    index = make_index(linear, spot)
+    index.refresh()
+    events = []
+    index.subscribe(lambda *event: events.append(event[:3]))
+
+    # 没有变化时不发事件，version不变
+    index.refresh()
+    assert events == [] and index.version == 1
+
+    index.client.linear = [instrument("AUSDT", status="Closed"), instrument("EUSDT")]
+    index.client.spot = [
+        instrument("AUSDT", margin="both"),
+        instrument("BUSDT", margin="both"),
+    ]
+    index.refresh()
+
+    assert sorted(events) == [
+        ("linear", "AUSDT", "status_changed"),
+        ("linear", "BUSDT", "delisted"),
+        ("linear", "EUSDT", "listed"),
+        ("spot", "BUSDT", "margin_changed"),
+    ]
+    assert index.available == frozenset() and index.version == 2
+
+
+def test_listener_errors_do_not_stop_notifications():
+    index = make_index([instrument("AUSDT")], [])
+    index.refresh()
+    events = []
+    index.subscribe(mock.Mock(side_effect=RuntimeError("boom")))
+    index.subscribe(lambda *event: events.append(event[1]))
+
+    index.client.linear = []
+    index.refresh()
+
+    assert events == ["AUSDT"]
+
+
+def test_start_survives_failed_first_refresh_and_retries():
+    client = FakeClient([instrument("AUSDT")], [instrument("AUSDT", margin="both")])
+    responses = [ConnectionError("timeout"), ConnectionError("timeout")]
+    fetch = client.get_instruments_info
+
+    def flaky(**kwargs):
+        if responses:
+            raise responses.pop(0)
+        return fetch(**kwargs)
+
+    client.get_instruments_info = flaky
+    index = UniverseIndex(client, refresh_interval=3600, retry_interval=0.01)
+    try:
+        index.start()
+        assert not index.ready
+        for _ in range(200):
+            if index.ready:
+                break
+            time.sleep(0.01)
+    finally:
+        index.stop()
+
+    assert index.ready and index.available == frozenset({"AUSDT"})
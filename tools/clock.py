@@ -0,0 +1,169 @@
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, List, Optional
+
+# 时钟抽象
+# 等待、定时和策略主循环都通过时钟取时间和睡眠，
+# 实盘用RealClock，模拟时用VirtualClock直接跳到下一个到期的睡眠，一天的结算周期可在秒级以内回放
+
+
+class RealClock(object):
+    """系统时钟"""
+
+    def time(self) -> float:
+        return time.time()
+
+    def time_ns(self) -> int:
+        return time.time_ns()
+
+    def now(self) -> datetime:
+        return datetime.now()
+
+    def utcnow(self) -> datetime:
+        return datetime.utcnow()
+
+    def perf_counter(self) -> float:
+        return time.perf_counter()
+
+    def sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def call_later(self, delay: float, callback: Callable[[], None], name=None):
+        """delay秒后在新线程中执行callback，返回值可调用cancel()取消"""
+        timer = threading.Timer(max(0.0, delay), callback)
+        if name:
+            timer.name = name
+        timer.start()
+        return timer
+
+    @contextmanager
+    def participant(self):
+        """与VirtualClock接口一致，系统时钟无需登记"""
+        yield
+
+
+REAL_CLOCK = RealClock()
+
+
+class _VirtualTimer(object):
+    def __init__(self, clock: "VirtualClock", delay: float, callback, name) -> None:
+        self.cancelled = False
+        self.thread = threading.Thread(
+            target=self._run, args=(clock, delay, callback), name=name, daemon=True
+        )
+
+    def _run(self, clock: "VirtualClock", delay: float, callback):
+        # call_later中已计入参与者，这里只标记当前线程
+        clock._registered.value = True
+        try:
+            clock.sleep(delay)
+            if not self.cancelled:
+                callback()
+        finally:
+            clock.leave()
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        self.thread.join(timeout)
+
+
+class VirtualClock(RealClock):
+    """
+    离散事件虚拟时钟
+    所有登记的参与线程都在sleep时，时间直接跳到最早的唤醒时间并唤醒对应线程，不做真实等待
+    单线程使用时无需登记；多线程时每个线程在participant()中运行，保证所有线程都睡下后才推进时间
+    """
+
+    def __init__(self, start: Optional[datetime] = None) -> None:
+        """start: 起始本地时间，默认当前时间"""
+        self._time = (start or datetime.now()).timestamp()
+        self._cond = threading.Condition()
+        # (唤醒时间, 序号)
+        self._sleepers: List[tuple] = []
+        self._seq = itertools.count()
+        self._participants = 0
+        # 未登记的线程调用sleep时按单线程处理
+        self._registered = threading.local()
+
+    def time(self) -> float:
+        return self._time
+
+    def time_ns(self) -> int:
+        return round(self._time * 1000000000)
+
+    def now(self) -> datetime:
+        return datetime.fromtimestamp(self._time)
+
+    def utcnow(self) -> datetime:
+        return datetime.utcfromtimestamp(self._time)
+
+    def perf_counter(self) -> float:
+        return self._time
+
+    def advance(self, seconds: float) -> None:
+        """手动推进时间"""
+        with self._cond:
+            self._time += max(0.0, seconds)
+            self._cond.notify_all()
+
+    def join(self) -> None:
+        """把当前线程登记为参与者"""
+        with self._cond:
+            self._participants += 1
+        self._registered.value = True
+
+    def leave(self) -> None:
+        self._registered.value = False
+        with self._cond:
+            self._participants -= 1
+            self._advance_if_idle()
+
+    @contextmanager
+    def participant(self):
+        """在多线程模拟中，每个线程的主体放在这个上下文中运行"""
+        self.join()
+        try:
+            yield
+        finally:
+            self.leave()
+
+    def _advance_if_idle(self):
+        # 调用时需持有_cond
+        if not self._sleepers or len(self._sleepers) < self._participants:
+            return
+        wake_time = self._sleepers[0][0]
+        if wake_time > self._time:
+            self._time = wake_time
+        while self._sleepers and self._sleepers[0][0] <= self._time:
+            heapq.heappop(self._sleepers)
+        self._cond.notify_all()
+
+    def sleep(self, seconds: float) -> None:
+        if not getattr(self._registered, "value", False):
+            # 未登记的线程：独占时钟，直接跳过
+            with self._cond:
+                self._time += max(0.0, seconds)
+                self._cond.notify_all()
+            return
+        with self._cond:
+            wake_time = self._time + max(0.0, seconds)
+            heapq.heappush(self._sleepers, (wake_time, next(self._seq)))
+            self._advance_if_idle()
+            while self._time < wake_time:
+                self._cond.wait()
+
+    def call_later(self, delay: float, callback: Callable[[], None], name=None):
+        """在虚拟时间delay秒后执行callback，定时线程作为参与者登记"""
+        timer = _VirtualTimer(self, delay, callback, name)
+        # 先计入参与者，避免定时线程睡下之前时间被推进
+        with self._cond:
+            self._participants += 1
+        timer.thread.start()
+        return timer
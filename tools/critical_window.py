@@ -0,0 +1,192 @@
+import gc
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from tools.metrics import GC_PAUSE, WINDOW_ALLOCATED_BLOCKS
+
+# 下单关键窗口
+# 触发前lead_seconds先做一次完整GC，再冻结现有对象并关闭GC，
+# 窗口内的日志只入队不输出，收到下单回报后退出窗口，恢复GC并按原调用时间补写日志，
+# 每个窗口记录GC停顿、新分配的内存块数和推迟的日志条数
+# GC是进程级的，多个symbol线程共用一个窗口：第一个线程进入时关闭GC，最后一个线程退出时恢复
+
+
+class _DeferredLogger(object):
+    """窗口内只把日志入队，窗口外直接调用原logger"""
+
+    __slots__ = ("_window", "_logger")
+
+    def __init__(self, window: "CriticalWindow", logger) -> None:
+        self._window = window
+        self._logger = logger
+
+    def _call(self, level: str, message, args, kwargs):
+        if self._window.active:
+            # 记下调用时间，补写时日志时间不是退出窗口的时间
+            self._window.defer(self._replay, level, time.time(), message, args, kwargs)
+        else:
+            getattr(self._logger, level)(message, *args, **kwargs)
+
+    def _replay(self, level: str, logged_at: float, message, args, kwargs):
+        logger = self._logger
+        patch = getattr(logger, "patch", None)
+        if patch is not None:
+            # loguru：用调用时间替换记录时间，保留loguru自己的datetime类型和时区
+            logger = patch(
+                lambda record: record.update(
+                    time=type(record["time"]).fromtimestamp(
+                        logged_at, record["time"].tzinfo
+                    )
+                )
+            )
+        getattr(logger, level)(message, *args, **kwargs)
+
+    def debug(self, message, *args, **kwargs):
+        self._call("debug", message, args, kwargs)
+
+    def info(self, message, *args, **kwargs):
+        self._call("info", message, args, kwargs)
+
+    def warning(self, message, *args, **kwargs):
+        self._call("warning", message, args, kwargs)
+
+    def error(self, message, *args, **kwargs):
+        self._call("error", message, args, kwargs)
+
+    def __getattr__(self, name):
+        # bind/opt/exception等不在关键路径上的方法直接透传
+        return getattr(self._logger, name)
+
+
+class CriticalWindow(object):
+    """
+    window = CriticalWindow(lead_seconds=1.0)
+    logger = window.wrap_logger(logger)  窗口内的日志推迟到退出后输出
+    window.enter()                        触发前进入：完整GC、冻结、关闭GC
+    window.join_active()                  窗口已开启时加入，不再做GC(共用触发器的跟随线程)
+    window.defer(func, *args)             窗口内的记账推迟到退出后执行
+    stats = window.exit()                 收到回报后退出，最后一个退出的线程返回本窗口统计
+    """
+
+    def __init__(self, lead_seconds: float = 1.0, logger=None) -> None:
+        """
+        lead_seconds: 距触发时间多久进入窗口，需覆盖一次完整GC的耗时
+        logger: 输出窗口统计，为空则print
+        """
+        self.lead_seconds = lead_seconds
+        self.logger = logger
+        self.active = False
+        # 已进入窗口的线程
+        self._holders = set()
+        self._deferred: List[tuple] = []
+        self._pauses: List[float] = []
+        self._gc_started: Optional[float] = None
+        self._was_enabled = True
+        self._entered_at = 0.0
+        self._blocks_at_enter = 0
+        self._gc_count_at_enter = 0
+        self._prepare_ms = 0.0
+        # 每个窗口的统计
+        self.windows: List[Dict] = []
+        self.lock = threading.Lock()
+
+    def wrap_logger(self, logger):
+        return _DeferredLogger(self, logger)
+
+    def _on_gc(self, phase: str, info: dict) -> None:
+        if phase == "start":
+            self._gc_started = time.perf_counter()
+        elif self._gc_started is not None:
+            self._pauses.append((time.perf_counter() - self._gc_started) * 1000)
+            self._gc_started = None
+
+    def enter(self) -> None:
+        """当前线程进入窗口，重复调用无效"""
+        with self.lock:
+            first = not self._holders
+            self._holders.add(threading.get_ident())
+            if not first:
+                return
+            started = time.perf_counter()
+            gc.collect()
+            # 冻结后现有对象不再参与GC，退出窗口后新对象的GC也不用再遍历它们
+            gc.freeze()
+            self._was_enabled = gc.isenabled()
+            gc.disable()
+            self._prepare_ms = (time.perf_counter() - started) * 1000
+            GC_PAUSE.labels("prepare").observe(self._prepare_ms / 1000)
+            self._pauses = []
+            gc.callbacks.append(self._on_gc)
+            self._blocks_at_enter = sys.getallocatedblocks()
+            self._gc_count_at_enter = gc.get_count()[0]
+            self._entered_at = time.perf_counter()
+            self.active = True
+
+    def join_active(self) -> bool:
+        """窗口已由其他线程进入时当前线程也加入(不再做GC)，返回是否加入"""
+        with self.lock:
+            if not self.active:
+                return False
+            self._holders.add(threading.get_ident())
+            return True
+
+    def defer(self, func: Callable, *args, **kwargs) -> None:
+        """窗口内推迟执行，窗口外立即执行"""
+        if self.active:
+            self._deferred.append((func, args, kwargs))
+        else:
+            func(*args, **kwargs)
+
+    def exit(self) -> Optional[Dict]:
+        """当前线程退出窗口，最后一个线程退出时恢复GC并执行推迟的日志和记账"""
+        with self.lock:
+            ident = threading.get_ident()
+            if ident not in self._holders:
+                return None
+            self._holders.discard(ident)
+            if self._holders:
+                return None
+            duration_ms = (time.perf_counter() - self._entered_at) * 1000
+            allocated_blocks = sys.getallocatedblocks() - self._blocks_at_enter
+            gc_tracked = gc.get_count()[0] - self._gc_count_at_enter
+            self.active = False
+            gc.callbacks.remove(self._on_gc)
+            if self._was_enabled:
+                gc.enable()
+            gc.unfreeze()
+            deferred, self._deferred = self._deferred, []
+            stats = {
+                "prepare_ms": self._prepare_ms,
+                "duration_ms": duration_ms,
+                "gc_pauses": len(self._pauses),
+                "max_gc_pause_ms": max(self._pauses) if self._pauses else 0.0,
+                # 窗口内净增加的内存块数和GC跟踪对象数
+                "allocated_blocks": allocated_blocks,
+                "gc_tracked": gc_tracked,
+                "deferred": len(deferred),
+            }
+            self.windows.append(stats)
+        for pause_ms in self._pauses:
+            GC_PAUSE.labels("window").observe(pause_ms / 1000)
+        WINDOW_ALLOCATED_BLOCKS.observe(allocated_blocks)
+        for func, args, kwargs in deferred:
+            try:
+                func(*args, **kwargs)
+            except Exception as e:
+                print(f"警告：推迟执行失败 - 错误: {str(e)}")
+        message = f"关键窗口统计: {stats}"
+        if self.logger is not None:
+            self.logger.info(message)
+        else:
+            print(message)
+        return stats
+
+    def __enter__(self):
+        self.enter()
+        return self
+
+    def __exit__(self, *exc):
+        self.exit()
+        return False
@@ -0,0 +1,269 @@
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterable, Optional
+
+from tools.metrics import FIRE_JITTER
+from tools.ns_time import NS_PER_MS, NS_PER_SECOND, NS_PER_US
+
+# 触发线程
+# 下单路径放到专用线程执行：可绑定到指定CPU、提升调度优先级(实时调度需要CAP_SYS_NICE)，
+# 交易线程轮询服务器时间到距唤醒点不足handoff_ms后，把唤醒点换算为本地单调时钟交给触发线程，
+# 触发线程先睡眠、最后spin_us忙等到点再执行，唤醒误差不再受轮询间隔和其他线程影响
+# 亲和性和优先级只在Linux上生效，不支持或没有权限时记录在applied中并照常运行
+# 多个symbol同时触发时由FiringPool给每个symbol分配独占的核心
+
+
+def reserve_cpus(cpus: Iterable[int]) -> Optional[set]:
+    """
+    当前线程(启动时在主线程调用)让出cpus，之后创建的线程(日志、行情、各symbol线程)继承该亲和性，
+    只有触发线程绑定到这些CPU，返回设置后的亲和性，不支持时返回None
+    """
+    if not hasattr(os, "sched_setaffinity"):
+        return None
+    available = os.sched_getaffinity(0)
+    rest = available - set(cpus)
+    if not rest:
+        # 只有这些CPU可用时不让出，否则其他线程无处运行
+        return available
+    os.sched_setaffinity(0, rest)
+    return rest
+
+
+# 等待唤醒期间缩短GIL切换间隔(默认5ms)，睡眠结束的触发线程不用等其他线程用完整个间隔
+# 切换间隔是进程级的，多个触发线程同时等待时由最后一个结束的恢复
+_switch_lock = threading.Lock()
+_switch_holders = 0
+_switch_default = sys.getswitchinterval()
+
+
+def _shorten_switch_interval(interval: Optional[float]) -> None:
+    global _switch_holders, _switch_default
+    if interval is None:
+        return
+    with _switch_lock:
+        if _switch_holders == 0:
+            _switch_default = sys.getswitchinterval()
+        _switch_holders += 1
+        sys.setswitchinterval(min(interval, sys.getswitchinterval()))
+
+
+def _restore_switch_interval() -> None:
+    global _switch_holders
+    with _switch_lock:
+        if _switch_holders == 0:
+            return
+        _switch_holders -= 1
+        if _switch_holders == 0:
+            sys.setswitchinterval(_switch_default)
+
+
+def _percentile(values, probability: float):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(probability * len(values)))]
+
+
+class FiringThread(object):
+    """
+    firing = FiringThread(cpus=[3], realtime=True)
+    deadline_ns = time.perf_counter_ns() + ...           本地单调时钟的唤醒点
+    result = firing.fire_at(deadline_ns, place_order, **request).result()
+    firing.get_stats()                                    唤醒误差统计(微秒)
+    """
+
+    def __init__(
+        self,
+        cpus: Optional[Iterable[int]] = None,
+        priority: Optional[int] = None,
+        realtime: bool = False,
+        spin_us: int = 200,
+        switch_interval_us: Optional[int] = 100,
+        handoff_ms: int = 300,
+        name: str = "firing",
+        logger=None,
+    ) -> None:
+        """
+        cpus: 绑定的CPU编号，为空不绑定
+        priority: realtime时为SCHED_FIFO优先级(1-99，默认50)，否则为nice值(负数需要权限)
+        realtime: 使用SCHED_FIFO实时调度
+        spin_us: 唤醒点前多少微秒开始忙等，睡眠唤醒本身有几十微秒的误差
+        switch_interval_us: 等待期间的GIL切换间隔，为None不调整
+        handoff_ms: 距唤醒点多久交给触发线程，之后不再轮询服务器时间
+        """
+        self.cpus = set(cpus) if cpus is not None else None
+        self.priority = priority
+        self.realtime = realtime
+        self.spin_ns = spin_us * NS_PER_US
+        self.switch_interval = (
+            switch_interval_us / 1000000 if switch_interval_us is not None else None
+        )
+        self.handoff_ns = handoff_ms * NS_PER_MS
+        self.name = name
+        self.logger = logger
+        # 实际生效的设置，格式：{"cpus": ..., "scheduler": ..., "error": ...}
+        self.applied: Dict = {}
+        # 最近的唤醒误差(纳秒)，正数表示晚于唤醒点
+        self.jitters = deque(maxlen=1000)
+        self._jobs: queue.Queue = queue.Queue()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name=name, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def _log(self, message: str) -> None:
+        if self.logger is not None:
+            self.logger.info(message)
+        else:
+            print(message)
+
+    def _configure(self) -> None:
+        """在触发线程内设置亲和性和优先级，Linux上pid为0即当前线程"""
+        errors = []
+        if self.cpus is not None:
+            try:
+                os.sched_setaffinity(0, self.cpus)
+                self.applied["cpus"] = sorted(os.sched_getaffinity(0))
+            except (AttributeError, OSError, ValueError) as e:
+                errors.append(f"affinity: {e}")
+        if self.realtime:
+            try:
+                priority = self.priority or 50
+                os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+                self.applied["scheduler"] = f"SCHED_FIFO:{priority}"
+            except (AttributeError, OSError) as e:
+                errors.append(f"realtime: {e}")
+        elif self.priority is not None:
+            try:
+                os.setpriority(
+                    os.PRIO_PROCESS, threading.get_native_id(), self.priority
+                )
+                self.applied["scheduler"] = f"nice:{self.priority}"
+            except (AttributeError, OSError) as e:
+                errors.append(f"nice: {e}")
+        if errors:
+            self.applied["error"] = "; ".join(errors)
+        self._log(f"{self.name}触发线程设置: {self.applied or '默认'}")
+
+    def _loop(self) -> None:
+        self._configure()
+        self._ready.set()
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            future, func, args, kwargs = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(func(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        future = Future()
+        self._jobs.put((future, func, args, kwargs))
+        return future
+
+    def sleep_until(self, deadline_ns: int) -> int:
+        """等到本地perf_counter_ns的deadline_ns，返回唤醒误差(纳秒)"""
+        _shorten_switch_interval(self.switch_interval)
+        try:
+            remaining = deadline_ns - time.perf_counter_ns()
+            if remaining > self.spin_ns:
+                time.sleep((remaining - self.spin_ns) / NS_PER_SECOND)
+            while time.perf_counter_ns() < deadline_ns:
+                pass
+            jitter = time.perf_counter_ns() - deadline_ns
+        finally:
+            _restore_switch_interval()
+        self.jitters.append(jitter)
+        FIRE_JITTER.observe(jitter / NS_PER_SECOND)
+        return jitter
+
+    def _fire(self, deadline_ns: Optional[int], func: Callable, args, kwargs):
+        if deadline_ns is not None:
+            self.sleep_until(deadline_ns)
+        return func(*args, **kwargs)
+
+    def fire_at(
+        self, deadline_ns: Optional[int], func: Callable, *args, **kwargs
+    ) -> Future:
+        """在触发线程中等到deadline_ns(本地perf_counter_ns)后执行func，为None立即执行"""
+        return self.submit(self._fire, deadline_ns, func, args, kwargs)
+
+    def get_stats(self) -> Dict:
+        jitters = list(self.jitters)
+        stats = {"count": len(jitters), "applied": dict(self.applied)}
+        if jitters:
+            stats.update(
+                p50_us=_percentile(jitters, 0.5) / NS_PER_US,
+                p99_us=_percentile(jitters, 0.99) / NS_PER_US,
+                max_us=max(jitters) / NS_PER_US,
+            )
+        return stats
+
+    def close(self) -> None:
+        self._jobs.put(None)
+
+
+class FiringPool(object):
+    """
+    进程内共用的触发线程池，每个CPU一个常驻触发线程
+    pool = FiringPool([2, 3], realtime=True)
+    firing = pool.acquire()    本次结算独占一个核心
+    pool.release(firing)
+    同时触发的symbol多于核心数时，多出的使用不绑核、普通优先级的临时线程，
+    避免多个实时线程在同一核心上忙等、互相排队
+    """
+
+    def __init__(
+        self,
+        cpus: Iterable[int],
+        realtime: bool = False,
+        priority: Optional[int] = None,
+        logger=None,
+        **options,
+    ) -> None:
+        """
+        cpus: 触发线程使用的CPU，每个CPU一个线程，通常先用reserve_cpus让其他线程让出
+        options: 传给FiringThread的其他参数，如spin_us、handoff_ms
+        """
+        self.logger = logger
+        self.options = options
+        self.lock = threading.Lock()
+        self.threads = [
+            FiringThread(
+                cpus=[cpu],
+                realtime=realtime,
+                priority=priority,
+                name=f"firing-cpu{cpu}",
+                logger=logger,
+                **options,
+            )
+            for cpu in cpus
+        ]
+        self._idle = list(self.threads)
+
+    def acquire(self) -> FiringThread:
+        with self.lock:
+            if self._idle:
+                return self._idle.pop(0)
+        return FiringThread(name="firing-overflow", logger=self.logger, **self.options)
+
+    def release(self, firing: FiringThread) -> None:
+        if firing in self.threads:
+            with self.lock:
+                self._idle.append(firing)
+        else:
+            firing.close()
+
+    def get_stats(self) -> Dict[str, Dict]:
+        return {firing.name: firing.get_stats() for firing in self.threads}
+
+    def close(self) -> None:
+        for firing in self.threads:
+            firing.close()
@@ -0,0 +1,288 @@
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# 轻量指标注册表 + 本地Prometheus文本格式接口
+# 更新只做加法和一次bisect，渲染在HTTP服务线程里完成，不占用交易线程
+
+# 请求延迟的默认分桶(秒)
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.075,
+    0.1,
+    0.15,
+    0.2,
+    0.3,
+    0.5,
+    1.0,
+    2.5,
+)
+# 可正可负的时间差分桶(秒)，负数表示早于目标时间
+OFFSET_BUCKETS = (
+    -2.0,
+    -1.0,
+    -0.5,
+    -0.25,
+    -0.1,
+    -0.05,
+    -0.025,
+    -0.01,
+    0.0,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric(object):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], "_Metric"] = {}
+
+    def labels(self, *values, **kwargs):
+        """按标签取子指标，热路径上可以缓存返回值避免重复查找"""
+        if kwargs:
+            values = tuple(str(kwargs[name]) for name in self.labelnames)
+        else:
+            values = tuple(str(value) for value in values)
+        child = self._children.get(values)
+        if child is None:
+            with self.lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._new_child()
+                    self._children[values] = child
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self) -> List[Tuple[str, str, float]]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        if self.labelnames:
+            items = list(self._children.items())
+        else:
+            items = [((), self)]
+        for values, child in items:
+            for suffix, extra, value in child._samples():
+                labels = _format_labels(self.labelnames, values, extra)
+                lines.append(f"{self.name}{suffix}{labels} {value}")
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.value = 0.0
+
+    def _new_child(self):
+        return Counter(self.name, self.documentation)
+
+    def inc(self, amount: float = 1):
+        with self.lock:
+            self.value += amount
+
+    def _samples(self):
+        return [("_total", "", self.value)]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.value = 0.0
+
+    def _new_child(self):
+        return Gauge(self.name, self.documentation)
+
+    def set(self, value: float):
+        self.value = value
+
+    def _samples(self):
+        return [("", "", self.value)]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = LATENCY_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def _new_child(self):
+        return Histogram(self.name, self.documentation, buckets=self.buckets)
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def _samples(self):
+        with self.lock:
+            counts = list(self.counts)
+            total_sum = self.sum
+            total_count = self.count
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            samples.append(("_bucket", f'le="{bound}"', cumulative))
+        samples.append(("_bucket", 'le="+Inf"', total_count))
+        samples.append(("_sum", "", total_sum))
+        samples.append(("_count", "", total_count))
+        return samples
+
+
+class MetricsRegistry(object):
+    def __init__(self) -> None:
+        self.metrics: Dict[str, _Metric] = {}
+        self.lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, documentation, labelnames, **kwargs):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = cls(name, documentation, labelnames, **kwargs)
+                self.metrics[name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames=()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(
+        self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._get_or_create(
+            Histogram, name, documentation, labelnames, buckets=buckets
+        )
+
+    def render(self) -> str:
+        with self.lock:
+            metrics = list(self.metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# 各模块共用的指标
+REQUEST_LATENCY = REGISTRY.histogram(
+    "bybit_request_latency_seconds", "Bybit REST请求耗时", ("method",)
+)
+RATE_LIMIT_REMAINING = REGISTRY.gauge(
+    "bybit_rate_limit_remaining", "Bybit接口当前窗口剩余请求数", ("method",)
+)
+RATE_LIMIT = REGISTRY.gauge(
+    "bybit_rate_limit", "Bybit接口每个窗口的请求上限", ("method",)
+)
+WAKE_ERROR = REGISTRY.histogram(
+    "trigger_wake_error_seconds",
+    "wait_until唤醒时距目标时间的剩余时间，负数表示唤醒晚于目标",
+    buckets=OFFSET_BUCKETS,
+)
+ORDER_ACK_LAG = REGISTRY.histogram(
+    "order_ack_lag_seconds",
+    "交易所订单时间减结算时间，负数表示在结算前成交",
+    buckets=OFFSET_BUCKETS,
+)
+EXIT_LATENCY = REGISTRY.histogram(
+    "exit_arm_latency_seconds",
+    "确认开仓成交到平仓单被受理的耗时，market模式为到时平仓的耗时",
+    ("mode",),
+)
+SCAN_DURATION = REGISTRY.histogram(
+    "arbitrage_scan_duration_seconds",
+    "find_arbitrage_opportunities耗时",
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+OPPORTUNITIES = REGISTRY.gauge("arbitrage_opportunities", "最近一次扫描的套利机会数")
+STRATEGY_LOOPS = REGISTRY.counter("strategy_loops", "策略主循环次数", ("status",))
+GC_PAUSE = REGISTRY.histogram(
+    "gc_pause_seconds",
+    "关键窗口的GC停顿，prepare为进入窗口前的完整GC，window为窗口内发生的GC",
+    ("phase",),
+)
+WINDOW_ALLOCATED_BLOCKS = REGISTRY.histogram(
+    "critical_window_allocated_blocks",
+    "关键窗口内净增加的内存块数",
+    buckets=(0, 100, 500, 1000, 5000, 10000, 50000),
+)
+FIRE_JITTER = REGISTRY.histogram(
+    "firing_wake_jitter_seconds",
+    "触发线程实际唤醒时间减本地唤醒点",
+    buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.025),
+)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 抓取请求不写日志
+        pass
+
+
+def start_metrics_server(
+    port: int = 9108,
+    host: str = "127.0.0.1",
+    registry: Optional[MetricsRegistry] = None,
+) -> ThreadingHTTPServer:
+    """在后台线程启动 http://host:port/metrics ，返回server，停止时调用shutdown()"""
+    handler = type(
+        "MetricsHandler", (_MetricsHandler,), {"registry": registry or REGISTRY}
+    )
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(
+        target=server.serve_forever, name="metrics-server", daemon=True
+    )
+    thread.start()
+    return server
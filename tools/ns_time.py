@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta, timezone
+
+# 计时路径统一使用整数纳秒(Unix纪元起)表示时间，与时区无关，
+# 服务器时间、结算时间、提前量和延迟都按整数运算，只在显示时转换为datetime
+
+NS_PER_US = 1000
+NS_PER_MS = 1000000
+NS_PER_SECOND = 1000000000
+NS_PER_HOUR = 3600 * NS_PER_SECOND
+# Bybit资金费率默认每8小时结算，结算点UTC 0:00, 8:00, 16:00与纪元对齐
+FUNDING_INTERVAL_NS = 8 * NS_PER_HOUR
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def ms_to_ns(ms) -> int:
+    """毫秒时间戳(整数或字符串)转纳秒"""
+    return int(ms) * NS_PER_MS
+
+
+def ns_to_ms(ns: int) -> int:
+    return ns // NS_PER_MS
+
+
+def ns_to_seconds(ns: int) -> float:
+    return ns / NS_PER_SECOND
+
+
+def next_funding_ns(now_ns: int, interval_ns: int = FUNDING_INTERVAL_NS) -> int:
+    """now_ns之后的下一个结算时间"""
+    return (now_ns // interval_ns + 1) * interval_ns
+
+
+def to_local_datetime(ns: int) -> datetime:
+    """转为本地时间的naive datetime，仅用于显示"""
+    seconds, remainder = divmod(ns, NS_PER_SECOND)
+    return datetime.fromtimestamp(seconds).replace(microsecond=remainder // NS_PER_US)
+
+
+def to_utc_datetime(ns: int) -> datetime:
+    """转为UTC的naive datetime"""
+    return (_EPOCH + timedelta(microseconds=ns // NS_PER_US)).replace(tzinfo=None)
+
+
+def from_datetime(value: datetime) -> int:
+    """datetime转纳秒，naive datetime按本地时间处理(与datetime.timestamp一致)"""
+    if value.tzinfo is None:
+        value = value.astimezone()
+    return (value - _EPOCH) // timedelta(microseconds=1) * NS_PER_US
+
+
+def from_utc_datetime(value: datetime) -> int:
+    """UTC的naive datetime转纳秒"""
+    return from_datetime(value.replace(tzinfo=timezone.utc))
+
+
+def format_ns(ns: int) -> str:
+    """显示用的本地时间，精确到毫秒"""
+    return to_local_datetime(ns).isoformat(sep=" ", timespec="milliseconds")
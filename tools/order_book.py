@@ -0,0 +1,282 @@
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from threading import Lock
+from typing import Dict, Iterable, Optional, Tuple
+
+
+class _BookSide(object):
+    """
+    单边价格档位，按从优到劣排序存放在两个array('d')里
+    买盘存负价格，使两边都按升序即从优到劣排列，可直接用bisect
+    """
+
+    __slots__ = ("sign", "keys", "sizes")
+
+    def __init__(self, is_bid: bool) -> None:
+        self.sign = -1.0 if is_bid else 1.0
+        self.keys = array("d")
+        self.sizes = array("d")
+
+    def clear(self) -> None:
+        self.keys = array("d")
+        self.sizes = array("d")
+
+    def apply(self, levels: Iterable) -> None:
+        """应用一批 [price, size] 档位，size为0表示删除该档"""
+        keys = self.keys
+        sizes = self.sizes
+        for price, size in levels:
+            key = float(price) * self.sign
+            size = float(size)
+            index = bisect_left(keys, key)
+            exists = index < len(keys) and keys[index] == key
+            if size == 0:
+                if exists:
+                    del keys[index]
+                    del sizes[index]
+            elif exists:
+                sizes[index] = size
+            else:
+                keys.insert(index, key)
+                sizes.insert(index, size)
+
+    def best(self) -> Optional[float]:
+        return self.keys[0] * self.sign if self.keys else None
+
+    def sweep(self, qty: float) -> Tuple[float, float, float]:
+        """
+        按当前深度吃掉qty
+        返回 (成交均价VWAP, 最差成交价, 可成交数量)，深度不足时可成交数量小于qty
+        """
+        keys = self.keys
+        sizes = self.sizes
+        remaining = qty
+        notional = 0.0
+        worst = 0.0
+        for i in range(len(keys)):
+            if remaining <= 0:
+                break
+            take = sizes[i] if sizes[i] < remaining else remaining
+            worst = keys[i] * self.sign
+            notional += take * worst
+            remaining -= take
+        filled = qty - remaining
+        return (notional / filled if filled else 0.0), worst, filled
+
+    def max_qty_within(self, bps: float) -> float:
+        """最差成交价偏离最优价不超过bps时最多可成交的数量"""
+        if not self.keys:
+            return 0.0
+        # keys按从优到劣升序，价格界限换算成key的上限
+        best_key = self.keys[0]
+        limit_key = best_key + abs(best_key) * bps / 10000
+        index = bisect_right(self.keys, limit_key)
+        return sum(self.sizes[:index])
+
+
+class LocalOrderBook(object):
+    """
+    单个交易对的本地L2订单簿，由WebSocket快照+增量维护
+    增量的u必须与上一条连续，不连续说明丢了推送，清空订单簿并标记为未同步，
+    直到收到新的快照(重新订阅)前不可用于定量
+    """
+
+    def __init__(self, symbol: str) -> None:
+        self.symbol = symbol
+        self.bids = _BookSide(is_bid=True)
+        self.asks = _BookSide(is_bid=False)
+        self.update_id = 0
+        self.seq = 0
+        # 收到快照后为True，发现增量不连续时为False
+        self.synced = False
+        # 发现不连续的次数
+        self.gaps = 0
+        # 最近一次更新的本地时间(秒)
+        self.updated_at = 0.0
+        self.lock = Lock()
+
+    def on_message(self, message: dict) -> bool:
+        """
+        处理Bybit v5 orderbook推送
+        Returns: 是否发现增量不连续，True表示需要重新同步；等待快照期间的增量直接丢弃
+        """
+        data = message["data"]
+        update_id = data.get("u")
+        with self.lock:
+            # u=1的增量表示服务端重启，按快照处理
+            if message.get("type") == "snapshot" or update_id == 1:
+                self.bids.clear()
+                self.asks.clear()
+                self.synced = True
+            elif not self.synced:
+                # 等待快照，期间的增量无法应用
+                return False
+            elif update_id is not None and update_id != self.update_id + 1:
+                self.bids.clear()
+                self.asks.clear()
+                self.synced = False
+                self.gaps += 1
+                return True
+            self.bids.apply(data.get("b", ()))
+            self.asks.apply(data.get("a", ()))
+            self.update_id = data.get("u", self.update_id)
+            self.seq = data.get("seq", self.seq)
+            self.updated_at = time.time()
+            return False
+
+    def is_fresh(self, max_age: float = 1.0) -> bool:
+        """已同步且max_age秒内有更新"""
+        return (
+            self.synced
+            and bool(self.asks.keys)
+            and time.time() - self.updated_at <= max_age
+        )
+
+    def age_ms(self) -> float:
+        """距最近一次更新的时间(ms)"""
+        return (time.time() - self.updated_at) * 1000
+
+    def _side(self, side: str) -> _BookSide:
+        # 买单吃卖盘，卖单吃买盘
+        return self.asks if side == "Buy" else self.bids
+
+    def vwap(self, side: str, qty: float) -> Tuple[float, float, float]:
+        """下qty数量的市价单，返回 (成交均价, 最差成交价, 可成交数量)"""
+        with self.lock:
+            return self._side(side).sweep(qty)
+
+    def max_qty_within_bps(self, side: str, bps: float) -> float:
+        """滑点不超过bps时最多可下的数量"""
+        with self.lock:
+            return self._side(side).max_qty_within(bps)
+
+    def best_price(self, side: str) -> Optional[float]:
+        with self.lock:
+            return self._side(side).best()
+
+    def limit_qty(
+        self, side: str, qty: float, max_value: float, max_slippage_bps: float
+    ) -> Tuple[float, float, float, float]:
+        """
+        按深度修正市价单数量：用吃单均价代替lastPrice按max_value重算数量，
+        并限制在max_slippage_bps滑点内可成交的数量
+        返回 (修正后的数量, 吃单均价, 最差成交价, 滑点内可成交数量)，未按步长取整
+        """
+        with self.lock:
+            book_side = self._side(side)
+            vwap, worst_price, _ = book_side.sweep(qty)
+            depth_qty = book_side.max_qty_within(max_slippage_bps)
+        if vwap:
+            qty = min(qty, max_value / vwap)
+        return min(qty, depth_qty), vwap, worst_price, depth_qty
+
+
+def _make_websocket(testnet: bool, channel_type: str):
+    from pybit.unified_trading import WebSocket
+
+    class RawOrderBookWebSocket(WebSocket):
+        """
+        pybit会把orderbook增量合并成完整订单簿、deepcopy后按快照回调，
+        既拿不到增量的u做连续性检查，每条推送也要复制整个订单簿；这里直接回调原始推送
+        """
+
+        def _process_normal_message(self, message):
+            topic = message["topic"]
+            if topic.startswith("orderbook."):
+                self._get_callback(topic)(message)
+            else:
+                super()._process_normal_message(message)
+
+    return RawOrderBookWebSocket(testnet=testnet, channel_type=channel_type)
+
+
+class OrderBookManager(object):
+    """
+    订阅多个交易对的orderbook推送并维护本地订单簿
+    demo/实盘行情一致，行情WebSocket不区分demo
+    任一订单簿发现增量不连续时，在后台重建连接，重新订阅后每个交易对都会收到新的快照
+    """
+
+    def __init__(
+        self,
+        symbols: Iterable[str],
+        depth: int = 50,
+        channel_type: str = "linear",
+        testnet: bool = False,
+    ) -> None:
+        self.books: Dict[str, LocalOrderBook] = {
+            symbol: LocalOrderBook(symbol) for symbol in symbols
+        }
+        self.depth = depth
+        self.channel_type = channel_type
+        self.testnet = testnet
+        self.ws = None
+        self.resyncs = 0
+        self._resync_lock = Lock()
+        self._resyncing = False
+
+    def start(self) -> None:
+        self.ws = _make_websocket(self.testnet, self.channel_type)
+        self.ws.orderbook_stream(
+            depth=self.depth, symbol=list(self.books), callback=self.on_message
+        )
+
+    def on_message(self, message: dict) -> None:
+        book = self.books.get(message.get("data", {}).get("s"))
+        if book is not None and book.on_message(message):
+            self.resync(book.symbol)
+
+    def resync(self, symbol: str) -> None:
+        """在后台重建连接取新快照，不阻塞WebSocket回调线程，重建期间重复的请求忽略"""
+        with self._resync_lock:
+            if self._resyncing:
+                return
+            self._resyncing = True
+            self.resyncs += 1
+        print(f"订单簿{symbol}增量不连续，重新订阅取快照")
+        threading.Thread(
+            target=self._resync, name="order-book-resync", daemon=True
+        ).start()
+
+    def _resync(self) -> None:
+        try:
+            old_ws = self.ws
+            if old_ws is not None:
+                old_ws.exit()
+            self.start()
+        except Exception as e:
+            print(f"订单簿重新订阅失败: {str(e)}")
+        finally:
+            with self._resync_lock:
+                self._resyncing = False
+
+    def is_connected(self) -> bool:
+        return self.ws is not None and self.ws.is_connected()
+
+    def get(self, symbol: str) -> Optional[LocalOrderBook]:
+        return self.books.get(symbol)
+
+    def usable_book(
+        self, symbol: str, max_age_ms: float
+    ) -> Tuple[Optional[LocalOrderBook], str]:
+        """
+        返回可用于定量的订单簿，不可用时返回 (None, 原因)
+        没有变化的订单簿不会有推送，连接正常且已同步时即使超过max_age_ms没有更新也可用；
+        连接断开时订单簿可能已过期，只用max_age_ms内更新过的
+        """
+        book = self.books.get(symbol)
+        if book is None:
+            return None, "未订阅订单簿"
+        if not book.synced:
+            return None, "订单簿未同步(等待快照)"
+        if not book.asks.keys or not book.bids.keys:
+            return None, "订单簿为空"
+        if not self.is_connected() and not book.is_fresh(max_age_ms / 1000):
+            return None, f"行情连接断开且订单簿{book.age_ms():.0f}ms未更新"
+        return book, ""
+
+    def stop(self) -> None:
+        if self.ws is not None:
+            self.ws.exit()
@@ -0,0 +1,332 @@
+"""
+按Bybit账户流水同步每次结算套利的实际收益
+
+用法（在仓库根目录执行）：
+    python -m tools.pnl_sync --db ./pnl/pnl.sqlite3              # 增量同步后输出各币种汇总
+    python -m tools.pnl_sync --db ./pnl/pnl.sqlite3 --symbol VIDTUSDT
+
+下单时通过PnlStore.record_attempt记录每次套利（symbol、结算时间、订单号），
+PnlSync按cursor分页拉取新的流水（TRADE手续费/成交、SETTLEMENT资金费），
+按订单号和结算时间关联到套利记录，检查点保存在同一个sqlite文件中，每次只拉取新流水
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+# 账户流水接口单次查询的最大时间跨度
+_WINDOW_MS = 7 * 24 * 3600 * 1000
+# 资金费流水时间与结算时间允许的偏差
+_SETTLEMENT_TOLERANCE_MS = 60 * 1000
+# 相邻两次查询的重叠时间，防止边界上延迟入账的流水漏掉，重复的id会被忽略
+_OVERLAP_MS = 60 * 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS attempts (
+    symbol TEXT NOT NULL,
+    settlement_ms INTEGER NOT NULL,
+    open_time_ms INTEGER,
+    qty TEXT,
+    funding_rate TEXT,
+    PRIMARY KEY (symbol, settlement_ms)
+);
+CREATE TABLE IF NOT EXISTS attempt_orders (
+    order_id TEXT PRIMARY KEY,
+    symbol TEXT NOT NULL,
+    settlement_ms INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS attempt_orders_attempt
+    ON attempt_orders (symbol, settlement_ms);
+CREATE TABLE IF NOT EXISTS transactions (
+    id TEXT PRIMARY KEY,
+    symbol TEXT,
+    type TEXT,
+    order_id TEXT,
+    transaction_time INTEGER,
+    funding REAL,
+    fee REAL,
+    cash_flow REAL,
+    change REAL,
+    raw TEXT
+);
+CREATE INDEX IF NOT EXISTS transactions_symbol_time
+    ON transactions (symbol, type, transaction_time);
+CREATE INDEX IF NOT EXISTS transactions_order ON transactions (order_id);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    name TEXT PRIMARY KEY,
+    synced_until_ms INTEGER NOT NULL
+);
+"""
+
+
+def _float(value) -> float:
+    try:
+        return float(value or 0)
+    except ValueError:
+        return 0.0
+
+
+class PnlStore(object):
+    """套利记录和账户流水的本地索引，线程安全"""
+
+    def __init__(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        with self.lock, self.conn:
+            self.conn.executescript(_SCHEMA)
+
+    def record_attempt(
+        self,
+        symbol: str,
+        settlement_ms: int,
+        order_ids: Iterable[str],
+        open_time_ms: Optional[int] = None,
+        qty=None,
+        funding_rate=None,
+    ) -> None:
+        """记录一次结算套利，同一symbol同一结算时间重复记录时合并订单号"""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO attempts VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (symbol, settlement_ms) DO UPDATE SET "
+                "open_time_ms = COALESCE(excluded.open_time_ms, open_time_ms), "
+                "qty = COALESCE(excluded.qty, qty), "
+                "funding_rate = COALESCE(excluded.funding_rate, funding_rate)",
+                (
+                    symbol,
+                    settlement_ms,
+                    open_time_ms,
+                    None if qty is None else str(qty),
+                    None if funding_rate is None else str(funding_rate),
+                ),
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO attempt_orders VALUES (?, ?, ?)",
+                [
+                    (order_id, symbol, settlement_ms)
+                    for order_id in order_ids
+                    if order_id
+                ],
+            )
+
+    def add_order(self, symbol: str, settlement_ms: int, order_id: str) -> None:
+        """给套利补记一个订单号，如结算后才发出的平仓单"""
+        if not order_id:
+            return
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO attempt_orders VALUES (?, ?, ?)",
+                (order_id, symbol, settlement_ms),
+            )
+
+    def add_transactions(self, records: List[Dict]) -> int:
+        """写入流水，已存在的id忽略，返回新增条数"""
+        rows = [
+            (
+                record["id"],
+                record.get("symbol"),
+                record.get("type"),
+                record.get("orderId") or None,
+                int(record.get("transactionTime") or 0),
+                _float(record.get("funding")),
+                _float(record.get("fee")),
+                _float(record.get("cashFlow")),
+                _float(record.get("change")),
+                json.dumps(record, separators=(",", ":")),
+            )
+            for record in records
+            if record.get("id")
+        ]
+        with self.lock, self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO transactions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            return self.conn.total_changes - before
+
+    def get_checkpoint(self, name: str) -> Optional[int]:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT synced_until_ms FROM checkpoints WHERE name = ?", (name,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_checkpoint(self, name: str, synced_until_ms: int) -> None:
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?)",
+                (name, synced_until_ms),
+            )
+
+    def attempt_results(self, symbol: Optional[str] = None) -> List[Dict]:
+        """
+        每次套利的实际结果
+        funding_collected: 收到的资金费(正数为收到)，fee: 关联订单的手续费，
+        net: 资金费、手续费和关联订单成交盈亏合计(即钱包变动)
+        """
+        query = """
+            SELECT a.symbol, a.settlement_ms, a.open_time_ms, a.qty, a.funding_rate,
+                (SELECT COALESCE(-SUM(t.funding), 0) FROM transactions t
+                    WHERE t.symbol = a.symbol AND t.type = 'SETTLEMENT'
+                    AND t.transaction_time BETWEEN a.settlement_ms - :tol
+                        AND a.settlement_ms + :tol) AS funding_collected,
+                (SELECT COALESCE(SUM(t.fee), 0) FROM transactions t
+                    JOIN attempt_orders o ON o.order_id = t.order_id
+                    WHERE o.symbol = a.symbol AND o.settlement_ms = a.settlement_ms
+                    ) AS fee,
+                (SELECT COALESCE(SUM(t.change), 0) FROM transactions t
+                    JOIN attempt_orders o ON o.order_id = t.order_id
+                    WHERE o.symbol = a.symbol AND o.settlement_ms = a.settlement_ms
+                    ) AS trade_change
+            FROM attempts a
+        """
+        params = {"tol": _SETTLEMENT_TOLERANCE_MS}
+        if symbol is not None:
+            query += " WHERE a.symbol = :symbol"
+            params["symbol"] = symbol
+        query += " ORDER BY a.settlement_ms"
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+        results = []
+        for row in rows:
+            result = dict(row)
+            result["collected"] = result["funding_collected"] > 0
+            # 关联订单成交流水的change = 成交盈亏 - 手续费，再加上资金费即钱包变动
+            result["net"] = result["funding_collected"] + result.pop("trade_change")
+            results.append(result)
+        return results
+
+    def symbol_summary(self, symbol: Optional[str] = None) -> Dict[str, Dict]:
+        """按symbol汇总：套利次数、实际收到资金费的次数、资金费、手续费、净收益"""
+        summary: Dict[str, Dict] = {}
+        for result in self.attempt_results(symbol):
+            item = summary.setdefault(
+                result["symbol"],
+                {
+                    "attempts": 0,
+                    "collected": 0,
+                    "funding_collected": 0.0,
+                    "fee": 0.0,
+                    "net": 0.0,
+                },
+            )
+            item["attempts"] += 1
+            item["collected"] += result["collected"]
+            item["funding_collected"] += result["funding_collected"]
+            item["fee"] += result["fee"]
+            item["net"] += result["net"]
+        return summary
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
+
+
+class PnlSync(object):
+    """增量拉取账户流水写入PnlStore"""
+
+    def __init__(
+        self,
+        client,
+        store: PnlStore,
+        account_type: str = "UNIFIED",
+        category: str = "linear",
+        page_limit: int = 50,
+        lookback_days: int = 7,
+    ) -> None:
+        """
+        page_limit: 每页条数，Bybit上限为50
+        lookback_days: 第一次同步时回溯的天数
+        """
+        self.client = client
+        self.store = store
+        self.account_type = account_type
+        self.category = category
+        self.page_limit = page_limit
+        self.lookback_days = lookback_days
+        self.checkpoint_name = f"transaction_log:{account_type}:{category}"
+
+    def fetch_window(self, start_ms: int, end_ms: int) -> List[Dict]:
+        """按nextPageCursor拉取一个时间窗口内的全部流水"""
+        records = []
+        cursor = None
+        while True:
+            params = {
+                "accountType": self.account_type,
+                "category": self.category,
+                "startTime": start_ms,
+                "endTime": end_ms,
+                "limit": self.page_limit,
+            }
+            if cursor:
+                params["cursor"] = cursor
+            response = self.client.get_transaction_log(**params)
+            if isinstance(response, tuple):
+                response = response[0]
+            if response.get("retCode") != 0:
+                raise Exception(f"获取账户流水失败: {response.get('retMsg')}")
+            result = response.get("result", {})
+            records.extend(result.get("list", []))
+            next_cursor = result.get("nextPageCursor")
+            if not next_cursor or next_cursor == cursor:
+                return records
+            cursor = next_cursor
+
+    def sync(self, now_ms: Optional[int] = None) -> int:
+        """从检查点同步到当前时间，每完成一个时间窗口保存一次检查点，返回新增流水数"""
+        now_ms = now_ms or int(time.time() * 1000)
+        checkpoint = self.store.get_checkpoint(self.checkpoint_name)
+        if checkpoint is None:
+            start_ms = now_ms - self.lookback_days * 24 * 3600 * 1000
+        else:
+            start_ms = checkpoint - _OVERLAP_MS
+        added = 0
+        while start_ms < now_ms:
+            end_ms = min(start_ms + _WINDOW_MS, now_ms)
+            added += self.store.add_transactions(self.fetch_window(start_ms, end_ms))
+            self.store.set_checkpoint(self.checkpoint_name, end_ms)
+            if end_ms == now_ms:
+                break
+            start_ms = end_ms - _OVERLAP_MS
+        return added
+
+
+def main():
+    from pybit.unified_trading import HTTP
+
+    from config import BYBIT_API_KEY, BYBIT_API_SECRET
+
+    parser = argparse.ArgumentParser(description="按账户流水同步结算套利的实际收益")
+    parser.add_argument("--db", default="./pnl/pnl.sqlite3", help="本地数据库文件")
+    parser.add_argument("--symbol", help="只输出该symbol的每次套利结果")
+    parser.add_argument("--demo", action="store_true", help="使用模拟盘")
+    args = parser.parse_args()
+
+    store = PnlStore(args.db)
+    client = HTTP(api_key=BYBIT_API_KEY, api_secret=BYBIT_API_SECRET, demo=args.demo)
+    added = PnlSync(client, store).sync()
+    print(f"新增流水: {added}")
+    if args.symbol:
+        for result in store.attempt_results(args.symbol):
+            print(result)
+    for symbol, item in store.symbol_summary().items():
+        print(
+            f"{symbol}: 套利{item['attempts']}次, 收到资金费{item['collected']}次, "
+            f"资金费{item['funding_collected']:.4f}, 手续费{item['fee']:.4f}, "
+            f"净收益{item['net']:.4f}"
+        )
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
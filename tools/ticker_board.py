@@ -0,0 +1,224 @@
+import multiprocessing
+import struct
+import sys
+import time
+from multiprocessing import Process, shared_memory
+from typing import Dict, Iterable, List, Optional
+
+# 共享内存行情板
+# 一个行情进程批量拉取linear tickers，写入固定布局的共享内存，
+# 其它线程/进程按名称attach后零拷贝读取，使用seqlock保证读到的是一致的快照
+#
+# 内存布局:
+#   头部:   magic(4s) capacity(I) count(I)
+#   符号表: capacity * 32字节，symbol的ascii编码，不足补\0
+#   槽位:   capacity * (seq, lastPrice, fundingRate, nextFundingTime(ms), 更新时间(ns))
+
+_MAGIC = b"TKB1"
+_HEADER = struct.Struct("<4sII")
+_SYMBOL_SIZE = 32
+_SLOT = struct.Struct("<Qddqq")
+_SEQ = struct.Struct("<Q")
+
+
+# 本进程创建的行情板，与attach的读端共用同一个resource_tracker
+_created_names = set()
+
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """
+    只读端连接共享内存，读端退出时不能删除共享内存
+    python3.13起用track=False不登记；之前的版本attach也会登记到resource_tracker，
+    独立启动的读进程有自己的tracker，退出时会unlink，需要注销；
+    创建者进程及其multiprocessing子进程共用创建者的tracker，注销会删掉创建者的登记，不能注销
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    shm = shared_memory.SharedMemory(name=name)
+    if shm._name not in _created_names and multiprocessing.parent_process() is None:
+        from multiprocessing import resource_tracker
+
+        resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+class TickerBoard(object):
+    """
+    最新行情共享内存板
+    写端只能有一个（行情进程），读端数量不限
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool) -> None:
+        self.shm = shm
+        self.owner = owner
+        self.buf = shm.buf
+        magic, self.capacity, self.count = _HEADER.unpack_from(self.buf, 0)
+        if magic != _MAGIC:
+            raise Exception(f"共享内存{shm.name}不是行情板")
+        self._slots_offset = _HEADER.size + self.capacity * _SYMBOL_SIZE
+        # symbol -> 槽位偏移
+        self.index: Dict[str, int] = {}
+        for i in range(self.count):
+            offset = _HEADER.size + i * _SYMBOL_SIZE
+            symbol = bytes(self.buf[offset : offset + _SYMBOL_SIZE]).rstrip(b"\0")
+            self.index[symbol.decode()] = self._slots_offset + i * _SLOT.size
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @classmethod
+    def create(cls, symbols: Iterable[str], name: Optional[str] = None):
+        """创建行情板，symbol列表在创建时固定"""
+        symbols = list(dict.fromkeys(symbols))
+        capacity = len(symbols)
+        size = _HEADER.size + capacity * (_SYMBOL_SIZE + _SLOT.size)
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        _created_names.add(shm._name)
+        _HEADER.pack_into(shm.buf, 0, _MAGIC, capacity, capacity)
+        for i, symbol in enumerate(symbols):
+            encoded = symbol.encode()
+            if len(encoded) > _SYMBOL_SIZE:
+                raise Exception(f"symbol过长: {symbol}")
+            shm.buf[
+                _HEADER.size
+                + i * _SYMBOL_SIZE : _HEADER.size
+                + i * _SYMBOL_SIZE
+                + len(encoded)
+            ] = encoded
+        slots_offset = _HEADER.size + capacity * _SYMBOL_SIZE
+        shm.buf[slots_offset:size] = bytes(size - slots_offset)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str):
+        """按名称连接已存在的行情板，读端退出不会删除共享内存"""
+        return cls(_attach_shared_memory(name), owner=False)
+
+    def symbols(self) -> List[str]:
+        return list(self.index)
+
+    def write(
+        self,
+        symbol: str,
+        last_price: float,
+        funding_rate: float,
+        next_funding_time: int,
+    ) -> bool:
+        """写入一个symbol的最新行情，不在板上的symbol忽略"""
+        offset = self.index.get(symbol)
+        if offset is None:
+            return False
+        buf = self.buf
+        seq = _SEQ.unpack_from(buf, offset)[0]
+        # 奇数表示正在写
+        _SEQ.pack_into(buf, offset, seq + 1)
+        _SLOT.pack_into(
+            buf,
+            offset,
+            seq + 1,
+            last_price,
+            funding_rate,
+            next_funding_time,
+            time.time_ns(),
+        )
+        _SEQ.pack_into(buf, offset, seq + 2)
+        return True
+
+    def read(self, symbol: str, max_retries: int = 100) -> Optional[tuple]:
+        """
+        读取一个symbol的最新行情
+        返回 (seq, lastPrice, fundingRate, nextFundingTime(ms), 更新时间(ns))
+        从未写入过或读取一直冲突时返回None
+        """
+        offset = self.index.get(symbol)
+        if offset is None:
+            return None
+        buf = self.buf
+        for _ in range(max_retries):
+            seq = _SEQ.unpack_from(buf, offset)[0]
+            if seq & 1:
+                continue
+            record = _SLOT.unpack_from(buf, offset)
+            if record[0] == seq and _SEQ.unpack_from(buf, offset)[0] == seq:
+                return record if seq else None
+        return None
+
+    def get_ticker(self, symbol: str, max_age: float = 1.0) -> Optional[dict]:
+        """
+        以get_tickers单条记录的格式返回最新行情
+        max_age: 行情最大允许延迟(秒)，超过视为过期返回None
+        """
+        record = self.read(symbol)
+        if not record:
+            return None
+        if time.time_ns() - record[4] > max_age * 1000000000:
+            return None
+        return {
+            "symbol": symbol,
+            "lastPrice": str(record[1]),
+            "fundingRate": str(record[2]),
+            "nextFundingTime": str(record[3]),
+            "seq": record[0],
+        }
+
+    def close(self) -> None:
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+            _created_names.discard(self.shm._name)
+
+
+def feed_once(board: TickerBoard, client) -> int:
+    """批量拉取一次linear tickers写入行情板，返回写入的symbol数"""
+    response = client.get_tickers(category="linear")
+    if isinstance(response, tuple):
+        # 开启了record_request_time的客户端会返回(响应, 耗时)
+        response = response[0]
+    if response.get("retCode") != 0:
+        return 0
+    written = 0
+    for item in response["result"]["list"]:
+        if item["symbol"] not in board.index:
+            continue
+        try:
+            written += board.write(
+                item["symbol"],
+                float(item["lastPrice"]),
+                float(item.get("fundingRate") or 0),
+                int(item.get("nextFundingTime") or 0),
+            )
+        except ValueError:
+            continue
+    return written
+
+
+def run_ticker_feed(board_name: str, demo: bool = False, interval: float = 0.2):
+    """行情进程入口：循环批量拉取行情写入共享内存"""
+    from pybit.unified_trading import HTTP
+
+    board = TickerBoard.attach(board_name)
+    client = HTTP(demo=demo)
+    while True:
+        try:
+            feed_once(board, client)
+        except Exception as e:
+            print(f"行情板更新失败: {str(e)}")
+        time.sleep(interval)
+
+
+def start_ticker_feed(symbols: Iterable[str], demo: bool = False, interval=0.2):
+    """
+    创建行情板并启动行情进程
+    返回 (board, process)，退出时调用 process.terminate() 和 board.close()
+    """
+    board = TickerBoard.create(symbols)
+    process = Process(
+        target=run_ticker_feed,
+        args=(board.name,),
+        kwargs={"demo": demo, "interval": interval},
+        daemon=True,
+    )
+    process.start()
+    return board, process
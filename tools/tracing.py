@@ -0,0 +1,136 @@
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+# 单次套利尝试的时间线追踪，导出为Chrome trace/Perfetto可打开的JSON
+# 关闭时span()返回共享的空对象，只多一次属性判断，不分配内存
+
+
+class _NoopSpan(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span(object):
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.time_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.time_ns()
+        if exc_type is not None:
+            self.args["error"] = repr(exc)
+        self.tracer._events.append(
+            (
+                "X",
+                self.name,
+                self.start,
+                end - self.start,
+                threading.get_ident(),
+                self.args,
+            )
+        )
+        return False
+
+    def set(self, **args):
+        """给span追加参数，如交易所返回的时间戳"""
+        self.args.update(args)
+
+
+class Tracer(object):
+    """
+    时间线追踪器
+    with tracer.span("ticker"): ...      记录一个阶段
+    tracer.instant("wake")               记录一个时间点
+    tracer.exchange_instant("order", ms) 记录交易所时间戳对应的时间点
+    tracer.dump(path)                    导出并清空
+    """
+
+    def __init__(self, enabled: bool = False, process_name: str = "") -> None:
+        self.enabled = enabled
+        self.process_name = process_name
+        self._events = []
+
+    def span(self, name: str, **args):
+        if not self.enabled:
+            return _NOOP_SPAN
+        return _Span(self, name, args)
+
+    def instant(self, name: str, **args):
+        if not self.enabled:
+            return
+        self._events.append(("i", name, time.time_ns(), 0, threading.get_ident(), args))
+
+    def exchange_instant(self, name: str, timestamp_ms, **args):
+        """
+        按交易所时间戳(ms)记录时间点，和本地时间画在同一条时间轴上，tid固定为0
+        响应中没有时间戳(timestamp_ms为None)时不记录
+        """
+        if not self.enabled or timestamp_ms is None:
+            return
+        args["exchange_time_ms"] = timestamp_ms
+        self._events.append(("i", name, int(timestamp_ms) * 1000000, 0, 0, args))
+
+    def clear(self):
+        self._events = []
+
+    def to_chrome_trace(self) -> dict:
+        pid = os.getpid()
+        trace_events = []
+        if self.process_name:
+            trace_events.append(
+                {
+                    "name": "process_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "args": {"name": self.process_name},
+                }
+            )
+        for phase, name, start_ns, dur_ns, tid, args in self._events:
+            event = {
+                "name": name,
+                "ph": phase,
+                "ts": start_ns / 1000,
+                "pid": pid,
+                "tid": tid,
+                "args": args,
+            }
+            if phase == "X":
+                event["dur"] = dur_ns / 1000
+            else:
+                event["s"] = "t"
+            trace_events.append(event)
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+    def dump(self, path: str) -> Optional[str]:
+        """导出到path并清空已记录的事件，未开启时不写文件"""
+        if not self.enabled:
+            return None
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.to_chrome_trace(), f, default=str)
+        self.clear()
+        return path